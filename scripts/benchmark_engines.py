@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""scripts/benchmark_engines.py
+
+Find where the Spark ETL engine starts to beat the in-process pandas engine:
+- generates CSV inputs for each intersection count with TrafficDataGenerator
+- times run_pipeline end to end for engine="pandas" and engine="spark"
+- reports Spark both cold (including JVM/session start) and warm (session reused)
+
+Run this from the project root, e.g.:
+  python3 scripts/benchmark_engines.py --intersections 20 100 500 2000 --hours 24
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.data_generator import TrafficDataGenerator
+from src.etl_pipeline import TrafficETLPipeline
+
+
+def timed_run(pipeline, sensor_path, metadata_path, output_path):
+    start = time.perf_counter()
+    pipeline.run_pipeline(sensor_path, metadata_path, output_path)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pandas and Spark ETL engines")
+    parser.add_argument("--intersections", type=int, nargs="+", default=[20, 100, 500, 2000])
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    spark_pipeline = TrafficETLPipeline(app_name="EngineBenchmark")
+    spark_pipeline.spark.sparkContext.setLogLevel("ERROR")
+    session_seconds = time.perf_counter() - start
+    pandas_pipeline = TrafficETLPipeline(engine="pandas")
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for num_intersections in args.intersections:
+            raw_dir = os.path.join(workdir, f"raw_{num_intersections}")
+            generator = TrafficDataGenerator(num_intersections=num_intersections, hours=args.hours, seed=args.seed)
+            metadata_path = os.path.join(raw_dir, "intersection_metadata.csv")
+            sensor_path = os.path.join(raw_dir, "traffic_sensor_data.csv")
+            os.makedirs(raw_dir)
+            generator.intersections.to_csv(metadata_path, index=False)
+            generator.generate_sensor_data(start_date=datetime(2024, 1, 1)).to_csv(sensor_path, index=False)
+            rows = num_intersections * args.hours * 12
+
+            pandas_seconds = timed_run(pandas_pipeline, sensor_path, metadata_path, os.path.join(workdir, "pandas"))
+            spark_seconds = timed_run(spark_pipeline, sensor_path, metadata_path, os.path.join(workdir, "spark"))
+            results.append((num_intersections, rows, pandas_seconds, spark_seconds))
+
+    spark_pipeline.stop()
+
+    print()
+    print(f"Spark session start: {session_seconds:.1f}s (paid once per process)")
+    print(f"{'intersections':>13} {'rows':>11} {'pandas s':>9} {'spark warm s':>13} {'spark cold s':>13}  faster")
+    crossover = None
+    for num_intersections, rows, pandas_seconds, spark_seconds in results:
+        cold = spark_seconds + session_seconds
+        faster = "pandas" if pandas_seconds < cold else "spark"
+        if faster == "spark" and crossover is None:
+            crossover = num_intersections
+        print(f"{num_intersections:>13} {rows:>11,} {pandas_seconds:>9.2f} {spark_seconds:>13.2f} {cold:>13.2f}  {faster}")
+
+    if crossover is None:
+        print(f"pandas was faster end to end at every size up to {results[-1][0]} intersections")
+    else:
+        print(f"Spark (cold) overtakes pandas at about {crossover} intersections")
+
+
+if __name__ == "__main__":
+    main()
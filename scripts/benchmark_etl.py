@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""scripts/benchmark_etl.py
+
+Scaling benchmark for TrafficETLPipeline:
+- generates date-partitioned Parquet inputs with TrafficDataGenerator for every combination
+  of --intersections and --days
+- runs extract, transform, aggregate, forecast and load as separate stages; each stage is
+  persisted and counted before the next one starts, so no stage's cost is hidden in a later,
+  lazier one
+- records wall time per stage and, from the Spark status tracker and REST API (grouped by job
+  group), the jobs, tasks, shuffle bytes and spill of that stage
+- with --validation-overhead, repeats every run with validate=False and reports what the
+  in-pass data quality checks cost
+- writes all results as JSON; --compare flags stages slower than a stored baseline
+
+Run this from the project root, e.g.:
+  python3 scripts/benchmark_etl.py --intersections 20 1000 --days 1 7 --output bench.json
+  python3 scripts/benchmark_etl.py --intersections 20 1000 --days 1 7 --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+import pyarrow.dataset as ds
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.data_generator import TrafficDataGenerator
+from src.etl_pipeline import TrafficETLPipeline
+
+STAGES = ["extract", "transform", "aggregate", "forecast", "load"]
+STAGE_METRICS = {
+    "numTasks": "tasks",
+    "inputBytes": "input_bytes",
+    "shuffleReadBytes": "shuffle_read_bytes",
+    "shuffleWriteBytes": "shuffle_write_bytes",
+    "memoryBytesSpilled": "memory_spilled_bytes",
+    "diskBytesSpilled": "disk_spilled_bytes",
+}
+
+
+def _rest_json(spark, path):
+    url = f"{spark.sparkContext.uiWebUrl}/api/v1/applications/{spark.sparkContext.applicationId}/{path}"
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.load(response)
+
+
+def spark_group_metrics(spark, group, timeout=10.0):
+    """Jobs, tasks, shuffle and spill of every job run under one job group"""
+    tracker = spark.sparkContext.statusTracker()
+    job_ids = tracker.getJobIdsForGroup(group)
+    stage_ids = sorted({s for j in job_ids if tracker.getJobInfo(j) for s in tracker.getJobInfo(j).stageIds})
+    metrics = {"jobs": len(job_ids), "stages": 0, **{name: 0 for name in STAGE_METRICS.values()}}
+    if not spark.sparkContext.uiWebUrl:
+        # no UI: only the status tracker is available, which knows task counts of live stages
+        metrics["tasks"] = sum(tracker.getStageInfo(s).numTasks for s in stage_ids if tracker.getStageInfo(s))
+        return metrics
+
+    # The REST API is fed by the listener bus, so wait until it has seen every stage complete
+    deadline = time.monotonic() + timeout
+    for stage_id in stage_ids:
+        while True:
+            try:
+                attempts = _rest_json(spark, f"stages/{stage_id}")
+            except OSError:
+                attempts = []
+            done = [a for a in attempts if a["status"] in ("COMPLETE", "FAILED")]
+            skipped = [a for a in attempts if a["status"] == "SKIPPED"]
+            if done or skipped or time.monotonic() > deadline:
+                break
+            time.sleep(0.1)
+        for attempt in done:
+            metrics["stages"] += 1
+            for rest_name, name in STAGE_METRICS.items():
+                metrics[name] += attempt.get(rest_name, 0)
+    return metrics
+
+
+def run_stages(pipeline, sensor_path, metadata_path, output_path):
+    """Run the pipeline one materialized stage at a time and time each stage"""
+    spark = pipeline.spark
+    results = {}
+    cached = []
+
+    def stage(name, func):
+        group = f"benchmark-{name}-{time.monotonic_ns()}"
+        if spark is not None:
+            spark.sparkContext.setJobGroup(group, f"benchmark {name}")
+        start = time.perf_counter()
+        value = func()
+        results[name] = {"seconds": time.perf_counter() - start}
+        if spark is not None:
+            results[name].update(spark_group_metrics(spark, group))
+        return value
+
+    def materialize(*frames):
+        if spark is None:
+            return frames
+        frames = [frame.persist(pipeline.storage_level) for frame in frames]
+        for frame in frames:
+            frame.count()
+        cached.extend(frames)
+        return frames
+
+    sensor_df, metadata_df = stage("extract", lambda: materialize(*pipeline.extract(sensor_path, metadata_path)))
+    (enriched_df,) = stage("transform", lambda: materialize(pipeline.transform(sensor_df, metadata_df)))
+    enriched_df, quarantine_df = pipeline.split_quarantine(enriched_df)
+
+    def aggregate():
+        hourly_metrics, intersection_stats = pipeline.aggregate_metrics(enriched_df)
+        datasets = {"hourly_metrics": hourly_metrics, "intersection_stats": intersection_stats}
+        if pipeline.rollups:
+            datasets.update({f"rollups/{k}": v for k, v in pipeline.aggregate_rollups(enriched_df).items()})
+        return dict(zip(datasets, materialize(*datasets.values())))
+
+    datasets = stage("aggregate", aggregate)
+    if pipeline.forecasts:
+        (datasets["forecasts"],) = stage("forecast", lambda: materialize(pipeline.forecast(enriched_df)))
+    if quarantine_df is not None:
+        datasets["quarantine"] = quarantine_df
+    stage("load", lambda: pipeline.write_outputs({"enriched_data": enriched_df, **datasets}, output_path))
+
+    for frame in cached:
+        frame.unpersist()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return a list of stages that got slower than baseline * (1 + threshold)"""
+    expected = {(r["intersections"], r["days"]): r for r in baseline["runs"]}
+    regressions = []
+    for run in results["runs"]:
+        base = expected.get((run["intersections"], run["days"]))
+        if base is None:
+            continue
+        for name, metrics in run["stages"].items():
+            before = base["stages"].get(name, {}).get("seconds")
+            if before and metrics["seconds"] > before * (1 + threshold):
+                regressions.append((run["intersections"], run["days"], name, before, metrics["seconds"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TrafficETLPipeline stages at several scale factors")
+    parser.add_argument("--intersections", type=int, nargs="+", default=[20, 1000])
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 7])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--engine", choices=["spark", "pandas"], default="spark")
+    parser.add_argument("--shuffle-partitions", type=int, default=None)
+    parser.add_argument("--validation-overhead", action="store_true",
+                        help="also run without validation and report the difference")
+    parser.add_argument("--output", default=None, help="write results to this JSON file")
+    parser.add_argument("--compare", default=None, help="baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slow-down before flagging")
+    args = parser.parse_args()
+
+    pipeline = TrafficETLPipeline(app_name="ETLBenchmark", engine=args.engine)
+    # shares the SparkSession of `pipeline`
+    unvalidated = TrafficETLPipeline(app_name="ETLBenchmark", engine=args.engine, validate=False)
+    if pipeline.spark is not None:
+        pipeline.spark.sparkContext.setLogLevel("ERROR")
+        if args.shuffle_partitions:
+            pipeline.spark.conf.set("spark.sql.shuffle.partitions", str(args.shuffle_partitions))
+
+    results = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "engine": args.engine,
+            "spark_version": pipeline.spark.version if pipeline.spark is not None else None,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "runs": [],
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for num_intersections in args.intersections:
+            for days in args.days:
+                raw_dir = os.path.join(workdir, f"raw_{num_intersections}_{days}")
+                generator = TrafficDataGenerator(num_intersections=num_intersections, hours=days * 24, seed=args.seed)
+                metadata_path, sensor_path = generator.save_to_parquet(raw_dir, start_date=datetime(2024, 1, 1))
+
+                stages = run_stages(pipeline, sensor_path, metadata_path, os.path.join(workdir, "processed"))
+                run = {
+                    "intersections": num_intersections,
+                    "days": days,
+                    # rows actually generated, whatever the reading interval
+                    "rows": ds.dataset(sensor_path, format="parquet").count_rows(),
+                    "total_seconds": sum(s["seconds"] for s in stages.values()),
+                    "stages": stages,
+                }
+                if args.validation_overhead:
+                    baseline = run_stages(unvalidated, sensor_path, metadata_path, os.path.join(workdir, "processed"))
+                    without = sum(s["seconds"] for s in baseline.values())
+                    run["stages_without_validation"] = baseline
+                    run["validation_overhead"] = {
+                        "transform_seconds": stages["transform"]["seconds"] - baseline["transform"]["seconds"],
+                        "total_seconds": run["total_seconds"] - without,
+                        "total_pct": (run["total_seconds"] / without - 1) * 100,
+                    }
+                results["runs"].append(run)
+                print(f"{num_intersections:>6} intersections x {days:>3} days: {run['total_seconds']:.2f}s")
+
+    pipeline.stop()
+
+    print()
+    print(f"{'intersections':>13} {'days':>5} {'rows':>12} {'stage':>10} {'seconds':>9} {'tasks':>7} "
+          f"{'shuffle MB':>11} {'spill MB':>9}")
+    for run in results["runs"]:
+        for name in STAGES:
+            if name not in run["stages"]:
+                continue
+            s = run["stages"][name]
+            shuffle = (s.get("shuffle_read_bytes", 0) + s.get("shuffle_write_bytes", 0)) / 1e6
+            spill = (s.get("memory_spilled_bytes", 0) + s.get("disk_spilled_bytes", 0)) / 1e6
+            print(f"{run['intersections']:>13} {run['days']:>5} {run['rows']:>12,} {name:>10} {s['seconds']:>9.2f} "
+                  f"{s.get('tasks', 0):>7} {shuffle:>11.2f} {spill:>9.2f}")
+
+    for run in results["runs"]:
+        if "validation_overhead" in run:
+            overhead = run["validation_overhead"]
+            print(f"validation overhead at {run['intersections']} intersections x {run['days']} days: "
+                  f"{overhead['total_seconds']:+.2f}s ({overhead['total_pct']:+.1f}%), "
+                  f"transform {overhead['transform_seconds']:+.2f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for num_intersections, days, name, before, after in regressions:
+            print(f"REGRESSION {num_intersections} intersections x {days} days, {name}: "
+                  f"{before:.2f}s -> {after:.2f}s (+{(after / before - 1) * 100:.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"No stage slower than baseline by more than {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
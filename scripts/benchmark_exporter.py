@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""scripts/benchmark_exporter.py
+
+Scrape benchmark for TrafficMetricsExporter at fleet scale:
+- writes synthetic hourly_metrics and forecasts tables for --intersections intersections (one
+  hour of day) and gives the exporter percentiles for all of them
+- times update_metrics(), the columnar rendering served on /metrics and, unless
+  --skip-generate-latest, prometheus_client's generate_latest() over the same registry
+- reports series, payload size and time per family
+
+Run this from the project root, e.g.:
+  python3 scripts/benchmark_exporter.py --intersections 100000
+  python3 scripts/benchmark_exporter.py --intersections 1000 10000 100000 --output exporter.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from prometheus_client import generate_latest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.forecasting import HORIZON_MINUTES
+from src.metrics_exporter import TrafficMetricsExporter
+from src.sketches import PERCENTILES, SKETCHES
+from src.tci import congestion_level
+
+
+def write_tables(output_path, num_intersections, seed):
+    """hourly_metrics and forecasts of one hour for num_intersections intersections"""
+    rng = np.random.default_rng(seed)
+    ids = np.array([f"INT_{i:06d}" for i in range(1, num_intersections + 1)], dtype=object)
+    locations = np.array([f"Street {i % 997} & Avenue {i // 997}" for i in range(num_intersections)], dtype=object)
+    tci = np.round(rng.gamma(2.0, 12.0, num_intersections).clip(0, 100), 2)
+
+    os.makedirs(os.path.join(output_path, "hourly_metrics"))
+    pd.DataFrame({
+        "intersection_id": ids,
+        "location": locations,
+        "hour": 0,
+        "total_vehicles": rng.integers(0, 3000, num_intersections),
+        "reading_count": 12,
+        "avg_speed": np.round(rng.uniform(5, 55, num_intersections), 2),
+        "avg_congestion_index": tci,
+    }).to_parquet(os.path.join(output_path, "hourly_metrics", "part-0.parquet"))
+
+    k = len(HORIZON_MINUTES)
+    forecast = np.round((np.repeat(tci, k) + rng.normal(0, 3, num_intersections * k)).clip(0, 100), 2)
+    os.makedirs(os.path.join(output_path, "forecasts"))
+    pd.DataFrame({
+        "intersection_id": np.repeat(ids, k),
+        "location": np.repeat(locations, k),
+        "horizon_minutes": np.tile(np.asarray(HORIZON_MINUTES, dtype=np.int32), num_intersections),
+        "forecast_congestion_index": forecast,
+        "forecast_congestion_level": congestion_level(forecast),
+    }).to_parquet(os.path.join(output_path, "forecasts", "part-0.parquet"))
+
+    quantiles = pd.DataFrame({"intersection_id": ids, "location": locations})
+    for name in SKETCHES:
+        for label, q in PERCENTILES.items():
+            quantiles[f"{name}_{label}"] = np.round(tci * (0.5 + q), 2)
+    return quantiles
+
+
+def timed(func, repeat):
+    """(result of the last call, seconds of every call)"""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        seconds.append(time.perf_counter() - start)
+    return value, seconds
+
+
+def run(num_intersections, repeat, seed, with_generate_latest):
+    with tempfile.TemporaryDirectory() as workdir:
+        quantiles = write_tables(workdir, num_intersections, seed)
+        exporter = TrafficMetricsExporter(data_path=workdir)
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, update_seconds = timed(exporter.update_metrics, 1)
+        # stored sketches are not part of this benchmark; their percentiles are
+        exporter.quantiles = quantiles
+
+        exporter.gauges()  # warm up the Arrow kernels
+        gauges = exporter.gauges()
+        families = {}
+        for gauge in gauges:
+            _, seconds = timed(gauge.render, repeat)
+            families[gauge.name] = {"series": len(gauge), "seconds": statistics.median(seconds)}
+
+        payload, render_seconds = timed(exporter.collector.render, repeat)
+        result = {
+            "intersections": num_intersections,
+            "series": sum(len(gauge) for gauge in gauges),
+            "payload_bytes": len(payload),
+            "update_seconds": update_seconds[0],
+            "render_seconds": statistics.median(render_seconds),
+            "render_seconds_max": max(render_seconds),
+            "families": families,
+        }
+        if with_generate_latest:
+            _, seconds = timed(lambda: generate_latest(exporter.registry), 1)
+            result["generate_latest_seconds"] = seconds[0]
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /metrics rendering of TrafficMetricsExporter")
+    parser.add_argument("--intersections", type=int, nargs="+", default=[100000])
+    parser.add_argument("--repeat", type=int, default=5, help="renders per measurement (median is reported)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-generate-latest", action="store_true",
+                        help="do not time prometheus_client's per-sample rendering (slow at scale)")
+    parser.add_argument("--output", default=None, help="write results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for num_intersections in args.intersections:
+        result = run(num_intersections, args.repeat, args.seed, not args.skip_generate_latest)
+        results.append(result)
+
+        print(f"{num_intersections:,} intersections: {result['series']:,} series, "
+              f"{result['payload_bytes'] / 1e6:.1f} MB, update {result['update_seconds']:.3f}s")
+        print(f"  {'family':<45} {'series':>9} {'seconds':>9}")
+        for name, family in result["families"].items():
+            print(f"  {name:<45} {family['series']:>9,} {family['seconds']:>9.4f}")
+        print(f"  columnar render (all families)                {result['render_seconds']:>19.4f}"
+              f"  (max {result['render_seconds_max']:.4f})")
+        if "generate_latest_seconds" in result:
+            print(f"  generate_latest (all families)                {result['generate_latest_seconds']:>19.4f}"
+                  f"  ({result['generate_latest_seconds'] / result['render_seconds']:.0f}x)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"runs": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
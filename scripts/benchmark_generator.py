@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""scripts/benchmark_generator.py
+
+Throughput benchmark for TrafficDataGenerator.generate_sensor_data:
+- runs the row-by-row "python" engine and the columnar "numpy" engine
+- reports rows/second for each and the speed-up of numpy over the loop
+
+Run this from the project root, e.g.:
+  python3 scripts/benchmark_generator.py --intersections 200 --hours 24
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.data_generator import TrafficDataGenerator
+
+
+def time_engine(generator, engine, start_date, interval_minutes, repeats):
+    """Return (best_seconds, rows) over `repeats` runs of one engine"""
+    best = float("inf")
+    rows = 0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        df = generator.generate_sensor_data(start_date=start_date, interval_minutes=interval_minutes, engine=engine)
+        best = min(best, time.perf_counter() - t0)
+        rows = len(df)
+    return best, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sensor data generation engines")
+    parser.add_argument("--intersections", type=int, default=200)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--interval-minutes", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-python", action="store_true", help="only time the numpy engine")
+    args = parser.parse_args()
+
+    generator = TrafficDataGenerator(num_intersections=args.intersections, hours=args.hours, seed=args.seed)
+    start_date = datetime(2024, 1, 1)
+
+    results = {}
+    engines = ["numpy"] if args.skip_python else ["python", "numpy"]
+    for engine in engines:
+        seconds, rows = time_engine(generator, engine, start_date, args.interval_minutes, args.repeats)
+        results[engine] = seconds
+        print(f"{engine:>6}: {rows:>10,} rows in {seconds:8.3f}s -> {rows / seconds:>14,.0f} rows/s")
+
+    if "python" in results:
+        print(f"speed-up: {results['python'] / results['numpy']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
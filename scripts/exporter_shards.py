@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""scripts/exporter_shards.py
+
+Run the exporter as a fleet of shards, each serving the intersections it owns on the
+consistent-hash ring of src/sharding.py:
+- config: print (or --output) a Prometheus scrape config with one target per shard,
+  host:base-port+i, labelled shard="shard-i"
+- plan:   intersections per shard for --shards N, and how many move when going to each
+  --to M (ids from --data-path, or --intersections synthetic ids)
+- run:    start N src/metrics_exporter.py processes on ports base-port..base-port+N-1, report
+  the series each one serves and keep them running until Ctrl-C (or exit with --check)
+
+Run this from the project root, e.g.:
+  python3 scripts/exporter_shards.py config --shards 4 --host exporter --output prometheus-shards.yml
+  python3 scripts/exporter_shards.py plan --shards 4 --to 5 8 --intersections 100000
+  python3 scripts/exporter_shards.py run --shards 3 --data-path data/processed --check
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from prometheus_client.parser import text_string_to_metric_families
+
+from src.processed_reader import ProcessedDataReader
+from src.sharding import HashRing, moved_keys, scrape_config, shard_counts, shard_names
+
+
+def intersection_ids(data_path, num_intersections):
+    """ids of the processed hourly_metrics table, or synthetic ones when there is none"""
+    if data_path:
+        hourly = ProcessedDataReader(data_path).read("hourly_metrics", ["intersection_id"])
+        if hourly is not None:
+            return sorted(hourly["intersection_id"].dropna().unique())
+    return [f"INT_{i:06d}" for i in range(1, num_intersections + 1)]
+
+
+def plan(ids, shards, targets):
+    ring = HashRing(shard_names(shards))
+    counts = shard_counts(ring, ids)
+    print(f"{len(ids):,} intersections on {shards} shards")
+    for shard, count in counts.items():
+        print(f"  {shard:<10} {count:>9,} ({count / max(len(ids), 1):.1%})")
+    for target in targets:
+        moved = moved_keys(ring, HashRing(shard_names(target)), ids)
+        print(f"{shards} -> {target} shards: {len(moved):,} intersections move "
+              f"({len(moved) / max(len(ids), 1):.1%}; ideal {abs(target - shards) / max(target, shards):.1%})")
+
+
+def scrape(url):
+    """({family: number of samples}, time of the exporter's last successful update)"""
+    with urllib.request.urlopen(url, timeout=10) as response:
+        families = list(text_string_to_metric_families(response.read().decode()))
+    last_success = [f.samples[0].value for f in families if f.name == "traffic_exporter_last_success_timestamp_seconds"]
+    return {f.name: len(f.samples) for f in families}, (last_success or [0])[0]
+
+
+def run(data_path, shards, base_port, update_interval, check, timeout=120):
+    processes = []
+    try:
+        for index in range(shards):
+            processes.append(subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, "src", "metrics_exporter.py"), "--data-path", data_path,
+                 "--port", str(base_port + index), "--update-interval", str(update_interval),
+                 "--shard-index", str(index), "--shard-count", str(shards)],
+                stdout=subprocess.DEVNULL,
+            ))
+
+        total = 0
+        for index in range(shards):
+            url = f"http://127.0.0.1:{base_port + index}/metrics"
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    families, last_success = scrape(url)
+                    if last_success:
+                        break
+                except OSError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"shard-{index} did not serve data within {timeout}s")
+                time.sleep(0.2)
+            intersections = families.get("traffic_congestion_index", 0)
+            total += intersections
+            print(f"shard-{index} {url}: {intersections:,} intersections, "
+                  f"{sum(count for name, count in families.items() if not name.startswith('traffic_exporter_')):,} "
+                  f"traffic series")
+        print(f"{total:,} intersections across {shards} shards")
+
+        if not check:
+            print("Shards running; Ctrl-C to stop")
+            while all(process.poll() is None for process in processes):
+                time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run and plan a sharded exporter fleet")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    config_parser = commands.add_parser("config", help="Prometheus scrape config for the shards")
+    config_parser.add_argument("--shards", type=int, required=True)
+    config_parser.add_argument("--host", default="localhost",
+                               help="host of every shard, or a pattern with {index}, e.g. exporter-{index}")
+    config_parser.add_argument("--base-port", type=int, default=8000)
+    config_parser.add_argument("--job-name", default="traffic_metrics_exporter")
+    config_parser.add_argument("--scrape-interval", default="15s")
+    config_parser.add_argument("--output", default=None, help="write the config to this file")
+
+    plan_parser = commands.add_parser("plan", help="intersections per shard and keys moved when resharding")
+    plan_parser.add_argument("--shards", type=int, required=True)
+    plan_parser.add_argument("--to", type=int, nargs="*", default=[], help="shard counts to compare against")
+    plan_parser.add_argument("--data-path", default=None)
+    plan_parser.add_argument("--intersections", type=int, default=10000)
+
+    run_parser = commands.add_parser("run", help="start one exporter process per shard")
+    run_parser.add_argument("--shards", type=int, required=True)
+    run_parser.add_argument("--data-path", default="data/processed")
+    run_parser.add_argument("--base-port", type=int, default=8000)
+    run_parser.add_argument("--update-interval", type=float, default=30)
+    run_parser.add_argument("--check", action="store_true", help="stop the shards after reporting their series")
+    args = parser.parse_args()
+
+    if args.command == "config":
+        targets = [(shard, f"{args.host.format(index=i)}:{args.base_port + i}")
+                   for i, shard in enumerate(shard_names(args.shards))]
+        config = scrape_config(targets, job_name=args.job_name, scrape_interval=args.scrape_interval)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(config)
+            print(f"Scrape config for {args.shards} shards written to {args.output}")
+        else:
+            print(config, end="")
+    elif args.command == "plan":
+        plan(intersection_ids(args.data_path, args.intersections), args.shards, args.to)
+    else:
+        run(args.data_path, args.shards, args.base_port, args.update_interval, args.check)
+
+
+if __name__ == "__main__":
+    main()
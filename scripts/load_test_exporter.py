@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""scripts/load_test_exporter.py
+
+Load test for the exporter's /metrics endpoint:
+- without --url, writes synthetic processed tables for --intersections intersections (see
+  benchmark_exporter.py) and starts src/metrics_exporter.py once per --server mode in a
+  separate process, so client and server do not share an interpreter
+- --concurrency keep-alive connections scrape as fast as they can for --duration seconds,
+  optionally with Accept-Encoding: gzip and/or If-None-Match of the last ETag
+- reports scrapes/sec, p50/p99/max latency, MB/s and status codes per mode
+
+Run this from the project root, e.g.:
+  python3 scripts/load_test_exporter.py --intersections 10000 --server threaded async
+  python3 scripts/load_test_exporter.py --intersections 10000 --gzip --etag
+  python3 scripts/load_test_exporter.py --url http://localhost:8000/metrics --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from collections import Counter
+
+import numpy as np
+
+from benchmark_exporter import write_tables
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def scrape_loop(host, port, path, deadline, gzip, etag, results):
+    """Scrape over one keep-alive connection until the deadline; append (status, bytes, seconds)"""
+    reader, writer = await asyncio.open_connection(host, port)
+    last_etag = None
+    try:
+        while time.monotonic() < deadline:
+            headers = [f"GET {path} HTTP/1.1", f"Host: {host}"]
+            if gzip:
+                headers.append("Accept-Encoding: gzip")
+            if etag and last_etag:
+                headers.append(f"If-None-Match: {last_etag}")
+            start = time.perf_counter()
+            writer.write(("\r\n".join(headers) + "\r\n\r\n").encode())
+            await writer.drain()
+            head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+            response_headers = {}
+            for line in head[1:]:
+                name, _, value = line.partition(":")
+                response_headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(response_headers.get("content-length", 0)))
+            results.append((int(head[0].split(" ")[1]), len(body), time.perf_counter() - start))
+            last_etag = response_headers.get("etag", last_etag)
+            if response_headers.get("connection", "").lower() == "close":
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+    finally:
+        writer.close()
+
+
+async def load(url, concurrency, duration, gzip, etag):
+    parsed = urllib.parse.urlparse(url)
+    deadline = time.monotonic() + duration
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        scrape_loop(parsed.hostname, parsed.port or 80, parsed.path or "/", deadline, gzip, etag, results)
+        for _ in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+    latencies = np.array([seconds for _, _, seconds in results])
+    return {
+        "scrapes": len(results),
+        "scrapes_per_second": len(results) / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "max_ms": float(latencies.max() * 1000),
+        "mb_per_second": sum(size for _, size, _ in results) / elapsed / 1e6,
+        "status": dict(Counter(status for status, _, _ in results)),
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_exporter(data_path, server, timeout=120):
+    """Run src/metrics_exporter.py in the background; returns (process, url) once it serves data"""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "src", "metrics_exporter.py"), "--data-path", data_path,
+         "--port", str(port), "--server", server, "--update-interval", "3600"],
+        stdout=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/metrics"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                if b"traffic_vehicle_count{" in response.read():
+                    return process, url
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"exporter ({server}) did not serve data within {timeout}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the exporter's /metrics endpoint")
+    parser.add_argument("--url", default=None, help="scrape a running exporter instead of starting one")
+    parser.add_argument("--intersections", type=int, default=10000)
+    parser.add_argument("--server", choices=["threaded", "async"], nargs="+", default=["threaded", "async"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--gzip", action="store_true", help="send Accept-Encoding: gzip")
+    parser.add_argument("--etag", action="store_true", help="send If-None-Match with the last ETag")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="write results to this JSON file")
+    args = parser.parse_args()
+
+    runs = []
+    if args.url:
+        runs.append({"target": args.url, **asyncio.run(load(args.url, args.concurrency, args.duration,
+                                                            args.gzip, args.etag))})
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            write_tables(workdir, args.intersections, args.seed)
+            for server in args.server:
+                process, url = start_exporter(workdir, server)
+                try:
+                    result = asyncio.run(load(url, args.concurrency, args.duration, args.gzip, args.etag))
+                finally:
+                    process.terminate()
+                    process.wait()
+                runs.append({"target": server, "intersections": args.intersections, **result})
+
+    print(f"{args.concurrency} connections, {args.duration:.0f}s, gzip={args.gzip}, etag={args.etag}")
+    print(f"{'target':<10} {'scrapes':>8} {'scrapes/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'MB/s':>8}  status")
+    for run in runs:
+        print(f"{run['target']:<10} {run['scrapes']:>8} {run['scrapes_per_second']:>10.1f} {run['p50_ms']:>8.2f} "
+              f"{run['p99_ms']:>8.2f} {run['max_ms']:>8.2f} {run['mb_per_second']:>8.1f}  {run['status']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"concurrency": args.concurrency, "duration": args.duration, "gzip": args.gzip,
+                       "etag": args.etag, "runs": runs}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
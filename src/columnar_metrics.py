@@ -0,0 +1,177 @@
+"""
+columnar_metrics.py
+Prometheus gauge families built from whole columns instead of one .labels().set() per series
+
+A ColumnarGauge is a metric name, help text, label columns and a value column, typically
+straight from a pandas frame; a ColumnarHistogram buckets a whole value column with one
+searchsorted call, for fleet-wide distributions in a handful of series. ColumnarCollector
+asks a callable for the current gauges whenever it is collected, so a registry only ever
+exposes the series of the current data: rows that disappear take their series with them.
+
+Two ways to expose the same gauges:
+  family()      GaugeMetricFamily with one Sample per row, for any prometheus_client consumer
+  render_text() the text exposition format in one piece; labels and values are escaped,
+                formatted and joined by Arrow compute kernels over whole arrays, which is
+                one to two orders of magnitude faster than generate_latest() per sample
+"""
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from prometheus_client import generate_latest
+from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily, Sample
+from prometheus_client.utils import floatToGoString
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Escapes the text format requires in label values, in the order generate_latest applies them
+_LABEL_ESCAPES = (("\\", "\\\\"), ("\n", "\\n"), ('"', '\\"'))
+
+
+def _label_strings(values):
+    """Label values as a pyarrow string array (nulls as ""), or the str shared by all rows"""
+    if isinstance(values, str):
+        return values
+    column = pa.array(values, from_pandas=True)
+    if not pa.types.is_string(column.type):
+        column = column.cast(pa.string())
+    return column.fill_null("")
+
+
+def _escaped(column):
+    """Label values escaped for the text format"""
+    for old, new in _LABEL_ESCAPES:
+        column = column.replace(old, new) if isinstance(column, str) else pc.replace_substring(column, old, new)
+    return column
+
+
+def _value_column(values):
+    """Values as text; Arrow prints shortest round-trip floats, e.g. 42 for 42.0"""
+    values = pa.array(np.asarray(values, dtype=np.float64))
+    text = values.cast(pa.string())
+    if not np.isfinite(values.to_numpy()).all():
+        text = pc.if_else(pc.is_nan(values), "NaN", text)
+        text = pc.if_else(pc.equal(values, np.inf), "+Inf", text)
+        text = pc.if_else(pc.equal(values, -np.inf), "-Inf", text)
+    return text
+
+
+def _joined(strings):
+    """All values of a pyarrow string array back to back, read from its data buffer"""
+    if not len(strings):
+        return b""
+    strings = strings.combine_chunks() if isinstance(strings, pa.ChunkedArray) else strings
+    offsets = np.frombuffer(strings.buffers()[1], dtype=np.int32)
+    start, stop = offsets[strings.offset], offsets[strings.offset + len(strings)]
+    return strings.buffers()[2].to_pybytes()[start:stop]
+
+
+class ColumnarGauge:
+    """One gauge family whose series are the rows of label columns and a value column
+
+    labels maps label name -> column (array, list or Series, one entry per row) or a str
+    shared by every row.
+    """
+
+    def __init__(self, name, documentation, labels, values):
+        self.name = name
+        self.documentation = documentation
+        self.labels = dict(sorted(labels.items()))  # the text format lists labels sorted
+        self.values = np.asarray(values, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.values)
+
+    def family(self):
+        """The gauge as a GaugeMetricFamily"""
+        family = GaugeMetricFamily(self.name, self.documentation, labels=list(self.labels))
+        columns = [_label_strings(values) for values in self.labels.values()]
+        columns = [[c] * len(self) if isinstance(c, str) else c.to_pylist() for c in columns]
+        names = list(self.labels)
+        rows = zip(*columns) if columns else [()] * len(self)
+        family.samples = [
+            Sample(self.name, dict(zip(names, row)), value, None, None)
+            for row, value in zip(rows, self.values.tolist())
+        ]
+        return family
+
+    def render(self):
+        """The gauge in the Prometheus text exposition format, as bytes"""
+        documentation = self.documentation.replace("\\", "\\\\").replace("\n", "\\n")
+        header = f"# HELP {self.name} {documentation}\n# TYPE {self.name} gauge\n".encode()
+        if not len(self):
+            return header
+        parts = []
+        for i, (label, values) in enumerate(self.labels.items()):
+            parts += [f'{"," if i else "{"}{label}="', _escaped(_label_strings(values)), '"']
+        parts += ["} " if self.labels else " ", _value_column(self.values), "\n"]
+        line = pc.binary_join_element_wise(self.name, *parts, "")
+        return header + _joined(line)
+
+
+class _Families:
+    """Registry stand-in for rendering metric families with generate_latest"""
+
+    def __init__(self, families):
+        self.families = families
+
+    def collect(self):
+        return self.families
+
+
+class ColumnarHistogram:
+    """Histogram of every non-missing value of a column, without labels
+
+    buckets are the finite upper bounds (le) in ascending order; +Inf is added.
+    """
+
+    def __init__(self, name, documentation, buckets, values):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = np.asarray(buckets, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        # bucket i holds bounds[i-1] < value <= bounds[i]; cumulated that is the count for le=bounds[i]
+        counts = np.bincount(np.searchsorted(self.buckets, values, side="left"), minlength=len(self.buckets) + 1)
+        self.cumulative_counts = np.cumsum(counts)
+        self.sum = float(values.sum())
+
+    def __len__(self):
+        return len(self.cumulative_counts) + 2  # buckets, _count and _sum
+
+    def family(self):
+        """The histogram as a HistogramMetricFamily"""
+        les = [floatToGoString(bound) for bound in self.buckets] + ["+Inf"]
+        return HistogramMetricFamily(
+            self.name, self.documentation, buckets=list(zip(les, self.cumulative_counts.tolist())), sum_value=self.sum
+        )
+
+    def render(self):
+        """The histogram in the Prometheus text exposition format, as bytes"""
+        return generate_latest(_Families([self.family()]))
+
+
+def render_text(metrics):
+    """Text exposition of a list of ColumnarGauges and ColumnarHistograms, as bytes"""
+    return b"".join(metric.render() for metric in metrics)
+
+
+def render_collectors(collectors):
+    """Text exposition of ordinary prometheus_client metrics (anything with collect()), as bytes"""
+    return generate_latest(_Families([family for collector in collectors for family in collector.collect()]))
+
+
+class ColumnarCollector:
+    """Registry collector that exposes whatever gauges_func() returns at each scrape
+
+    gauges_func returns ColumnarGauges and ColumnarHistograms.
+    """
+
+    def __init__(self, gauges_func):
+        self.gauges_func = gauges_func
+
+    def collect(self):
+        for metric in self.gauges_func():
+            yield metric.family()
+
+    def render(self):
+        return render_text(self.gauges_func())
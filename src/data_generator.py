@@ -4,19 +4,39 @@ data_generator.py
 Generates synthetic traffic sensor data for the smart traffic control system
 """
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import random
 import os
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
 
+# Congestion ratio thresholds and matching (low, high) speed bands in mph
+SPEED_RATIO_THRESHOLDS = np.array([0.3, 0.6, 0.8])
+SPEED_BANDS_LOW = np.array([45.0, 30.0, 15.0, 5.0])
+SPEED_BANDS_HIGH = np.array([55.0, 45.0, 30.0, 15.0])
+
+
 class TrafficDataGenerator:
     """Generate synthetic traffic sensor data for intersections"""
 
-    def __init__(self, num_intersections=20, hours=24):
-        self.num_intersections = num_intersections
+    def __init__(self, num_intersections=20, hours=24, seed=None, intersections=None):
         self.hours = hours
-        self.intersections = self._create_intersections()
+        self.seed = seed
+        self._random = random.Random(seed)
+        self.rng = np.random.default_rng(seed)
+        if intersections is None:
+            self.num_intersections = num_intersections
+            self.intersections = self._create_intersections()
+        else:
+            # Reuse metadata created elsewhere (e.g. by the parent of a sharded run)
+            self.num_intersections = len(intersections)
+            self.intersections = intersections.reset_index(drop=True)
 
     def _create_intersections(self):
         """Create intersection metadata"""
@@ -36,10 +56,10 @@ class TrafficDataGenerator:
             intersections.append({
                 "intersection_id": f"INT_{i+1:03d}",
                 "location": locations[i] if i < len(locations) else f"Intersection {i+1}",
-                "latitude": 40.7128 + random.uniform(-0.5, 0.5),
-                "longitude": -74.0060 + random.uniform(-0.5, 0.5),
-                "num_lanes": random.choice([2, 3, 4, 6]),
-                "capacity_per_hour": random.randint(800, 2000),
+                "latitude": 40.7128 + self._random.uniform(-0.5, 0.5),
+                "longitude": -74.0060 + self._random.uniform(-0.5, 0.5),
+                "num_lanes": self._random.choice([2, 3, 4, 6]),
+                "capacity_per_hour": self._random.randint(800, 2000),
             })
         return pd.DataFrame(intersections)
 
@@ -48,30 +68,101 @@ class TrafficDataGenerator:
         # Peak hours: 7-9 AM and 5-7 PM on weekdays
         if not is_weekend:
             if 7 <= hour <= 9:
-                return random.uniform(0.7, 0.95)  # Morning rush
+                return self._random.uniform(0.7, 0.95)  # Morning rush
             elif 17 <= hour <= 19:
-                return random.uniform(0.75, 1.0)  # Evening rush
+                return self._random.uniform(0.75, 1.0)  # Evening rush
             elif 12 <= hour <= 14:
-                return random.uniform(0.5, 0.7)  # Lunch time
+                return self._random.uniform(0.5, 0.7)  # Lunch time
             elif 22 <= hour or hour <= 5:
-                return random.uniform(0.1, 0.3)  # Night time
+                return self._random.uniform(0.1, 0.3)  # Night time
             else:
-                return random.uniform(0.4, 0.6)  # Normal hours
+                return self._random.uniform(0.4, 0.6)  # Normal hours
         else:
             # Weekend patterns
             if 10 <= hour <= 20:
-                return random.uniform(0.4, 0.6)
+                return self._random.uniform(0.4, 0.6)
             else:
-                return random.uniform(0.2, 0.4)
+                return self._random.uniform(0.2, 0.4)
+
+    @staticmethod
+    def _traffic_pattern_bands(hours, is_weekend):
+        """Vectorized (low, high) multiplier bands matching _generate_traffic_pattern"""
+        hours = np.asarray(hours)
+        is_weekend = np.asarray(is_weekend, dtype=bool)
+
+        weekday_conditions = [
+            (hours >= 7) & (hours <= 9),  # Morning rush
+            (hours >= 17) & (hours <= 19),  # Evening rush
+            (hours >= 12) & (hours <= 14),  # Lunch time
+            (hours >= 22) | (hours <= 5),  # Night time
+        ]
+        weekday_low = np.select(weekday_conditions, [0.7, 0.75, 0.5, 0.1], default=0.4)
+        weekday_high = np.select(weekday_conditions, [0.95, 1.0, 0.7, 0.3], default=0.6)
+
+        weekend_day = (hours >= 10) & (hours <= 20)
+        weekend_low = np.where(weekend_day, 0.4, 0.2)
+        weekend_high = np.where(weekend_day, 0.6, 0.4)
+
+        low = np.where(is_weekend, weekend_low, weekday_low)
+        high = np.where(is_weekend, weekend_high, weekday_high)
+        return low, high
+
+    def _generate_sensor_block(self, intersections, start_date, num_intervals, interval_minutes=5, rng=None):
+        """Generate readings for a block of intersections as whole columns.
+
+        Rows are ordered intersection-major, then by timestamp, like the loop engine.
+        """
+        rng = self.rng if rng is None else rng
+
+        timestamps = pd.Timestamp(start_date) + pd.to_timedelta(
+            np.arange(num_intervals, dtype=np.int64) * interval_minutes, unit="m"
+        )
+        low, high = self._traffic_pattern_bands(timestamps.hour, timestamps.dayofweek >= 5)
+
+        num_rows = len(intersections) * num_intervals
+        intervals_per_hour = 60 / interval_minutes
+        capacity = np.repeat(intersections["capacity_per_hour"].to_numpy(dtype=np.float64), num_intervals)
+
+        # Get traffic pattern multiplier
+        pattern_multiplier = rng.uniform(np.tile(low, len(intersections)), np.tile(high, len(intersections)))
+
+        # Base vehicle count with pattern
+        base_count = capacity * pattern_multiplier
+        vehicle_count = (base_count * rng.uniform(0.8, 1.2, num_rows) / intervals_per_hour).astype(np.int64)
+
+        # Speed inversely related to congestion
+        congestion_ratio = vehicle_count / (capacity / intervals_per_hour)
+        band = np.searchsorted(SPEED_RATIO_THRESHOLDS, congestion_ratio, side="right")
+        avg_speed = rng.uniform(SPEED_BANDS_LOW[band], SPEED_BANDS_HIGH[band])
+
+        return pd.DataFrame(
+            {
+                "timestamp": np.tile(timestamps.to_numpy(), len(intersections)),
+                "intersection_id": np.repeat(intersections["intersection_id"].to_numpy(), num_intervals),
+                "vehicle_count": vehicle_count,
+                "average_speed": np.round(avg_speed, 2),
+                "num_lanes": np.repeat(intersections["num_lanes"].to_numpy(), num_intervals),
+            }
+        )
 
-    def generate_sensor_data(self, start_date=None, interval_minutes=5):
-        """Generate time-series sensor data"""
+    def generate_sensor_data(self, start_date=None, interval_minutes=5, engine="numpy"):
+        """Generate time-series sensor data
+
+        engine="numpy" builds whole columns with the seeded numpy Generator;
+        engine="python" is the original row-by-row loop, kept as a reference.
+        """
         if start_date is None:
             start_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
 
-        data = []
         total_intervals = (self.hours * 60) // interval_minutes
 
+        if engine == "numpy":
+            return self._generate_sensor_block(self.intersections, start_date, total_intervals, interval_minutes)
+        if engine != "python":
+            raise ValueError(f"Unknown generation engine: {engine}")
+
+        data = []
+
         for intersection in self.intersections.to_dict("records"):
             for i in range(total_intervals):
                 timestamp = start_date + timedelta(minutes=i * interval_minutes)
@@ -83,18 +174,18 @@ class TrafficDataGenerator:
 
                 # Base vehicle count with pattern
                 base_count = intersection["capacity_per_hour"] * pattern_multiplier
-                vehicle_count = int(base_count * random.uniform(0.8, 1.2) / (60 / interval_minutes))
+                vehicle_count = int(base_count * self._random.uniform(0.8, 1.2) / (60 / interval_minutes))
 
                 # Speed inversely related to congestion
                 congestion_ratio = vehicle_count / (intersection["capacity_per_hour"] / (60 / interval_minutes))
                 if congestion_ratio < 0.3:
-                    avg_speed = random.uniform(45, 55)
+                    avg_speed = self._random.uniform(45, 55)
                 elif congestion_ratio < 0.6:
-                    avg_speed = random.uniform(30, 45)
+                    avg_speed = self._random.uniform(30, 45)
                 elif congestion_ratio < 0.8:
-                    avg_speed = random.uniform(15, 30)
+                    avg_speed = self._random.uniform(15, 30)
                 else:
-                    avg_speed = random.uniform(5, 15)
+                    avg_speed = self._random.uniform(5, 15)
 
                 data.append(
                     {
@@ -127,6 +218,175 @@ class TrafficDataGenerator:
 
         return metadata_path, sensor_path
 
+    def _iter_day_windows(self, start_date, total_intervals, interval_minutes):
+        """Split the requested intervals at midnight into (date, window_start, num_intervals)"""
+        offset = 0
+        while offset < total_intervals:
+            window_start = pd.Timestamp(start_date) + pd.Timedelta(minutes=offset * interval_minutes)
+            next_midnight = window_start.normalize() + pd.Timedelta(days=1)
+            until_midnight = -(-(next_midnight - window_start) // pd.Timedelta(minutes=interval_minutes))
+            num_intervals = min(until_midnight, total_intervals - offset)
+            yield window_start.date(), window_start, num_intervals
+            offset += num_intervals
+
+    def iter_sensor_chunks(self, start_date=None, interval_minutes=5, intersections_per_chunk=1000, rng=None):
+        """Yield (date, DataFrame) chunks of at most one day x intersections_per_chunk intersections"""
+        if start_date is None:
+            start_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        total_intervals = (self.hours * 60) // interval_minutes
+        for day, window_start, num_intervals in self._iter_day_windows(start_date, total_intervals, interval_minutes):
+            for block_start in range(0, len(self.intersections), intersections_per_chunk):
+                block = self.intersections.iloc[block_start:block_start + intersections_per_chunk]
+                yield day, self._generate_sensor_block(block, window_start, num_intervals, interval_minutes, rng)
+
+    def _write_parquet_chunks(self, sensor_path, start_date=None, interval_minutes=5, intersections_per_chunk=1000,
+                              compression="zstd", prefix="part", rng=None):
+        """Write each generated chunk to its date partition and return [{"path", "rows"}, ...]"""
+        files = []
+        day_index = -1
+        last_day = None
+        block_index = 0
+
+        chunks = self.iter_sensor_chunks(start_date, interval_minutes, intersections_per_chunk, rng)
+        for day, chunk in chunks:
+            if day != last_day:
+                day_index += 1
+                block_index = 0
+                last_day = day
+
+            partition = f"date={day.isoformat()}"
+            os.makedirs(os.path.join(sensor_path, partition), exist_ok=True)
+            file_name = f"{prefix}-{day_index:05d}-{block_index:05d}.parquet"
+
+            # Spark cannot read nanosecond Parquet timestamps, so store microseconds
+            pq.write_table(
+                pa.Table.from_pandas(chunk, preserve_index=False),
+                os.path.join(sensor_path, partition, file_name),
+                compression=compression,
+                coerce_timestamps="us",
+            )
+            files.append({"path": f"{partition}/{file_name}", "rows": len(chunk)})
+            block_index += 1
+
+        return files
+
+    def save_to_parquet(self, output_dir="data/raw", start_date=None, interval_minutes=5,
+                        intersections_per_chunk=1000, compression="zstd"):
+        """Stream sensor data to date-partitioned Parquet, one chunk in memory at a time
+
+        Layout: <output_dir>/traffic_sensor_data/date=YYYY-MM-DD/part-<day>-<block>.parquet
+        Any previous traffic_sensor_data directory is replaced.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+
+        metadata_path = os.path.join(output_dir, "intersection_metadata.csv")
+        self.intersections.to_csv(metadata_path, index=False)
+
+        sensor_path = os.path.join(output_dir, "traffic_sensor_data")
+        # a previous, larger run would otherwise leave part files behind for dataset reads
+        shutil.rmtree(sensor_path, ignore_errors=True)
+        files = self._write_parquet_chunks(
+            sensor_path, start_date, interval_minutes, intersections_per_chunk, compression
+        )
+        total_rows = sum(f["rows"] for f in files)
+
+        print(f"Saved intersection metadata to {metadata_path}")
+        print(f"Saved sensor data to {sensor_path} ({len(files)} {compression} Parquet files)")
+        print(f"Generated {total_rows} sensor readings for {self.num_intersections} intersections")
+
+        return metadata_path, sensor_path
+
+    def save_sharded(self, output_dir="data/raw", num_shards=8, workers=None, start_date=None,
+                     interval_minutes=5, intersections_per_chunk=1000, compression="zstd"):
+        """Generate sensor data in parallel, one process-pool task per shard of intersections
+
+        Each shard draws from its own child of SeedSequence(master_seed), so the output only
+        depends on the master seed and num_shards, never on the number of workers. Intersection
+        metadata is created once here and handed to every shard. A _manifest.json next to the
+        Parquet files records the seeds, files and row counts of each shard. Any previous
+        traffic_sensor_data directory is replaced.
+        """
+        if start_date is None:
+            start_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        os.makedirs(output_dir, exist_ok=True)
+        metadata_path = os.path.join(output_dir, "intersection_metadata.csv")
+        self.intersections.to_csv(metadata_path, index=False)
+
+        master_seed = self.seed if self.seed is not None else np.random.SeedSequence().entropy
+        shard_seeds = np.random.SeedSequence(master_seed).spawn(num_shards)
+        shard_rows = np.array_split(np.arange(len(self.intersections)), num_shards)
+
+        sensor_path = os.path.join(output_dir, "traffic_sensor_data")
+        # stale shards and manifest of a previous run must not mix with this one
+        shutil.rmtree(sensor_path, ignore_errors=True)
+        tasks = [
+            {
+                "shard": shard,
+                "intersections": self.intersections.iloc[rows],
+                "seed": shard_seeds[shard],
+                "hours": self.hours,
+                "sensor_path": sensor_path,
+                "start_date": start_date,
+                "interval_minutes": interval_minutes,
+                "intersections_per_chunk": intersections_per_chunk,
+                "compression": compression,
+            }
+            for shard, rows in enumerate(shard_rows)
+            if len(rows)
+        ]
+
+        if workers == 1:
+            shards = [_generate_shard(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                shards = list(pool.map(_generate_shard, tasks))
+
+        manifest = {
+            "master_seed": int(master_seed),
+            "num_shards": num_shards,
+            "start_date": pd.Timestamp(start_date).isoformat(),
+            "hours": self.hours,
+            "interval_minutes": interval_minutes,
+            "compression": compression,
+            "total_rows": sum(shard["rows"] for shard in shards),
+            "shards": shards,
+        }
+        manifest_path = os.path.join(sensor_path, "_manifest.json")
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        print(f"Saved intersection metadata to {metadata_path}")
+        print(f"Saved {len(shards)} shards to {sensor_path} (manifest: {manifest_path})")
+        print(f"Generated {manifest['total_rows']} sensor readings for {self.num_intersections} intersections")
+
+        return metadata_path, sensor_path, manifest_path
+
+
+def _generate_shard(task):
+    """Process-pool entry point: write one shard of intersections and describe its output"""
+    generator = TrafficDataGenerator(hours=task["hours"], intersections=task["intersections"])
+    files = generator._write_parquet_chunks(
+        task["sensor_path"],
+        task["start_date"],
+        task["interval_minutes"],
+        task["intersections_per_chunk"],
+        task["compression"],
+        prefix=f"shard-{task['shard']:05d}",
+        rng=np.random.default_rng(task["seed"]),
+    )
+    intersection_ids = generator.intersections["intersection_id"]
+    return {
+        "shard": task["shard"],
+        "seed_spawn_key": list(task["seed"].spawn_key),
+        "num_intersections": len(intersection_ids),
+        "first_intersection_id": intersection_ids.iloc[0],
+        "last_intersection_id": intersection_ids.iloc[-1],
+        "rows": sum(f["rows"] for f in files),
+        "files": files,
+    }
+
 
 if __name__ == "__main__":
     generator = TrafficDataGenerator(num_intersections=20, hours=24)
@@ -4,20 +4,86 @@ etl_pipeline.py
 PySpark ETL Pipeline for processing traffic sensor data
 """
 
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, avg, sum as spark_sum, count, hour, when
-from pyspark.sql.functions import round as spark_round
-from pyspark.sql.types import TimestampType
+from pyspark import StorageLevel
+from pyspark.sql import Observation, SparkSession
+from pyspark.sql.functions import col, avg, sum as spark_sum, count, hour, lit, to_date, when
+from pyspark.sql.functions import max as spark_max
+from pyspark.sql.types import (
+    DoubleType, IntegerType, StringType, StructField, StructType, TimestampNTZType, TimestampType,
+)
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import functools
+import json
 import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from typing import Optional
 
+try:
+    from .pandas_engine import CLUSTER_COLUMNS, HOURLY_KEYS, INTERSECTION_KEYS, PARTITION_COLUMNS, PandasTrafficEngine
+    from .forecasting import HISTORY_DAYS, spark_forecasts
+    from .rollups import spark_merge_rollup, spark_rollups
+    from .serving_snapshots import publish_processed_tables
+    from .sketches import DAILY_SKETCH_KEYS, HOURLY_SKETCH_KEYS, spark_merge_sketches, spark_sketches
+    from .tci import congestion_index, spark_congestion_columns, spark_congestion_level
+    from .validation import spark_violation_counts, with_spark_quality_issues
+except ImportError:  # run as a script: python src/etl_pipeline.py
+    from pandas_engine import CLUSTER_COLUMNS, HOURLY_KEYS, INTERSECTION_KEYS, PARTITION_COLUMNS, PandasTrafficEngine
+    from forecasting import HISTORY_DAYS, spark_forecasts
+    from rollups import spark_merge_rollup, spark_rollups
+    from serving_snapshots import publish_processed_tables
+    from sketches import DAILY_SKETCH_KEYS, HOURLY_SKETCH_KEYS, spark_merge_sketches, spark_sketches
+    from tci import congestion_index, spark_congestion_columns, spark_congestion_level
+    from validation import spark_violation_counts, with_spark_quality_issues
+
+
+SENSOR_SCHEMA = StructType(
+    [
+        StructField("timestamp", TimestampType()),
+        StructField("intersection_id", StringType()),
+        StructField("vehicle_count", IntegerType()),
+        StructField("average_speed", DoubleType()),
+        StructField("num_lanes", IntegerType()),
+    ]
+)
+
+# Target Parquet row group size of the partitioned layout, about PandasTrafficEngine's ROW_GROUP_ROWS
+ROW_GROUP_BYTES = 128 * 1024
+
+
+def _releases_cache(run):
+    """Give a run_* entry point fresh observations and unpersist what it cached, even if it fails
+
+    The pipeline may live as long as its SparkSession (see etl_service.py); without this every
+    run would leave its cached frames behind, and a repeated run could match the previous run's
+    cached plan and never fill its observations.
+    """
+    @functools.wraps(run)
+    def wrapper(self, *args, **kwargs):
+        self._runs += 1
+        self._observations = {}
+        try:
+            return run(self, *args, **kwargs)
+        finally:
+            for df in self._persisted:
+                df.unpersist()
+            self._persisted = []
+
+    return wrapper
+
 
 def compute_traffic_congestion_index(
     vehicle_count: float, average_speed: float, capacity_per_hour: float, interval_minutes: int = 5
 ) -> float:
     """Pure helper to compute the Traffic Congestion Index (TCI) for a single reading.
 
-    This mirrors the logic used in the Spark transformation:
+    Scalar wrapper around tci.congestion_index, the definition shared with the Spark and
+    pandas paths:
       - capacity_per_5min = capacity_per_hour / (60 / interval_minutes)
       - volume_ratio = vehicle_count / capacity_per_5min
       - speed_factor = 1 - (average_speed / 55.0)
@@ -30,27 +96,73 @@ def compute_traffic_congestion_index(
     try:
         if capacity_per_hour is None or capacity_per_hour <= 0:
             return 0.0
-
-        intervals_per_hour = 60 // interval_minutes
-        capacity_per_interval = capacity_per_hour / intervals_per_hour
-        if capacity_per_interval == 0:
-            return 0.0
-
-        volume_ratio = float(vehicle_count) / float(capacity_per_interval)
-        speed_factor = 1.0 - (float(average_speed) / 55.0)
-
-        raw = volume_ratio * speed_factor * 100.0
-        tci = min(raw, 100.0)
-        return round(tci, 2)
+        return float(congestion_index(vehicle_count, average_speed, capacity_per_hour, interval_minutes))
     except Exception:
         return 0.0
 
 
 class TrafficETLPipeline:
-    """ETL Pipeline for traffic data processing using PySpark"""
+    """ETL Pipeline for traffic data processing using PySpark
+
+    With single_materialization=True (the default) no action runs just to log a count: the
+    enriched frame is persisted once at `storage_level` and reused by every write, and row
+    counts and stage statistics are collected with observe() as a side effect of those writes.
+    Everything a run_* method caches is unpersisted when it returns, so one pipeline (and its
+    SparkSession) can serve any number of runs.
+
+    engine="pandas" runs extract/transform/aggregate_metrics/load in-process with
+    PandasTrafficEngine instead, with no JVM or Spark planning; for small and medium datasets
+    that is faster end to end. The Spark-only features (run_incremental, streaming) need
+    engine="spark".
+
+    layout="partitioned" (the default) writes enriched_data as date=/hour= directories with rows
+    sorted by intersection_id and small row groups, so ProcessedDataReader lookups for one hour
+    or one intersection skip most of the data. layout="flat" keeps a single unpartitioned directory.
 
-    def __init__(self, app_name="TrafficETL"):
-        self.spark = self._create_spark_session(app_name)
+    rollups=True also writes the pre-aggregated tables of rollups.ROLLUPS (5-minute to daily,
+    day-of-week x hour, time of day x congestion level) under rollups/, all from one aggregation.
+
+    percentiles=True also writes mergeable quantile sketches of congestion index and speed, with
+    their p50/p95/p99, per intersection x date x hour (percentiles/hourly) and per day
+    (percentiles/daily, merged from the hourly sketches). See sketches.py.
+
+    forecasts=True refits a seasonal baseline + AR(1) model of the congestion index for every
+    intersection on each run and writes the next 15-60 minutes to the forecasts table, see
+    forecasting.py. The "forecasts" sink report holds the fit-and-write time.
+
+    serving_snapshots=True publishes the serving tables (aggregates, percentiles, forecasts) at
+    the end of every run as a new immutable Arrow IPC snapshot under _serving/, switched in by
+    an atomic rename, so the exporter and UI never read a half-written run.
+
+    validate=True checks every reading against the rules in validation.py while it is enriched.
+    Rows that break a rule are written to the quarantine dataset with their reason codes instead
+    of enriched_data and the aggregates. Per-rule counts are observed as the "validation" stage.
+    """
+
+    def __init__(self, app_name="TrafficETL", single_materialization=True, storage_level="MEMORY_AND_DISK",
+                 csv_exports=True, engine="spark", interval_minutes=5, layout="partitioned", rollups=True,
+                 validate=True, percentiles=True, forecasts=True, serving_snapshots=True):
+        if engine not in ("spark", "pandas"):
+            raise ValueError(f"Unknown ETL engine: {engine}")
+        if layout not in ("partitioned", "flat"):
+            raise ValueError(f"Unknown output layout: {layout}")
+        self.engine = engine
+        self.enriched_partition_by = PARTITION_COLUMNS if layout == "partitioned" else None
+        self.interval_minutes = interval_minutes
+        self.validate = validate
+        self._local_engine = PandasTrafficEngine(interval_minutes, validate) if engine == "pandas" else None
+        self.spark = self._create_spark_session(app_name) if engine == "spark" else None
+        self.single_materialization = single_materialization
+        self.storage_level = getattr(StorageLevel, storage_level)
+        self.csv_exports = csv_exports
+        self.rollups = rollups
+        self.percentiles = percentiles
+        self.forecasts = forecasts
+        self.serving_snapshots = serving_snapshots
+        self.sink_reports = {}
+        self._observations = {}
+        self._persisted = []  # frames cached by the current run, unpersisted when it ends
+        self._runs = 0
 
     def _create_spark_session(self, app_name):
         """Create and configure Spark session"""
@@ -58,23 +170,56 @@ class TrafficETLPipeline:
             SparkSession.builder.appName(app_name)
             .config("spark.sql.adaptive.enabled", "true")
             .config("spark.sql.adaptive.coalescePartitions.enabled", "true")
+            # Readings carry wall-clock times without a zone. A UTC session keeps hour()/to_date()
+            # and the pandas <-> Spark conversions from shifting them on non-UTC machines.
+            .config("spark.sql.session.timeZone", "UTC")
+            # Standard int64 timestamps so pyarrow-based readers and exports get plain datetimes
+            .config("spark.sql.parquet.outputTimestampType", "TIMESTAMP_MICROS")
             .getOrCreate()
         )
 
     def extract(self, sensor_data_path, metadata_path):
-        """Extract data from CSV files"""
+        """Extract data from CSV files or a partitioned Parquet directory"""
+        if self._local_engine is not None:
+            return self._local_engine.extract(sensor_data_path, metadata_path)
+
         print(f"Extracting data from {sensor_data_path} and {metadata_path}")
 
-        sensor_df = self.spark.read.csv(sensor_data_path, header=True, inferSchema=True)
+        if sensor_data_path.endswith(".csv"):
+            sensor_df = self.spark.read.csv(sensor_data_path, header=True, inferSchema=True)
+        else:
+            sensor_df = self.spark.read.parquet(sensor_data_path)
         metadata_df = self.spark.read.csv(metadata_path, header=True, inferSchema=True)
 
-        print(f"Extracted {sensor_df.count()} sensor records")
-        print(f"Extracted {metadata_df.count()} intersection records")
+        if self.single_materialization:
+            sensor_df = self._observe(sensor_df, "sensor_records", count(lit(1)).alias("rows"))
+            metadata_df = self._observe(metadata_df, "intersection_records", count(lit(1)).alias("rows"))
+        else:
+            print(f"Extracted {sensor_df.count()} sensor records")
+            print(f"Extracted {metadata_df.count()} intersection records")
 
         return sensor_df, metadata_df
 
+    def _observe(self, df, name, *exprs):
+        """Attach named metrics that are filled in by the first action over df"""
+        if df.isStreaming:
+            return df  # Observation objects only support batch queries
+        # unique per run, so a plan cached by an earlier run never stands in for this one
+        observation = Observation(f"{name}_{self._runs}")
+        self._observations[name] = observation
+        return df.observe(observation, *exprs)
+
+    def stage_stats(self):
+        """Return the observed metrics of each stage; call after an action has run"""
+        if self._local_engine is not None:
+            return dict(self._local_engine.stats)
+        return {name: observation.get for name, observation in self._observations.items()}
+
     def transform(self, sensor_df, metadata_df):
         """Transform and enrich traffic data"""
+        if self._local_engine is not None:
+            return self._local_engine.transform(sensor_df, metadata_df)
+
         print("Starting transformation...")
 
         sensor_df = sensor_df.withColumn("timestamp", col("timestamp").cast(TimestampType()))
@@ -97,20 +242,10 @@ class TrafficETLPipeline:
             col("m.capacity_per_hour").alias("capacity_per_hour"),
         )
 
-        enriched_df = enriched_df.withColumn("capacity_per_5min", col("capacity_per_hour") / 12)
-        enriched_df = enriched_df.withColumn("volume_ratio", col("vehicle_count") / col("capacity_per_5min"))
-        enriched_df = enriched_df.withColumn("speed_factor", 1 - (col("average_speed") / 55.0))
-
-        enriched_df = enriched_df.withColumn(
-            "traffic_congestion_index",
-            spark_round(
-                when(col("volume_ratio") * col("speed_factor") * 100 > 100, 100).otherwise(
-                    col("volume_ratio") * col("speed_factor") * 100
-                ),
-                2,
-            ),
-        )
+        for name, expr in spark_congestion_columns(self.interval_minutes).items():
+            enriched_df = enriched_df.withColumn(name, expr)
 
+        enriched_df = enriched_df.withColumn("date", to_date("timestamp"))
         enriched_df = enriched_df.withColumn("hour", hour("timestamp"))
         enriched_df = enriched_df.withColumn(
             "time_of_day",
@@ -120,66 +255,217 @@ class TrafficETLPipeline:
             .otherwise("Night"),
         )
 
-        enriched_df = enriched_df.withColumn(
-            "congestion_level",
-            when(col("traffic_congestion_index") < 20, "Low")
-            .when(col("traffic_congestion_index") < 40, "Moderate")
-            .when(col("traffic_congestion_index") < 60, "High")
-            .when(col("traffic_congestion_index") < 80, "Severe")
-            .otherwise("Critical"),
-        )
+        enriched_df = enriched_df.withColumn("congestion_level", spark_congestion_level(col("traffic_congestion_index")))
+        if self.validate:
+            enriched_df = with_spark_quality_issues(enriched_df, self.interval_minutes)
 
-        print(f"Transformation complete. Total records: {enriched_df.count()}")
+        if self.single_materialization:
+            enriched_df = self._observe(
+                enriched_df,
+                "enriched_records",
+                count(lit(1)).alias("rows"),
+                count(when(col("capacity_per_hour").isNull(), 1)).alias("missing_capacity"),
+                spark_sum("vehicle_count").alias("total_vehicles"),
+                avg("traffic_congestion_index").alias("avg_congestion_index"),
+                spark_max("traffic_congestion_index").alias("max_congestion_index"),
+            )
+            if self.validate:
+                enriched_df = self._observe(enriched_df, "validation", *spark_violation_counts())
+            print("Transformation planned (records are counted during the first write)")
+        else:
+            print(f"Transformation complete. Total records: {enriched_df.count()}")
 
         return enriched_df
 
+    def split_quarantine(self, enriched_df):
+        """Split transform output into (valid rows, quarantined rows); (df, None) without validation"""
+        if not self.validate:
+            return enriched_df, None
+        if self._local_engine is not None:
+            return self._local_engine.split_quarantine(enriched_df)
+
+        valid_df = enriched_df.where(col("quality_issues") == "").drop("quality_issues")
+        return valid_df, enriched_df.where(col("quality_issues") != "")
+
     def aggregate_metrics(self, enriched_df):
         """Create aggregated metrics for dashboard"""
+        if self._local_engine is not None:
+            return self._local_engine.aggregate_metrics(enriched_df)
+
         print("Creating aggregated metrics...")
 
-        hourly_metrics = (
-            enriched_df.groupBy("intersection_id", "location", "hour")
-            .agg(
-                spark_sum("vehicle_count").alias("total_vehicles"),
-                avg("average_speed").alias("avg_speed"),
-                avg("traffic_congestion_index").alias("avg_congestion_index"),
-                count("*").alias("reading_count"),
-            )
-            .orderBy("intersection_id", "hour")
+        return self.finalize_partials(*self.aggregate_partials(enriched_df))
+
+    def aggregate_rollups(self, enriched_df):
+        """Multi-granularity rollups as {name: DataFrame}, computed in a single shuffle"""
+        if self._local_engine is not None:
+            return self._local_engine.aggregate_rollups(enriched_df)
+
+        print("Creating rollups...")
+        return spark_rollups(enriched_df, self.storage_level if self.single_materialization else None,
+                             self._persisted)
+
+    def aggregate_percentiles(self, enriched_df):
+        """Quantile sketch tables as {"hourly": DataFrame, "daily": DataFrame}"""
+        if self._local_engine is not None:
+            return self._local_engine.aggregate_percentiles(enriched_df)
+
+        print("Creating percentile sketches...")
+        hourly = spark_sketches(enriched_df)
+        if self.single_materialization:
+            hourly = self._persist(hourly)
+        return {"hourly": hourly, "daily": spark_merge_sketches(hourly, DAILY_SKETCH_KEYS)}
+
+    def forecast(self, enriched_df):
+        """Congestion index forecasts of every intersection, see forecasting.py"""
+        if self._local_engine is not None:
+            return self._local_engine.forecast(enriched_df)
+
+        print("Fitting congestion forecasts...")
+        forecasts_df = spark_forecasts(enriched_df, self.interval_minutes)
+        if self.single_materialization:
+            forecasts_df = self._observe(forecasts_df, "forecasts", count(lit(1)).alias("rows"))
+        return forecasts_df
+
+    def _persist(self, df):
+        """Cache df at storage_level until the end of the current run"""
+        df = df.persist(self.storage_level)
+        self._persisted.append(df)
+        return df
+
+    def aggregate_partials(self, enriched_df):
+        """Mergeable partial aggregates (sums and non-null counts, never averages)"""
+        hourly_partials = enriched_df.groupBy(*HOURLY_KEYS).agg(
+            spark_sum("vehicle_count").alias("total_vehicles"),
+            spark_sum("average_speed").alias("speed_sum"),
+            count("average_speed").alias("speed_readings"),
+            spark_sum("traffic_congestion_index").alias("congestion_index_sum"),
+            count("traffic_congestion_index").alias("congestion_index_readings"),
+            count("*").alias("reading_count"),
         )
 
-        intersection_stats = (
-            enriched_df.groupBy(
-                "intersection_id",
-                "location",
-                "latitude",
-                "longitude",
-                "num_lanes",
-                "capacity_per_hour",
-            )
-            .agg(
-                avg("vehicle_count").alias("avg_vehicle_count"),
-                avg("average_speed").alias("avg_speed"),
-                avg("traffic_congestion_index").alias("avg_congestion_index"),
-            )
-            .orderBy(col("avg_congestion_index").desc())
+        intersection_partials = enriched_df.groupBy(*INTERSECTION_KEYS).agg(
+            spark_sum("vehicle_count").alias("vehicle_sum"),
+            count("vehicle_count").alias("vehicle_readings"),
+            spark_sum("average_speed").alias("speed_sum"),
+            count("average_speed").alias("speed_readings"),
+            spark_sum("traffic_congestion_index").alias("congestion_index_sum"),
+            count("traffic_congestion_index").alias("congestion_index_readings"),
         )
 
+        return hourly_partials, intersection_partials
+
+    @staticmethod
+    def merge_partials(existing, new, keys):
+        """Combine two partial aggregates by summing every metric per key"""
+        metrics = [c for c in new.columns if c not in keys]
+        return existing.unionByName(new).groupBy(*keys).agg(*[spark_sum(c).alias(c) for c in metrics])
+
+    def finalize_partials(self, hourly_partials, intersection_partials):
+        """Turn partial aggregates into the hourly_metrics and intersection_stats tables"""
+        hourly_metrics = hourly_partials.select(
+            *HOURLY_KEYS,
+            "total_vehicles",
+            (col("speed_sum") / col("speed_readings")).alias("avg_speed"),
+            (col("congestion_index_sum") / col("congestion_index_readings")).alias("avg_congestion_index"),
+            "reading_count",
+        ).orderBy("intersection_id", "hour")
+
+        intersection_stats = intersection_partials.select(
+            *INTERSECTION_KEYS,
+            (col("vehicle_sum") / col("vehicle_readings")).alias("avg_vehicle_count"),
+            (col("speed_sum") / col("speed_readings")).alias("avg_speed"),
+            (col("congestion_index_sum") / col("congestion_index_readings")).alias("avg_congestion_index"),
+        ).orderBy(col("avg_congestion_index").desc())
+
         return hourly_metrics, intersection_stats
 
-    def load(self, df, output_path, file_format="parquet"):
-        """Load processed data to storage"""
+    def load(self, df, output_path, file_format="parquet", mode="overwrite", partition_by=None):
+        """Load processed data to storage
+
+        With partition_by, Parquet output is written as one directory per partition value with
+        rows sorted by CLUSTER_COLUMNS inside each file, in row groups of about ROW_GROUP_BYTES.
+        mode="overwrite_partitions" then replaces only the partitions present in df.
+        """
+        if self._local_engine is not None:
+            return self._local_engine.load(df, output_path, file_format, mode, partition_by)
+
         print(f"Loading data to {output_path}")
 
         os.makedirs(output_path, exist_ok=True)
-
-        if file_format == "parquet":
-            df.write.mode("overwrite").parquet(output_path)
+        df = _naive_timestamps(df)
+
+        if file_format == "parquet" and partition_by:
+            overwrite = "dynamic" if mode == "overwrite_partitions" else "static"
+            (
+                df.repartition(*partition_by)
+                .sortWithinPartitions(*partition_by, *CLUSTER_COLUMNS)
+                .write.mode("overwrite" if mode == "overwrite_partitions" else mode)
+                .option("partitionOverwriteMode", overwrite)
+                .partitionBy(*partition_by)
+                .option("parquet.block.size", ROW_GROUP_BYTES)
+                .parquet(output_path)
+            )
+        elif file_format == "parquet":
+            df.write.mode(mode).parquet(output_path)
         elif file_format == "csv":
-            df.coalesce(1).write.mode("overwrite").option("header", "true").csv(output_path)
+            df.coalesce(1).write.mode(mode).option("header", "true").csv(output_path)
 
         print(f"Data successfully loaded to {output_path}")
 
+    def write_outputs(self, datasets, output_base_path="data/processed", csv_exports=None, modes=None):
+        """Write each dataset once as Parquet, then optionally export CSV from that output
+
+        CSV exports stream the written Parquet with pyarrow, one thread per dataset, so nothing is
+        recomputed and no Spark task has to funnel a dataset through coalesce(1). `modes` maps a
+        dataset name to a Spark save mode (default "overwrite"). An appended dataset only adds a
+        CSV part for the Parquet files this write created, so its export cost does not grow with
+        history. Returns (and keeps in self.sink_reports) the seconds and bytes written per sink.
+        """
+        csv_exports = self.csv_exports if csv_exports is None else csv_exports
+        modes = modes or {}
+        reports = {}
+        appended = {}
+
+        for name, df in datasets.items():
+            path = f"{output_base_path}/{name}"
+            start = time.perf_counter()
+            partition_by = self.enriched_partition_by if name == "enriched_data" else None
+            mode = modes.get(name, "overwrite")
+            existing = _parquet_files(path) if mode == "append" and os.path.isdir(f"{path}_csv") else None
+            self.load(df, path, "parquet", mode, partition_by)
+            if existing is not None:
+                appended[name] = sorted(_parquet_files(path) - existing)
+            reports[name] = {"format": "parquet", "seconds": time.perf_counter() - start, "bytes": _directory_bytes(path)}
+
+        if csv_exports:
+            with ThreadPoolExecutor(max_workers=len(datasets)) as pool:
+                futures = {
+                    f"{name}_csv": pool.submit(_export_parquet_to_csv, f"{output_base_path}/{name}",
+                                               f"{output_base_path}/{name}_csv", appended.get(name))
+                    for name in datasets
+                }
+                for sink, future in futures.items():
+                    reports[sink] = {"format": "csv", **future.result()}
+
+        for sink, report in reports.items():
+            print(f"  {sink:<28} {report['format']:<8} {report['seconds']:8.2f}s {report['bytes'] / 1e6:10.2f} MB")
+
+        self.sink_reports = reports
+        return reports
+
+    def publish_serving_snapshot(self, output_base_path="data/processed"):
+        """Publish the written serving tables as the next snapshot (see serving_snapshots.py)"""
+        if not self.serving_snapshots:
+            return None
+        start = time.perf_counter()
+        manifest = publish_processed_tables(output_base_path)
+        rows = sum(table["rows"] for table in manifest["tables"].values())
+        print(f"Published serving snapshot v{manifest['version']:06d} "
+              f"({len(manifest['tables'])} tables, {rows} rows) in {time.perf_counter() - start:.2f}s")
+        return manifest
+
+    @_releases_cache
     def run_pipeline(self, sensor_data_path, metadata_path, output_base_path="data/processed"):
         """Execute the complete ETL pipeline"""
         print("=" * 60)
@@ -188,41 +474,356 @@ class TrafficETLPipeline:
 
         sensor_df, metadata_df = self.extract(sensor_data_path, metadata_path)
         enriched_df = self.transform(sensor_df, metadata_df)
+        if self.single_materialization and self.spark is not None:
+            # Computed by the first write, then served from cache to every later one
+            enriched_df = self._persist(enriched_df)
+        enriched_df, quarantine_df = self.split_quarantine(enriched_df)
         hourly_metrics, intersection_stats = self.aggregate_metrics(enriched_df)
+        datasets = {
+            "enriched_data": enriched_df,
+            "hourly_metrics": hourly_metrics,
+            "intersection_stats": intersection_stats,
+        }
+        if quarantine_df is not None:
+            datasets["quarantine"] = quarantine_df
+        if self.rollups:
+            for name, rollup_df in self.aggregate_rollups(enriched_df).items():
+                datasets[f"rollups/{name}"] = rollup_df
+        if self.percentiles:
+            for name, sketch_df in self.aggregate_percentiles(enriched_df).items():
+                datasets[f"percentiles/{name}"] = sketch_df
+        if self.forecasts:
+            datasets["forecasts"] = self.forecast(enriched_df)
+
+        self.write_outputs(datasets, output_base_path)
+        self.publish_serving_snapshot(output_base_path)
+
+        if self.single_materialization or self._local_engine is not None:
+            for stage, metrics in self.stage_stats().items():
+                print(f"{stage}: {metrics}")
+
+        print("=" * 60)
+        print("ETL Pipeline Complete!")
+        print("=" * 60)
 
-        self.load(enriched_df, f"{output_base_path}/enriched_data", "parquet")
-        self.load(hourly_metrics, f"{output_base_path}/hourly_metrics", "parquet")
-        self.load(intersection_stats, f"{output_base_path}/intersection_stats", "parquet")
+        return enriched_df, hourly_metrics, intersection_stats
 
-        self.load(enriched_df, f"{output_base_path}/enriched_data_csv", "csv")
-        self.load(hourly_metrics, f"{output_base_path}/hourly_metrics_csv", "csv")
-        self.load(intersection_stats, f"{output_base_path}/intersection_stats_csv", "csv")
+    def _list_sensor_inputs(self, raw_dir, metadata_path):
+        """Map every raw sensor file (CSV or Parquet) under raw_dir to its size and mtime"""
+        inputs = {}
+        metadata_path = os.path.abspath(metadata_path)
+        for root, dirs, files in os.walk(raw_dir):
+            dirs[:] = sorted(d for d in dirs if not d.startswith((".", "_")))
+            for name in sorted(files):
+                path = os.path.abspath(os.path.join(root, name))
+                if name.startswith((".", "_")) or path == metadata_path:
+                    continue
+                if name.endswith((".csv", ".parquet")):
+                    stat = os.stat(path)
+                    inputs[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        return inputs
+
+    def _read_sensor_files(self, paths):
+        """Read a list of raw sensor files into one frame with SENSOR_SCHEMA"""
+        csv_paths = [p for p in paths if p.endswith(".csv")]
+        parquet_paths = [p for p in paths if p.endswith(".parquet")]
+
+        frames = []
+        if csv_paths:
+            frames.append(self.spark.read.csv(csv_paths, header=True, schema=SENSOR_SCHEMA))
+        if parquet_paths:
+            parquet_df = self.spark.read.parquet(*parquet_paths)
+            frames.append(parquet_df.select([col(f.name).cast(f.dataType).alias(f.name) for f in SENSOR_SCHEMA.fields]))
+
+        sensor_df = frames[0]
+        for frame in frames[1:]:
+            sensor_df = sensor_df.unionByName(frame)
+        return sensor_df
+
+    def _replace_directory(self, df, path):
+        """Materialize df next to path, then swap it in (df may still be reading from path)"""
+        tmp_path = f"{path}.tmp"
+        _naive_timestamps(df).write.mode("overwrite").parquet(tmp_path)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    def _forecast_history(self, enriched_df, output_base_path, full_run):
+        """This run's readings plus the stored ones of the HISTORY_DAYS days before its last reading
+
+        A few minutes of new files give each intersection too few points per hour of day and too
+        few lag pairs to fit, so incremental runs refit from a trailing window of enriched_data
+        (pruned by its date partitions) rather than from the new readings alone.
+        """
+        columns = ["intersection_id", "location", "timestamp", "traffic_congestion_index"]
+        readings = enriched_df.select(*columns)
+        enriched_path = f"{output_base_path}/enriched_data"
+        if full_run or not os.path.exists(enriched_path):
+            return readings
+        last = enriched_df.agg(spark_max("timestamp")).first()[0]
+        if last is None:
+            return readings
+        since = last - timedelta(days=HISTORY_DAYS)
+        stored = self.spark.read.parquet(enriched_path).where(
+            (col("date") >= lit(since.date())) & (col("timestamp") > lit(since))
+        )
+        return stored.select(*columns).unionByName(readings)
+
+    @_releases_cache
+    def run_incremental(self, raw_dir, metadata_path, output_base_path="data/processed", full_refresh=False):
+        """Process only raw files not seen before and merge them into the aggregates
+
+        The processed inputs (path, size, mtime) are tracked in <output_base_path>/_state/manifest.json
+        next to mergeable partial aggregates. New files are transformed, their enriched rows are
+        appended and their partials summed into the stored ones before the hourly_metrics and
+        intersection_stats tables are re-derived. full_refresh=True, or any already processed file
+        changing or disappearing, recomputes everything from scratch.
+        """
+        if self.spark is None:
+            raise ValueError("run_incremental requires engine='spark'")
+
+        state_path = os.path.join(output_base_path, "_state")
+        manifest_path = os.path.join(state_path, "manifest.json")
+        hourly_partials_path = os.path.join(state_path, "hourly_partials")
+        intersection_partials_path = os.path.join(state_path, "intersection_partials")
+
+        manifest = {"processed": {}}
+        if os.path.exists(manifest_path) and not full_refresh:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+
+        inputs = self._list_sensor_inputs(raw_dir, metadata_path)
+        processed = manifest["processed"]
+        if any(inputs.get(path) != info for path, info in processed.items()):
+            print("Previously processed inputs changed or disappeared; running a full recompute")
+            processed = {}
+        full_run = not processed
+
+        new_paths = sorted(path for path in inputs if path not in processed)
+        if not new_paths:
+            print("No new sensor files to process")
+            return None
 
         print("=" * 60)
-        print("ETL Pipeline Complete!")
+        print(f"Incremental ETL: {len(new_paths)} new of {len(inputs)} sensor files "
+              f"({'full recompute' if full_run else 'merging into existing aggregates'})")
         print("=" * 60)
 
+        metadata_df = self.spark.read.csv(metadata_path, header=True, inferSchema=True)
+        enriched_df = self.transform(self._read_sensor_files(new_paths), metadata_df)
+        if self.single_materialization:
+            enriched_df = self._persist(enriched_df)
+        enriched_df, quarantine_df = self.split_quarantine(enriched_df)
+
+        hourly_partials, intersection_partials = self.aggregate_partials(enriched_df)
+        if not full_run:
+            hourly_partials = self.merge_partials(
+                self.spark.read.parquet(hourly_partials_path), hourly_partials, HOURLY_KEYS
+            )
+            intersection_partials = self.merge_partials(
+                self.spark.read.parquet(intersection_partials_path), intersection_partials, INTERSECTION_KEYS
+            )
+        self._replace_directory(hourly_partials, hourly_partials_path)
+        self._replace_directory(intersection_partials, intersection_partials_path)
+
+        hourly_metrics, intersection_stats = self.finalize_partials(
+            self.spark.read.parquet(hourly_partials_path), self.spark.read.parquet(intersection_partials_path)
+        )
+        datasets = {
+            "enriched_data": enriched_df,
+            "hourly_metrics": hourly_metrics,
+            "intersection_stats": intersection_stats,
+        }
+        if quarantine_df is not None:
+            datasets["quarantine"] = quarantine_df
+        if self.forecasts:
+            datasets["forecasts"] = self.forecast(self._forecast_history(enriched_df, output_base_path, full_run))
+        append = "overwrite" if full_run else "append"
+        self.write_outputs(datasets, output_base_path, modes={"enriched_data": append, "quarantine": append})
+
+        if self.rollups:
+            # Rollup tables hold only mergeable metrics, so they double as their own partials
+            for name, rollup_df in self.aggregate_rollups(enriched_df).items():
+                path = f"{output_base_path}/rollups/{name}"
+                if not full_run:
+                    rollup_df = spark_merge_rollup(self.spark.read.parquet(path), rollup_df, name)
+                self._replace_directory(rollup_df, path)
+                if self.csv_exports:
+                    _export_parquet_to_csv(path, f"{path}_csv")
+
+        if self.percentiles:
+            # Sketches merge like the partials: new hourly sketches fold into the stored ones and
+            # the daily sketches are re-derived from those, never from the readings
+            hourly_path = f"{output_base_path}/percentiles/hourly"
+            daily_path = f"{output_base_path}/percentiles/daily"
+            hourly = spark_sketches(enriched_df)
+            if not full_run:
+                existing = self.spark.read.parquet(hourly_path)
+                hourly = spark_merge_sketches(existing.unionByName(hourly), HOURLY_SKETCH_KEYS)
+            self._replace_directory(hourly, hourly_path)
+            daily = spark_merge_sketches(self.spark.read.parquet(hourly_path), DAILY_SKETCH_KEYS)
+            self._replace_directory(daily, daily_path)
+            if self.csv_exports:
+                for path in (hourly_path, daily_path):
+                    _export_parquet_to_csv(path, f"{path}_csv")
+
+        processed = {**processed, **{path: inputs[path] for path in new_paths}}
+        os.makedirs(state_path, exist_ok=True)
+        with open(f"{manifest_path}.tmp", "w") as f:
+            json.dump({"processed": processed}, f, indent=2)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+
+        self.publish_serving_snapshot(output_base_path)
+        print(f"Incremental ETL complete: {len(processed)} sensor files processed in total")
+        return enriched_df, hourly_metrics, intersection_stats
+
+    @_releases_cache
+    def run_backfill(self, sensor_data_path, metadata_path, start_date, end_date, output_base_path="data/processed"):
+        """Reprocess the readings dated start_date..end_date (inclusive, YYYY-MM-DD)
+
+        Only those date partitions of enriched_data are replaced; hourly_metrics,
+        intersection_stats and the rollups are then re-derived from the whole enriched table.
+        The incremental state is dropped, so the next run_incremental recomputes from scratch.
+        """
+        if self.spark is None:
+            raise ValueError("run_backfill requires engine='spark'")
+        if self.enriched_partition_by is None:
+            raise ValueError("run_backfill requires layout='partitioned'")
+
+        print("=" * 60)
+        print(f"Backfill ETL: {start_date} to {end_date}")
+        print("=" * 60)
+
+        sensor_df, metadata_df = self.extract(sensor_data_path, metadata_path)
+        sensor_df = sensor_df.where(to_date(col("timestamp")).between(lit(start_date), lit(end_date)))
+        enriched_df = self.transform(sensor_df, metadata_df)
+        if self.single_materialization:
+            enriched_df = self._persist(enriched_df)
+        enriched_df, quarantine_df = self.split_quarantine(enriched_df)
+        enriched_path = f"{output_base_path}/enriched_data"
+        datasets = {"enriched_data": enriched_df}
+        if quarantine_df is not None:
+            datasets["quarantine"] = quarantine_df
+        self.write_outputs(datasets, output_base_path,
+                           modes={"enriched_data": "overwrite_partitions", "quarantine": "append"})
+
+        enriched_df = self.spark.read.parquet(enriched_path)
+        if self.single_materialization:
+            enriched_df = self._persist(enriched_df)
+        hourly_metrics, intersection_stats = self.aggregate_metrics(enriched_df)
+        datasets = {"hourly_metrics": hourly_metrics, "intersection_stats": intersection_stats}
+        if self.rollups:
+            for name, rollup_df in self.aggregate_rollups(enriched_df).items():
+                datasets[f"rollups/{name}"] = rollup_df
+        if self.percentiles:
+            for name, sketch_df in self.aggregate_percentiles(enriched_df).items():
+                datasets[f"percentiles/{name}"] = sketch_df
+        if self.forecasts:
+            datasets["forecasts"] = self.forecast(enriched_df)
+        self.write_outputs(datasets, output_base_path)
+
+        shutil.rmtree(os.path.join(output_base_path, "_state"), ignore_errors=True)
+        self.publish_serving_snapshot(output_base_path)
+        print("Backfill complete")
         return enriched_df, hourly_metrics, intersection_stats
 
     def stop(self):
         """Stop Spark session"""
-        self.spark.stop()
+        if self.spark is not None:
+            self.spark.stop()
+
+
+def _naive_timestamps(df):
+    """Cast TIMESTAMP columns to TIMESTAMP_NTZ before a write
+
+    Spark stores TIMESTAMP as a UTC-adjusted instant, which pyarrow reads back as
+    timestamp[us, tz=UTC]. The readings are zone-less wall-clock times, and the pandas engine
+    writes them as naive timestamp[us]; NTZ columns give the same Parquet type from both engines.
+    """
+    casts = {f.name: col(f.name).cast(TimestampNTZType()) for f in df.schema.fields
+             if isinstance(f.dataType, TimestampType)}
+    return df.withColumns(casts) if casts else df
+
+
+def _directory_bytes(path):
+    """Total size of the data files under a Spark output directory"""
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files if not f.startswith((".", "_")))
+    return total
+
+
+def _parquet_files(path):
+    """Paths of the Parquet data files under a (possibly partitioned) output directory"""
+    files = set()
+    for root, dirs, names in os.walk(path):
+        dirs[:] = [d for d in dirs if not d.startswith((".", "_"))]
+        files.update(os.path.join(root, f) for f in names if f.endswith(".parquet") and not f.startswith((".", "_")))
+    return files
+
+
+def _export_parquet_to_csv(parquet_path, csv_path, files=None):
+    """Stream a Parquet directory into <csv_path>/part-00000.csv, batch by batch
+
+    With `files` (Parquet files under parquet_path), only those are exported, as the next
+    part-NNNNN.csv next to the existing parts.
+    """
+    start = time.perf_counter()
+    if files is None:
+        shutil.rmtree(csv_path, ignore_errors=True)
+        os.makedirs(csv_path)
+        part = 0
+        # hive partitioning restores partition columns (e.g. date and hour) as trailing columns
+        dataset = ds.dataset(parquet_path, format="parquet", partitioning="hive")
+    else:
+        os.makedirs(csv_path, exist_ok=True)
+        part = len([f for f in os.listdir(csv_path) if f.startswith("part-") and f.endswith(".csv")])
+        dataset = ds.dataset(files, format="parquet", partitioning="hive", partition_base_dir=parquet_path)
+    # serialized sketches stay in the Parquet output only
+    schema = pa.schema([f for f in dataset.schema if not pa.types.is_binary(f.type)])
+    tmp_file = os.path.join(csv_path, f".part-{part:05d}.csv.tmp")
+    options = pa_csv.WriteOptions(quoting_style="needed")
+    with pa_csv.CSVWriter(tmp_file, schema, write_options=options) as writer:
+        for batch in dataset.to_batches(columns=schema.names):
+            writer.write_batch(batch)
+    # Readers glob *.csv, so only expose the file once it is complete
+    out_file = os.path.join(csv_path, f"part-{part:05d}.csv")
+    os.replace(tmp_file, out_file)
+
+    return {"seconds": time.perf_counter() - start, "bytes": os.path.getsize(out_file)}
 
 
 if __name__ == "__main__":
-    pipeline = TrafficETLPipeline()
+    pipeline = TrafficETLPipeline(engine="pandas" if "--pandas" in sys.argv else "spark")
 
     sensor_data_path = "data/raw/traffic_sensor_data.csv"
     metadata_path = "data/raw/intersection_metadata.csv"
 
+    if "--incremental" in sys.argv:
+        pipeline.run_incremental("data/raw", metadata_path, full_refresh="--full-refresh" in sys.argv)
+        pipeline.stop()
+        sys.exit(0)
+
+    if "--backfill" in sys.argv:
+        start_date, end_date = sys.argv[sys.argv.index("--backfill") + 1:][:2]
+        pipeline.run_backfill(sensor_data_path, metadata_path, start_date, end_date)
+        pipeline.stop()
+        sys.exit(0)
+
     enriched_df, hourly_metrics, intersection_stats = pipeline.run_pipeline(
         sensor_data_path, metadata_path
     )
 
-    print("\nSample Enriched Data:")
-    enriched_df.show(5)
+    if pipeline.engine == "pandas":
+        print("\nSample Enriched Data:")
+        print(enriched_df.head(5))
+
+        print("\nTop 5 Most Congested Intersections:")
+        print(intersection_stats.head(5))
+    else:
+        print("\nSample Enriched Data:")
+        enriched_df.show(5)
 
-    print("\nTop 5 Most Congested Intersections:")
-    intersection_stats.show(5)
+        print("\nTop 5 Most Congested Intersections:")
+        intersection_stats.show(5)
 
     pipeline.stop()
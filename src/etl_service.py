@@ -0,0 +1,283 @@
+"""
+etl_service.py
+Long-running ETL service that keeps one warm TrafficETLPipeline (and SparkSession) per process
+"""
+
+import argparse
+import itertools
+import json
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+try:
+    from .etl_pipeline import TrafficETLPipeline
+except ImportError:  # run as a script: python src/etl_service.py
+    from etl_pipeline import TrafficETLPipeline
+
+
+JOB_KINDS = ("full", "incremental", "backfill")
+# kinds whose TrafficETLPipeline method needs engine="spark"
+SPARK_ONLY_KINDS = ("incremental", "backfill")
+DEFAULT_PARAMS = {
+    "sensor_data_path": "data/raw/traffic_sensor_data.csv",
+    "metadata_path": "data/raw/intersection_metadata.csv",
+    "raw_dir": "data/raw",
+    "output_base_path": "data/processed",
+}
+
+
+@dataclass
+class ETLJob:
+    """One queued pipeline run and its latency"""
+
+    job_id: str
+    kind: str
+    params: dict
+    status: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float = None
+    finished_at: float = None
+    error: str = None
+
+    @property
+    def queue_seconds(self):
+        return (self.started_at or time.time()) - self.submitted_at
+
+    @property
+    def run_seconds(self):
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self):
+        return {**asdict(self), "queue_seconds": self.queue_seconds, "run_seconds": self.run_seconds}
+
+
+class ETLService:
+    """Run full, incremental and backfill jobs on a shared pipeline from a bounded queue
+
+    Submitting to a full queue raises queue.Full instead of blocking, so callers can back off.
+    A single worker thread runs the jobs one after another: every job runs on the one shared
+    pipeline, whose per-run state (observations, cached frames, sink reports, stats) is not
+    thread-safe, and jobs usually write the same output directory. The bounded queue is what
+    limits the load. Each Spark job runs in its own job group (the job id), so the Spark UI and
+    status tracker attribute work per job. self.jobs is guarded by a lock; read it through job()
+    and list_jobs().
+    """
+
+    def __init__(self, pipeline=None, max_queued=16, defaults=None, history=1000):
+        self.pipeline = pipeline or TrafficETLPipeline(app_name="TrafficETLService")
+        self.defaults = {**DEFAULT_PARAMS, **(defaults or {})}
+        self.history = history
+        self.jobs = {}
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start the worker thread"""
+        self._worker = threading.Thread(target=self._work, name="etl-worker", daemon=True)
+        self._worker.start()
+        return self
+
+    def submit(self, kind, **params):
+        """Queue a job and return it; raises ValueError for bad jobs and queue.Full when busy"""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind} (expected one of {', '.join(JOB_KINDS)})")
+        if kind in SPARK_ONLY_KINDS and self.pipeline.engine != "spark":
+            raise ValueError(f"{kind} jobs need engine='spark' (this service runs engine='{self.pipeline.engine}')")
+        if kind == "backfill" and not {"start_date", "end_date"} <= params.keys():
+            raise ValueError("backfill jobs need start_date and end_date")
+
+        with self._lock:
+            job = ETLJob(f"job-{next(self._ids):06d}", kind, {**self.defaults, **params})
+            self._queue.put_nowait(job)
+            self.jobs[job.job_id] = job
+            for old_id in list(self.jobs)[:-self.history]:
+                if self.jobs[old_id].status not in ("queued", "running"):
+                    del self.jobs[old_id]
+        print(f"Queued {job.job_id} ({kind})")
+        return job
+
+    def job(self, job_id):
+        """The job with this id, or None"""
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        """Snapshot of every tracked job, oldest first"""
+        with self._lock:
+            return list(self.jobs.values())
+
+    def pending(self, kind=None):
+        """Jobs that are queued or running, optionally of one kind"""
+        with self._lock:
+            return [j for j in self.jobs.values()
+                    if j.status in ("queued", "running") and (kind is None or j.kind == kind)]
+
+    def _run(self, job):
+        p = job.params
+        if job.kind == "full":
+            self.pipeline.run_pipeline(p["sensor_data_path"], p["metadata_path"], p["output_base_path"])
+        elif job.kind == "incremental":
+            self.pipeline.run_incremental(p["raw_dir"], p["metadata_path"], p["output_base_path"],
+                                          full_refresh=p.get("full_refresh", False))
+        else:
+            self.pipeline.run_backfill(p["sensor_data_path"], p["metadata_path"], p["start_date"], p["end_date"],
+                                       p["output_base_path"])
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            job.status, job.started_at = "running", time.time()
+            spark = self.pipeline.spark
+            if spark is not None:
+                spark.sparkContext.setJobGroup(job.job_id, f"{job.kind} ETL job")
+            try:
+                self._run(job)
+                job.status = "succeeded"
+            except Exception as e:
+                job.status, job.error = "failed", f"{type(e).__name__}: {e}"
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+            print(f"{job.job_id} {job.status} after {job.run_seconds:.2f}s (queued {job.queue_seconds:.2f}s)")
+
+    def wait(self, timeout=None):
+        """Block until every queued job has finished (testing and scripting helper)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending():
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stats(self):
+        """Queue depth and per-kind latency percentiles of finished jobs"""
+        with self._lock:
+            jobs = list(self.jobs.values())
+        latency = {}
+        for kind in JOB_KINDS:
+            runs = np.array([j.run_seconds for j in jobs if j.kind == kind and j.finished_at], dtype=float)
+            if len(runs):
+                p50, p95 = np.percentile(runs, [50, 95])
+                latency[kind] = {"jobs": len(runs), "p50_seconds": p50, "p95_seconds": p95, "max_seconds": runs.max()}
+        return {
+            "queued": self._queue.qsize(),
+            "running": sum(j.status == "running" for j in jobs),
+            "failed": sum(j.status == "failed" for j in jobs),
+            "engine": self.pipeline.engine,
+            "latency": latency,
+        }
+
+    def stop(self):
+        self._stopping.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    """JSON API: POST /jobs, GET /jobs, GET /jobs/<id>, GET /stats, GET /health"""
+
+    service = None
+
+    def _send(self, status, body):
+        payload = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        # one lookup, so a job pruned meanwhile is a 404 rather than an error
+        job = self.service.job(self.path[len("/jobs/"):]) if self.path.startswith("/jobs/") else None
+        if self.path == "/health":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send(200, self.service.stats())
+        elif self.path == "/jobs":
+            self._send(200, [job.to_dict() for job in self.service.list_jobs()])
+        elif job is not None:
+            self._send(200, job.to_dict())
+        else:
+            self._send(404, {"error": f"not found: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            self._send(404, {"error": f"not found: {self.path}"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            job = self.service.submit(body.pop("kind", "full"), **body)
+        except (ValueError, TypeError) as e:
+            self._send(400, {"error": str(e)})
+        except queue.Full:
+            self._send(429, {"error": "job queue is full"})
+        else:
+            self._send(202, job.to_dict())
+
+    def log_message(self, format, *args):
+        pass  # jobs are logged by the service itself
+
+
+def make_server(service, host="127.0.0.1", port=8090):
+    """HTTP server bound to the service; call serve_forever() (port=0 picks a free port)"""
+    handler = type("ServiceHandler", (_ServiceHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def _schedule(service, kind, interval, stop):
+    """Submit a job every `interval` seconds unless one of that kind is still pending"""
+    while not stop.wait(interval):
+        if not service.pending(kind):
+            try:
+                service.submit(kind)
+            except queue.Full:
+                print(f"Skipped scheduled {kind} job: queue is full")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve ETL jobs from one warm Spark session")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--engine", choices=["spark", "pandas"], default="spark")
+    parser.add_argument("--max-queued", type=int, default=16)
+    parser.add_argument("--interval", type=float, default=None, help="also submit a job every N seconds")
+    parser.add_argument("--interval-kind", choices=JOB_KINDS[:2], default="incremental")
+    args = parser.parse_args()
+    if args.interval and args.interval_kind in SPARK_ONLY_KINDS and args.engine != "spark":
+        parser.error(f"--interval-kind {args.interval_kind} needs --engine spark; use --interval-kind full")
+
+    etl_service = ETLService(
+        TrafficETLPipeline(app_name="TrafficETLService", engine=args.engine),
+        max_queued=args.max_queued,
+    ).start()
+    server = make_server(etl_service, args.host, args.port)
+    stop_event = threading.Event()
+    if args.interval:
+        threading.Thread(target=_schedule, args=(etl_service, args.interval_kind, args.interval, stop_event),
+                         daemon=True).start()
+
+    print(f"ETL service listening on http://{args.host}:{server.server_address[1]} (engine={args.engine})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        server.server_close()
+        etl_service.stop()
+        etl_service.pipeline.stop()
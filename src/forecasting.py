@@ -0,0 +1,120 @@
+"""
+forecasting.py
+Short-term congestion index forecasts for every intersection, fitted in one vectorized batch
+
+Model per intersection: a seasonal baseline (mean TCI per hour of day, the intersection's mean
+for hours it has no readings of) plus an AR(1) model of the residuals. The forecast for
+h minutes after the last reading is
+
+    baseline(hour of target) + phi ** (h / interval_minutes) * last residual
+
+clipped to [0, TCI_CAP]. phi is the least-squares AR(1) coefficient of consecutive residuals,
+limited to [0, AR_MAX], so a spike fades into the baseline instead of oscillating. Fitting uses
+array operations over all intersections at once; Spark runs that per hash bucket of
+intersections with applyInPandas, so buckets are fitted in parallel.
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .tci import TCI_CAP, congestion_level, round_half_up
+except ImportError:  # imported from src/etl_pipeline.py run as a script
+    from tci import TCI_CAP, congestion_level, round_half_up
+
+
+HORIZON_MINUTES = (15, 30, 45, 60)
+# Trailing days of readings an incremental run refits from (see TrafficETLPipeline.run_incremental)
+HISTORY_DAYS = 7
+AR_MAX = 0.99
+FORECAST_COLUMNS = [
+    "intersection_id", "location", "issued_at", "horizon_minutes", "target_timestamp",
+    "forecast_congestion_index", "forecast_congestion_level", "baseline_congestion_index",
+    "ar_coefficient", "history_readings",
+]
+FORECAST_SCHEMA = (
+    "intersection_id string, location string, issued_at timestamp, horizon_minutes int, "
+    "target_timestamp timestamp, forecast_congestion_index double, forecast_congestion_level string, "
+    "baseline_congestion_index double, ar_coefficient double, history_readings long"
+)
+
+
+def pandas_forecasts(enriched, interval_minutes=5, horizons=HORIZON_MINUTES):
+    """One row per intersection and horizon, issued at each intersection's last reading"""
+    readings = enriched.loc[
+        enriched["traffic_congestion_index"].notna(),
+        ["intersection_id", "location", "timestamp", "traffic_congestion_index"],
+    ].sort_values(["intersection_id", "timestamp"], kind="stable")
+    if readings.empty:
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+
+    codes, intersections = pd.factorize(readings["intersection_id"])
+    timestamps = pd.to_datetime(readings["timestamp"])
+    nanos = timestamps.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    hours = timestamps.dt.hour.to_numpy()
+    tci = readings["traffic_congestion_index"].to_numpy(dtype=np.float64)
+    n = len(intersections)
+
+    history = np.bincount(codes, minlength=n)
+    slots = codes * 24 + hours
+    sums = np.bincount(slots, tci, n * 24).reshape(n, 24)
+    counts = np.bincount(slots, minlength=n * 24).reshape(n, 24)
+    profile = np.where(counts > 0, sums / np.maximum(counts, 1), (np.bincount(codes, tci, n) / history)[:, None])
+    residual = tci - profile[codes, hours]
+
+    # AR(1) over pairs of readings one interval apart at the same intersection
+    pairs = (codes[1:] == codes[:-1]) & (np.diff(nanos) == interval_minutes * 60 * 10**9)
+    lagged, current, pair_codes = residual[:-1][pairs], residual[1:][pairs], codes[1:][pairs]
+    numerator = np.bincount(pair_codes, lagged * current, n)
+    denominator = np.bincount(pair_codes, lagged * lagged, n)
+    phi = np.clip(np.divide(numerator, denominator, out=np.zeros(n), where=denominator > 0), 0.0, AR_MAX)
+
+    # readings are sorted by intersection, so each intersection's last reading ends its run
+    last = np.flatnonzero(np.r_[codes[1:] != codes[:-1], True])
+    issued_at = timestamps.to_numpy()[last]
+    horizons = np.asarray(horizons)
+    minute_of_day = hours[last] * 60 + timestamps.dt.minute.to_numpy()[last]
+    target_hours = (minute_of_day[:, None] + horizons) // 60 % 24
+    baseline = profile[np.arange(n)[:, None], target_hours]
+    decay = phi[:, None] ** (horizons / interval_minutes)
+    forecast = round_half_up(np.clip(baseline + decay * residual[last][:, None], 0.0, TCI_CAP))
+
+    k = len(horizons)
+    return pd.DataFrame(
+        {
+            "intersection_id": np.repeat(np.asarray(intersections), k),
+            "location": np.repeat(readings["location"].to_numpy()[last], k),
+            "issued_at": np.repeat(issued_at, k),
+            "horizon_minutes": np.tile(horizons, n).astype(np.int32),
+            "target_timestamp": (issued_at[:, None] + horizons * np.timedelta64(1, "m")).ravel(),
+            "forecast_congestion_index": forecast.ravel(),
+            "forecast_congestion_level": congestion_level(forecast.ravel()),
+            "baseline_congestion_index": baseline.ravel(),
+            "ar_coefficient": np.repeat(phi, k),
+            "history_readings": np.repeat(history, k),
+        },
+        columns=FORECAST_COLUMNS,
+    )
+
+
+def _ship_to_workers():
+    """Pickle this module and tci by value: Python workers need not have them on their path"""
+    from pyspark import cloudpickle
+
+    cloudpickle.register_pickle_by_value(sys.modules[__name__])
+    cloudpickle.register_pickle_by_value(sys.modules[congestion_level.__module__])
+
+
+def spark_forecasts(enriched_df, interval_minutes=5, horizons=HORIZON_MINUTES, buckets=None):
+    """pandas_forecasts of an enriched Spark frame, one vectorized fit per bucket of intersections"""
+    from pyspark.sql.functions import col, hash as spark_hash, lit, pmod
+
+    _ship_to_workers()
+    spark = enriched_df.sparkSession
+    buckets = buckets or int(spark.conf.get("spark.sql.shuffle.partitions"))
+    readings = enriched_df.select("intersection_id", "location", "timestamp", "traffic_congestion_index")
+    return readings.withColumn("_bucket", pmod(spark_hash(col("intersection_id")), lit(buckets))).groupBy(
+        "_bucket"
+    ).applyInPandas(lambda bucket: pandas_forecasts(bucket, interval_minutes, horizons), FORECAST_SCHEMA)
@@ -8,7 +8,6 @@ import gradio as gr
 import pandas as pd
 import os
 from dotenv import load_dotenv
-import glob
 from datetime import datetime
 import time
 import random
@@ -26,6 +25,13 @@ try:
 except Exception:
     cohere = None
 
+try:
+    from .processed_reader import ProcessedDataReader
+    from .sketches import merge_sketch_table
+except ImportError:  # run as a script: python src/gradio_ui.py
+    from processed_reader import ProcessedDataReader
+    from sketches import merge_sketch_table
+
 # Load environment variables
 load_dotenv()
 
@@ -66,33 +72,49 @@ class TrafficControlUI:
             self.cohere_client = None
 
         self.data_path = "data/processed"
-
-    def _read_latest_csv(self, pattern):
-        """Read the latest CSV file"""
-        files = glob.glob(os.path.join(self.data_path, pattern))
-        if not files:
-            return None
-        latest_file = max(files, key=os.path.getctime)
-        return pd.read_csv(latest_file)
+        self.reader = ProcessedDataReader(self.data_path)
 
     def get_intersection_data(self, intersection_id):
         """Get data for a specific intersection"""
         try:
-            enriched_df = self._read_latest_csv("enriched_data_csv/*.csv")
-            hourly_df = self._read_latest_csv("hourly_metrics_csv/*.csv")
+            # Only the row groups holding this intersection are read
+            int_data = self.reader.enriched(intersection_id=intersection_id)
+            hourly_data = self.reader.hourly_metrics(intersection_id=intersection_id)
 
-            if enriched_df is None or hourly_df is None:
+            if int_data is None or hourly_data is None:
                 return None, None
 
-            int_data = enriched_df[enriched_df["intersection_id"] == intersection_id]
-            hourly_data = hourly_df[hourly_df["intersection_id"] == intersection_id]
-
             return int_data, hourly_data
 
         except Exception as e:
             print(f"Error reading data: {e}")
             return None, None
 
+    def get_intersection_percentiles(self, intersection_id):
+        """p50/p95/p99 of congestion index and speed over all days, merged from the daily sketches"""
+        try:
+            daily = self.reader.percentiles(intersection_id=intersection_id, granularity="daily")
+            if daily is None or daily.empty or "congestion_index_sketch" not in daily:
+                return None
+            return merge_sketch_table(daily, ["intersection_id"]).iloc[0]
+        except Exception as e:
+            print(f"Error reading percentiles: {e}")
+            return None
+
+    def get_intersection_forecast(self, intersection_id):
+        """Forecast congestion index per horizon, e.g. "15m: 42.1 (High)", or None"""
+        try:
+            forecasts = self.reader.forecasts(intersection_id=intersection_id)
+            if forecasts is None or forecasts.empty:
+                return None
+            return ", ".join(
+                f"{row.horizon_minutes}m: {row.forecast_congestion_index:.1f} ({row.forecast_congestion_level})"
+                for row in forecasts.sort_values("horizon_minutes").itertuples()
+            )
+        except Exception as e:
+            print(f"Error reading forecasts: {e}")
+            return None
+
     def _generate_rule_based_justification(self, tci, vehicle_count, avg_speed, location):
         """Generate intelligent rule-based traffic justification"""
         if tci < 20:
@@ -194,6 +216,17 @@ Traffic Congestion Index: {latest.get('traffic_congestion_index', 0):.1f}
             signal_duration = "90 seconds green, maximum cycle"
             status = "🔴 Critical Congestion"
 
+        percentiles = self.get_intersection_percentiles(intersection_id)
+        if percentiles is not None:
+            distribution = {
+                "congestion_percentiles": " / ".join(
+                    f"{percentiles[f'congestion_index_{p}']:.1f}" for p in ("p50", "p95", "p99")
+                ),
+                "speed_percentiles": " / ".join(f"{percentiles[f'speed_{p}']:.1f}" for p in ("p50", "p95", "p99")),
+            }
+        else:
+            distribution = {"congestion_percentiles": "n/a", "speed_percentiles": "n/a"}
+
         return {
             "status": status,
             "intersection": latest.get("location"),
@@ -204,6 +237,8 @@ Traffic Congestion Index: {latest.get('traffic_congestion_index', 0):.1f}
             "congestion_level": latest.get("congestion_level", "Unknown"),
             "signal_timing": signal_duration,
             "ai_justification": ai_justification,
+            **distribution,
+            "forecast": self.get_intersection_forecast(intersection_id) or "n/a",
         }
 
     def format_decision_output(self, decision):
@@ -222,6 +257,13 @@ Traffic Congestion Index: {latest.get('traffic_congestion_index', 0):.1f}
 - **Congestion Index:** {decision['congestion_index']}
 - **Congestion Level:** {decision['congestion_level']}
 
+### 📈 Distribution (all days, p50 / p95 / p99)
+- **Congestion Index:** {decision.get('congestion_percentiles', 'n/a')}
+- **Average Speed (mph):** {decision.get('speed_percentiles', 'n/a')}
+
+### 🔮 Forecast Congestion Index
+{decision.get('forecast', 'n/a')}
+
 ### ⏱️ Signal Timing Decision
 **{decision['signal_timing']}**
 
@@ -350,7 +392,7 @@ Traffic Congestion Index: {latest.get('traffic_congestion_index', 0):.1f}
                     gr.Markdown("### 🎯 Select Intersection")
 
                     try:
-                        stats_df = self._read_latest_csv("intersection_stats_csv/*.csv")
+                        stats_df = self.reader.intersection_stats()
                         if stats_df is not None:
                             intersections = stats_df["intersection_id"].tolist()
                             locations = stats_df["location"].tolist()
@@ -4,124 +4,559 @@ metrics_exporter.py
 Export traffic metrics in Prometheus format for Grafana
 """
 
-from prometheus_client import start_http_server, Gauge, CollectorRegistry
-import pandas as pd
+import argparse
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
 import time
-import glob
-import os
+import traceback
+
+import numpy as np
+import pandas as pd
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+
+try:
+    from .columnar_metrics import ColumnarCollector, ColumnarGauge, ColumnarHistogram, render_collectors, render_text
+    from .metrics_server import AsyncMetricsServer, Exposition, respond
+    from .processed_reader import ProcessedDataReader
+    from .sharding import ShardFilter
+    from .sketches import PERCENTILES, merge_sketch_table
+    from .tci import CONGESTION_LEVELS, congestion_level_codes
+    from .timeline_replay import TimelineIndex, TimelineReplay
+except ImportError:  # run as a script: python src/metrics_exporter.py
+    from columnar_metrics import ColumnarCollector, ColumnarGauge, ColumnarHistogram, render_collectors, render_text
+    from metrics_server import AsyncMetricsServer, Exposition, respond
+    from processed_reader import ProcessedDataReader
+    from sharding import ShardFilter
+    from sketches import PERCENTILES, merge_sketch_table
+    from tci import CONGESTION_LEVELS, congestion_level_codes
+    from timeline_replay import TimelineIndex, TimelineReplay
+
+
+SERIES_LABELS = ["intersection_id", "location"]
+# Upper bounds of the fleet-wide reading histograms; the TCI ones include the level thresholds
+TCI_BUCKETS = (5, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100)
+SPEED_BUCKETS = (5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55)
+READING_COLUMNS = ["traffic_congestion_index", "average_speed"]
+REPLAY_COLUMNS = ["timestamp", "intersection_id", "location", "vehicle_count", *READING_COLUMNS]
+UPDATE_SECONDS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SCRAPE_SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+
+@contextmanager
+def _timed(timings, phase):
+    """Add the duration of the block to timings[phase]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+
+def _series(frame, **labels):
+    """Label columns identifying one series per row of frame, plus labels shared by all rows"""
+    return {**{column: frame[column].to_numpy() for column in SERIES_LABELS}, **labels}
 
 
 class TrafficMetricsExporter:
-    """Export processed traffic metrics for Prometheus/Grafana"""
+    """Export processed traffic metrics for Prometheus/Grafana
 
-    def __init__(self, data_path="data/processed", port=8000):
+    Nothing is stored per series: update_metrics() only picks the frames of the current hour,
+    and a ColumnarCollector on self.registry turns their columns into metric families.
+    Series of intersections missing from the current frames are simply absent. The HTTP
+    servers answer from self.exposition, rendered once at the end of each update.
+
+    The exporter also instruments itself on the same registry (traffic_exporter_*): update
+    duration and phases, rows, series, last success, failures and scrape duration. These are
+    ordinary prometheus_client metrics, published as of the latest update. With
+    log_timings=True every update also prints one JSON line with its timings.
+
+    With replay_speed, updates walk enriched_data at its native resolution instead of one hour
+    of day per tick: every update shows the readings of the instant a TimelineReplay has reached,
+    replay_speed data seconds per wall-clock second (see timeline_replay.py and seek()).
+
+    With shard_count > 1 the exporter is shard shard_index of a fleet: it reads and exports only
+    the intersections that shard owns on the consistent-hash ring of sharding.py.
+    """
+
+    def __init__(self, data_path="data/processed", port=8000, log_timings=False, replay_speed=None,
+                 replay_start=None, shard_index=0, shard_count=1):
         self.data_path = data_path
+        self.shard = ShardFilter.of(shard_index, shard_count) if shard_count > 1 else None
+        self.shard_count = shard_count
+        self.reader = ProcessedDataReader(data_path, shard=self.shard)
+        # parsed once per ETL output, then sliced by hour on every tick
+        self.hourly_cache = self.reader.cached("hourly_metrics", index_column="hour")
+        self.percentiles_cache = self.reader.cached("percentiles/hourly", index_column="hour")
+        self.forecasts_cache = self.reader.cached("forecasts")
         self.port = port
-        self.registry = CollectorRegistry()
+        self.log_timings = log_timings
         self.current_hour = 0  # Track which hour of data to display
-        self._setup_metrics()
-
-    def _setup_metrics(self):
-        """Define Prometheus metrics"""
-        self.vehicle_count_gauge = Gauge(
-            "traffic_vehicle_count",
-            "Current vehicle count at intersection",
-            ["intersection_id", "location"],
-            registry=self.registry,
+        # frames of the hour last selected by update_metrics, exposed by the collector
+        self.hour_data = pd.DataFrame(
+            columns=[*SERIES_LABELS, "total_vehicles", "reading_count", "avg_speed", "avg_congestion_index"]
         )
+        self.quantiles = None
+        self.forecasts = None  # forecasts table as of the last update
+        # merged percentiles per hour of day, valid while percentiles_cache holds the same frame
+        self._merged_quantiles_by_hour = {}
+        self._quantiles_source = None
+        self.readings = pd.DataFrame(columns=READING_COLUMNS)  # enriched readings of the current hour
+        # readings per hour of day, each reloaded only when its date=*/hour=H directories change
+        self.readings_caches = {}
+        # replay mode: walk enriched_data at its native resolution, replay_speed data seconds per second
+        self.replay_speed = replay_speed
+        self.replay_start = replay_start
+        self.replay = None
+        self.replay_time = None
+        self._replay_source = None
+        if replay_speed:
+            self.enriched_cache = self.reader.cached("enriched_data", columns=REPLAY_COLUMNS)
+        self.registry = CollectorRegistry()
+        self.collector = ColumnarCollector(self.gauges)
+        self.registry.register(self.collector)
+        self._setup_self_metrics()
+        self._families_payload = b""
+        self.publish_exposition()
 
-        self.avg_speed_gauge = Gauge(
-            "traffic_average_speed",
-            "Average speed at intersection (mph)",
-            ["intersection_id", "location"],
+    def _setup_self_metrics(self):
+        """Metrics about the exporter itself, to alert on staleness and see where update time goes"""
+        self.update_duration_histogram = Histogram(
+            "traffic_exporter_update_duration_seconds",
+            "Duration of successful update cycles (read, process and render)",
+            buckets=UPDATE_SECONDS_BUCKETS,
             registry=self.registry,
         )
-
-        self.congestion_index_gauge = Gauge(
-            "traffic_congestion_index",
-            "Traffic Congestion Index (0-100)",
-            ["intersection_id", "location"],
+        self.update_phase_gauge = Gauge(
+            "traffic_exporter_update_phase_seconds",
+            "Time spent in each phase of the last successful update",
+            ["phase"],
             registry=self.registry,
         )
-
-        self.congestion_level_gauge = Gauge(
-            "traffic_congestion_level",
-            "Congestion level (0=Low, 1=Moderate, 2=High, 3=Severe, 4=Critical)",
-            ["intersection_id", "location"],
+        self.rows_processed_gauge = Gauge(
+            "traffic_exporter_rows_processed",
+            "Rows of each table processed by the last successful update",
+            ["table"],
             registry=self.registry,
         )
+        self.series_gauge = Gauge(
+            "traffic_exporter_series",
+            "Series in the traffic metric families of the current exposition",
+            registry=self.registry,
+        )
+        self.last_success_gauge = Gauge(
+            "traffic_exporter_last_success_timestamp_seconds",
+            "Unix time of the last successful update",
+            registry=self.registry,
+        )
+        self.consecutive_failures_gauge = Gauge(
+            "traffic_exporter_consecutive_failures",
+            "Failed updates since the last successful one",
+            registry=self.registry,
+        )
+        self.update_failures_counter = Counter(
+            "traffic_exporter_update_failures",
+            "Failed update cycles",
+            registry=self.registry,
+        )
+        self.scrape_duration_histogram = Histogram(
+            "traffic_exporter_scrape_duration_seconds",
+            "Time to answer a /metrics request, from parsed request to written response",
+            buckets=SCRAPE_SECONDS_BUCKETS,
+            registry=self.registry,
+        )
+        self.replay_timestamp_gauge = Gauge(
+            "traffic_exporter_replay_timestamp_seconds",
+            "Data time shown in replay mode (Unix seconds)",
+            registry=self.registry,
+        )
+        self.shard_info_gauge = Gauge(
+            "traffic_exporter_shard_info",
+            "Shard of the exporter fleet this instance serves (always 1)",
+            ["shard", "shard_count"],
+            registry=self.registry,
+        )
+        self.shard_info_gauge.labels(self.shard.shard if self.shard else "shard-0", str(self.shard_count)).set(1)
+        self.self_metrics = [
+            self.update_duration_histogram, self.update_phase_gauge, self.rows_processed_gauge,
+            self.series_gauge, self.last_success_gauge, self.consecutive_failures_gauge,
+            self.update_failures_counter, self.scrape_duration_histogram, self.replay_timestamp_gauge,
+            self.shard_info_gauge,
+        ]
 
-    def _read_latest_csv(self, pattern):
-        """Read the latest CSV file matching the pattern"""
-        files = glob.glob(os.path.join(self.data_path, pattern))
-        if not files:
-            return None
+    def observe_scrape(self, seconds):
+        """Record one answered scrape; called by the HTTP servers"""
+        self.scrape_duration_histogram.observe(seconds)
 
-        latest_file = max(files, key=os.path.getctime)
-        return pd.read_csv(latest_file)
+    def _frames(self):
+        """The frames the collector currently exposes, in the shape update_metrics renders"""
+        return {"hour_data": self.hour_data, "readings": self.readings, "quantiles": self.quantiles,
+                "forecasts": self.forecasts}
 
-    def _congestion_level_to_numeric(self, level):
-        """Convert congestion level string to numeric value"""
-        levels = {"Low": 0, "Moderate": 1, "High": 2, "Severe": 3, "Critical": 4}
-        return levels.get(level, 0)
+    def gauges(self, frames=None):
+        """Every traffic metric family as a ColumnarGauge/ColumnarHistogram of frames (default: the current ones)"""
+        frames = frames or self._frames()
+        hour = frames["hour_data"]
+        readings = frames["readings"]
+        series = _series(hour)
+        levels = congestion_level_codes(hour["avg_congestion_index"])
+        gauges = [
+            ColumnarGauge(
+                "traffic_vehicle_count",
+                "Current vehicle count at intersection",
+                series,
+                # Use total_vehicles divided by reading_count for average
+                hour["total_vehicles"].to_numpy(dtype=np.float64)
+                / np.maximum(hour["reading_count"].to_numpy(dtype=np.float64), 1),
+            ),
+            ColumnarGauge("traffic_average_speed", "Average speed at intersection (mph)", series, hour["avg_speed"]),
+            ColumnarGauge(
+                "traffic_congestion_index",
+                "Traffic Congestion Index (0-100)",
+                series,
+                hour["avg_congestion_index"],
+            ),
+            ColumnarGauge(
+                "traffic_congestion_level",
+                "Congestion level (0=Low, 1=Moderate, 2=High, 3=Severe, 4=Critical)",
+                series,
+                levels,
+            ),
+            ColumnarGauge(
+                "traffic_intersections_by_congestion_level",
+                "Intersections whose current congestion index is at each congestion level",
+                {"congestion_level": list(CONGESTION_LEVELS)},
+                np.bincount(levels, minlength=len(CONGESTION_LEVELS)),
+            ),
+            ColumnarHistogram(
+                "traffic_reading_congestion_index",
+                "Traffic Congestion Index of all readings of the current hour of day or replayed instant",
+                TCI_BUCKETS,
+                readings["traffic_congestion_index"],
+            ),
+            ColumnarHistogram(
+                "traffic_reading_average_speed",
+                "Average speed of all readings of the current hour of day or replayed instant (mph)",
+                SPEED_BUCKETS,
+                readings["average_speed"],
+            ),
+        ]
+        gauges += self._quantile_gauges(frames["quantiles"])
+        gauges.append(self._forecast_gauge(frames["forecasts"]))
+        gauges += self._cache_gauges()
+        return gauges
 
-    def update_metrics(self):
-        """Update Prometheus metrics from processed data"""
-        try:
-            # Read hourly metrics for time-series data
-            hourly_df = self._read_latest_csv("hourly_metrics_csv/*.csv")
+    def _cache_gauges(self):
+        """Hit rate, reloads, reload time and rows of each table cache"""
+        caches = [self.hourly_cache, self.percentiles_cache, self.forecasts_cache]
+        labels = {"table": [cache.name for cache in caches]}
+        return [
+            ColumnarGauge(
+                "traffic_exporter_cache_hit_ratio",
+                "Share of exporter table lookups served without reloading",
+                labels,
+                [cache.hit_rate for cache in caches],
+            ),
+            ColumnarGauge(
+                "traffic_exporter_cache_reloads",
+                "Times the exporter reloaded a table because its files changed",
+                labels,
+                [cache.stats["reloads"] for cache in caches],
+            ),
+            ColumnarGauge(
+                "traffic_exporter_cache_last_reload_seconds",
+                "Duration of the last table reload",
+                labels,
+                [cache.stats["last_reload_seconds"] for cache in caches],
+            ),
+            ColumnarGauge(
+                "traffic_exporter_cache_rows",
+                "Rows held by the exporter's table cache",
+                labels,
+                [cache.stats["rows_loaded"] for cache in caches],
+            ),
+        ]
 
-            if hourly_df is None:
-                print("No data files found. Waiting for ETL pipeline to generate data...")
-                return
+    def _forecast_gauge(self, forecasts):
+        """Forecasts read by the last update, one series per intersection and horizon"""
+        if forecasts is None:
+            forecasts = pd.DataFrame(columns=[*SERIES_LABELS, "horizon_minutes", "forecast_congestion_index"])
+        return ColumnarGauge(
+            "traffic_congestion_index_forecast",
+            "Forecast Traffic Congestion Index horizon_minutes after the latest reading",
+            _series(forecasts, horizon_minutes=forecasts["horizon_minutes"].to_numpy()),
+            forecasts["forecast_congestion_index"],
+        )
 
-            # Filter data for current hour
-            hour_data = hourly_df[hourly_df["hour"] == self.current_hour]
-            
-            if hour_data.empty:
-                # Reset to hour 0 if we've gone past available data
-                self.current_hour = 0
-                hour_data = hourly_df[hourly_df["hour"] == self.current_hour]
+    def _quantile_gauges(self, merged):
+        """Percentiles of the current hour of day, one series per intersection and quantile"""
+        if merged is None:
+            merged = pd.DataFrame(columns=SERIES_LABELS)
+        labels = {
+            column: np.tile(merged[column].to_numpy(), len(PERCENTILES)) for column in SERIES_LABELS
+        }
+        labels["quantile"] = np.repeat([str(q) for q in PERCENTILES.values()], len(merged))
 
-            for _, row in hour_data.iterrows():
-                intersection_id = row["intersection_id"]
-                location = row["location"]
+        def values(metric):
+            if merged.empty:
+                return []
+            return np.concatenate([merged[f"{metric}_{label}"].to_numpy(dtype=np.float64) for label in PERCENTILES])
 
-                # Use total_vehicles divided by reading_count for average
-                avg_vehicles = row.get("total_vehicles", 0) / max(row.get("reading_count", 1), 1)
-                
-                self.vehicle_count_gauge.labels(intersection_id=intersection_id, location=location).set(
-                    avg_vehicles
-                )
+        return [
+            ColumnarGauge(
+                "traffic_congestion_index_quantile",
+                "Traffic Congestion Index percentiles of the current hour of day, from merged sketches",
+                labels,
+                values("congestion_index"),
+            ),
+            ColumnarGauge(
+                "traffic_average_speed_quantile",
+                "Average speed percentiles of the current hour of day (mph), from merged sketches",
+                labels,
+                values("speed"),
+            ),
+        ]
 
-                self.avg_speed_gauge.labels(intersection_id=intersection_id, location=location).set(
-                    row.get("avg_speed", 0)
-                )
+    def _merged_quantiles(self, hour):
+        """Percentiles of the stored sketches of one hour of day (None without sketches)"""
+        sketches = self.percentiles_cache.get(hour)
+        if sketches is None or sketches.empty or "congestion_index_sketch" not in sketches:
+            return None
+
+        if self.percentiles_cache.frame is not self._quantiles_source:
+            # new sketches: merge each hour again the next time it comes up
+            self._merged_quantiles_by_hour = {}
+            self._quantiles_source = self.percentiles_cache.frame
+        if hour not in self._merged_quantiles_by_hour:
+            # one sketch per date for this hour; merged, they give the distribution over all dates
+            self._merged_quantiles_by_hour[hour] = merge_sketch_table(sketches, SERIES_LABELS)
+        return self._merged_quantiles_by_hour[hour]
+
+    def _hourly_frames(self, timings):
+        """(hourly metrics, enriched readings) of the current hour of day; None without data"""
+        # Read only the current hour of the hourly metrics
+        with _timed(timings, "read_hourly_metrics"):
+            hour_data = self.hourly_cache.get(self.current_hour)
+
+        if hour_data is None:
+            return None
 
-                self.congestion_index_gauge.labels(intersection_id=intersection_id, location=location).set(
-                    row.get("avg_congestion_index", 0)
+        if hour_data.empty:
+            # Reset to hour 0 if we've gone past available data
+            self.current_hour = 0
+            with _timed(timings, "read_hourly_metrics"):
+                hour_data = self.hourly_cache.get(self.current_hour)
+
+        with _timed(timings, "read_enriched_data"):
+            if self.current_hour not in self.readings_caches:
+                self.readings_caches[self.current_hour] = self.reader.cached(
+                    "enriched_data", columns=READING_COLUMNS, hour=self.current_hour
                 )
+            readings = self.readings_caches[self.current_hour].get()
+        return hour_data, readings
+
+    def _replay_frames(self, timings):
+        """(per-intersection readings, readings) at the replayed instant, shaped like _hourly_frames"""
+        with _timed(timings, "read_enriched_data"):
+            enriched = self.enriched_cache.get()
+        if enriched is None or enriched.empty:
+            return None
+
+        if enriched is not self._replay_source:
+            # new ETL output: index it once, then keep replaying from the same data time
+            with _timed(timings, "index_timeline"):
+                index = TimelineIndex(enriched, REPLAY_COLUMNS)
+            start = self.replay.data_time() if self.replay is not None else self.replay_start
+            self.replay = TimelineReplay(index, speed=self.replay_speed, start=start)
+            self._replay_source = enriched
+
+        with _timed(timings, "replay_slice"):
+            timestamp, rows = self.replay.current()
+        self.replay_time = pd.Timestamp(timestamp)
+        self.current_hour = self.replay_time.hour
+        self.replay_timestamp_gauge.set(self.replay_time.timestamp())
+        hour_data = pd.DataFrame({
+            "intersection_id": rows["intersection_id"],
+            "location": rows["location"],
+            "total_vehicles": rows["vehicle_count"],
+            "reading_count": 1,
+            "avg_speed": rows["average_speed"],
+            "avg_congestion_index": rows["traffic_congestion_index"],
+        })
+        return hour_data, pd.DataFrame({column: rows[column] for column in READING_COLUMNS})
+
+    def seek(self, when):
+        """Replay mode: continue the replay from data time `when` (e.g. "2024-01-03 08:00")"""
+        if self.replay is not None:
+            self.replay.seek(when)
+        else:
+            self.replay_start = when
+
+    def update_metrics(self):
+        """Select the processed data of the current hour (or replayed instant) and publish it
+
+        Returns True on success. A failure keeps the previous data on /metrics, counts towards
+        traffic_exporter_consecutive_failures and is printed with its traceback.
+        """
+        start = time.perf_counter()
+        timings = {}
+        try:
+            frames = self._replay_frames(timings) if self.replay_speed else self._hourly_frames(timings)
+            if frames is None:
+                print("No data files found. Waiting for ETL pipeline to generate data...")
+                return False
+
+            hour_data, readings = frames
+            with _timed(timings, "merge_sketches"):
+                quantiles = self._merged_quantiles(self.current_hour)
+            with _timed(timings, "read_forecasts"):
+                forecasts = self.forecasts_cache.get()
+            if readings is None:
+                readings = self.readings.iloc[:0]
+            frames = {"hour_data": hour_data, "readings": readings, "quantiles": quantiles, "forecasts": forecasts}
+            with _timed(timings, "render"):
+                series = self._render_families(frames)
+            # switch all frames together once they rendered, so a failure above leaves the previous
+            # hour in place for the collector and the published exposition alike
+            self.hour_data, self.readings, self.quantiles, self.forecasts = hour_data, readings, quantiles, forecasts
+
+            rows = {
+                "hourly_metrics": len(hour_data),
+                "enriched_data": len(self.readings),
+                "percentiles/hourly": 0 if quantiles is None else len(quantiles),
+            }
+            self._record_success(time.perf_counter() - start, timings, rows, series)
+            self.publish_exposition(render_families=False)
+
+            if self.replay_speed:
+                print(f"Metrics updated for replay time {self.replay_time} at {time.strftime('%Y-%m-%d %H:%M:%S')}")
+                return True
 
             print(f"Metrics updated for hour {self.current_hour} at {time.strftime('%Y-%m-%d %H:%M:%S')}")
             
             # Advance to next hour for next update
             self.current_hour = (self.current_hour + 1) % 24
+            return True
 
         except Exception as e:
-            print(f"Error updating metrics: {e}")
+            self.update_failures_counter.inc()
+            self.consecutive_failures_gauge.inc()
+            print(f"Error updating metrics for hour {self.current_hour}: {e!r}")
+            traceback.print_exc()
+            if self.log_timings:
+                print(json.dumps({"event": "exporter_update_failed", "hour": self.current_hour, "error": repr(e),
+                                  "seconds": round(time.perf_counter() - start, 6)}))
+            # previous traffic data, current failure counts
+            self.publish_exposition(render_families=False)
+            return False
+
+    def _record_success(self, seconds, timings, rows, series):
+        self.update_duration_histogram.observe(seconds)
+        for phase, phase_seconds in timings.items():
+            self.update_phase_gauge.labels(phase=phase).set(phase_seconds)
+        for table, count in rows.items():
+            self.rows_processed_gauge.labels(table=table).set(count)
+        self.last_success_gauge.set_to_current_time()
+        self.consecutive_failures_gauge.set(0)
+        if self.log_timings:
+            print(json.dumps({
+                "event": "exporter_update",
+                "hour": self.current_hour,
+                "seconds": round(seconds, 6),
+                "phases": {phase: round(value, 6) for phase, value in timings.items()},
+                "rows": rows,
+                "series": series,
+            }))
+
+    def _render_families(self, frames=None):
+        """Serialize the traffic metric families of frames (default: the current ones); returns their number of series"""
+        metrics = self.gauges(frames)
+        self._families_payload = render_text(metrics)
+        series = sum(len(metric) for metric in metrics)
+        self.series_gauge.set(series)
+        return series
+
+    def publish_exposition(self, render_families=True):
+        """Serialize all metrics once; scrapes are served from the result until the next update
+
+        render_families=False reuses the traffic families of the last render and only refreshes
+        the exporter's own metrics.
+        """
+        if render_families:
+            self._render_families()
+        self.exposition = Exposition(self._families_payload + render_collectors(self.self_metrics))
 
-    def start(self, update_interval=30):
-        """Start the metrics exporter server"""
-        start_http_server(self.port, registry=self.registry)
-        print(f"Metrics server started on port {self.port}")
+    def start(self, update_interval=30, server="threaded"):
+        """Start the metrics exporter server ("threaded", or "async" for the asyncio server)"""
+        print(f"Metrics server ({server}) starting on port {self.port}")
         print(f"Access metrics at: http://localhost:{self.port}/metrics")
         print(f"Update interval: {update_interval} seconds")
+        if self.shard is not None:
+            print(f"Serving {self.shard.shard} of {self.shard_count} shards")
+        if server == "async":
+            AsyncMetricsServer(self, port=self.port, update_interval=update_interval).run()
+            return
 
+        http_server = make_server(self, port=self.port)
+        threading.Thread(target=http_server.serve_forever, daemon=True).start()
         while True:
             self.update_metrics()
             time.sleep(update_interval)
 
 
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """GET/HEAD /metrics from the exporter's current exposition"""
+
+    exporter = None
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        start = time.perf_counter()
+        headers = {name.lower(): value for name, value in self.headers.items()}
+        status, response_headers, body = respond(self.exporter.exposition, self.command, self.path, headers)
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in response_headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+        self.exporter.observe_scrape(time.perf_counter() - start)
+
+    do_HEAD = do_GET
+
+    def log_message(self, format, *args):
+        pass  # one line per scrape would drown the update log
+
+
+def make_server(exporter, host="0.0.0.0", port=8000):
+    """HTTP server for the exporter's /metrics; call serve_forever() (port=0 picks a free port)"""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"exporter": exporter})
+    return ThreadingHTTPServer((host, port), handler)
+
+
 if __name__ == "__main__":
-    exporter = TrafficMetricsExporter(port=8000)
-    exporter.start(update_interval=30)
+    parser = argparse.ArgumentParser(description="Export processed traffic metrics for Prometheus")
+    parser.add_argument("--data-path", default="data/processed")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--update-interval", type=float, default=30)
+    parser.add_argument("--server", choices=["threaded", "async"], default="threaded")
+    parser.add_argument("--log-timings", action="store_true", help="print one JSON line of timings per update")
+    parser.add_argument("--replay-speed", type=float, default=None,
+                        help="replay enriched_data at its native resolution, N data seconds per second")
+    parser.add_argument("--replay-start", default=None, help="data time to start the replay at, e.g. 2024-01-03T08:00")
+    parser.add_argument("--shard-index", type=int, default=0, help="shard of the fleet served by this instance")
+    parser.add_argument("--shard-count", type=int, default=1, help="exporter instances sharing the intersections")
+    args = parser.parse_args()
+
+    exporter = TrafficMetricsExporter(
+        data_path=args.data_path,
+        port=args.port,
+        log_timings=args.log_timings,
+        replay_speed=args.replay_speed,
+        replay_start=args.replay_start,
+        shard_index=args.shard_index,
+        shard_count=args.shard_count,
+    )
+    exporter.start(update_interval=args.update_interval, server=args.server)
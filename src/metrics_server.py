@@ -0,0 +1,134 @@
+"""
+metrics_server.py
+Serve the exporter's /metrics from a payload serialized once per data update
+
+An Exposition holds the rendered text format, its gzip-compressed copy and an ETag. The
+exporter swaps in a new one at the end of every update_metrics(); scrapes only pick the
+current one and write it out, so concurrent scrapers (several Prometheus replicas, ad-hoc
+curl checks) never repeat the serialization. respond() handles content negotiation and
+If-None-Match (304) for both HTTP front ends:
+
+  metrics_exporter.make_server   ThreadingHTTPServer, one thread per connection
+  AsyncMetricsServer             asyncio server with keep-alive; update_metrics runs in a
+                                 worker thread, so reloads never block the event loop
+"""
+
+import asyncio
+import gzip
+import hashlib
+import threading
+import time
+
+try:
+    from .columnar_metrics import CONTENT_TYPE
+except ImportError:  # imported from src/metrics_exporter.py run as a script
+    from columnar_metrics import CONTENT_TYPE
+
+GZIP_LEVEL = 6
+_REASONS = {200: "OK", 304: "Not Modified", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+class Exposition:
+    """One serialized scrape response: raw and gzip bodies plus a (weak) ETag for both"""
+
+    def __init__(self, payload):
+        self.raw = payload
+        self.gzipped = gzip.compress(payload, compresslevel=GZIP_LEVEL, mtime=0)
+        self.etag = f'W/"{hashlib.blake2b(payload, digest_size=16).hexdigest()}"'
+        self.created = time.time()
+
+
+def _accepts_gzip(accept_encoding):
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*") and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00"):
+            return True
+    return False
+
+
+def respond(exposition, method, path, headers):
+    """(status, headers, body) of a request; header names in `headers` are lower case"""
+    if path.split("?")[0] != "/metrics":
+        return 404, {"Content-Type": "text/plain"}, b"not found\n"
+    if method not in ("GET", "HEAD"):
+        return 405, {"Content-Type": "text/plain", "Allow": "GET, HEAD"}, b"method not allowed\n"
+
+    response_headers = {"ETag": exposition.etag, "Vary": "Accept-Encoding"}
+    if_none_match = [tag.strip() for tag in headers.get("if-none-match", "").split(",")]
+    # If-None-Match uses weak comparison, so W/"x" and "x" both match
+    if "*" in if_none_match or exposition.etag[2:] in [tag.removeprefix("W/") for tag in if_none_match]:
+        return 304, response_headers, b""
+
+    response_headers["Content-Type"] = CONTENT_TYPE
+    body = exposition.raw
+    if _accepts_gzip(headers.get("accept-encoding", "")):
+        response_headers["Content-Encoding"] = "gzip"
+        body = exposition.gzipped
+    return 200, response_headers, body
+
+
+class AsyncMetricsServer:
+    """asyncio HTTP/1.1 server for an exporter's /metrics, updating it every update_interval"""
+
+    def __init__(self, exporter, host="0.0.0.0", port=8000, update_interval=30):
+        self.exporter = exporter
+        self.host = host
+        self.port = port
+        self.update_interval = update_interval
+        self.ready = threading.Event()  # set once the socket is bound (self.port is then final)
+        self._loop = None
+        self._stop = None
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+                method, path, version = request[0].split(" ", 2)
+                headers = {}
+                for line in request[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+
+                start = time.perf_counter()
+                status, response_headers, body = respond(self.exporter.exposition, method, path, headers)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                head = [f"HTTP/1.1 {status} {_REASONS[status]}", f"Content-Length: {len(body)}"]
+                head += [f"{name}: {value}" for name, value in response_headers.items()]
+                head.append("Connection: keep-alive" if keep_alive else "Connection: close")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                self.exporter.observe_scrape(time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+            pass  # client went away or sent something that is not HTTP
+        finally:
+            writer.close()
+
+    async def _update_loop(self):
+        while True:
+            # loading and rendering happen off the event loop; scrapes keep getting the last payload
+            await self._loop.run_in_executor(None, self.exporter.update_metrics)
+            await asyncio.sleep(self.update_interval)
+
+    async def serve(self):
+        """Serve until stop() is called"""
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        updater = asyncio.create_task(self._update_loop())
+        self.ready.set()
+        async with server:
+            await self._stop.wait()
+        updater.cancel()
+
+    def run(self):
+        asyncio.run(self.serve())
+
+    def stop(self):
+        """Stop a server running in another thread"""
+        self._loop.call_soon_threadsafe(self._stop.set)
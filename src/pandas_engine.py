@@ -0,0 +1,232 @@
+"""
+pandas_engine.py
+In-process pandas/pyarrow execution engine for small and medium traffic datasets
+"""
+
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    from .forecasting import pandas_forecasts
+    from .rollups import pandas_rollups
+    from .sketches import DAILY_SKETCH_KEYS, merge_sketch_table, pandas_sketches
+    from .tci import congestion_components, congestion_level, round_half_up  # noqa: F401 (re-exported)
+    from .validation import pandas_quality_issues, pandas_violation_counts
+except ImportError:  # imported from src/etl_pipeline.py run as a script
+    from forecasting import pandas_forecasts
+    from rollups import pandas_rollups
+    from sketches import DAILY_SKETCH_KEYS, merge_sketch_table, pandas_sketches
+    from tci import congestion_components, congestion_level, round_half_up  # noqa: F401
+    from validation import pandas_quality_issues, pandas_violation_counts
+
+HOURLY_KEYS = ["intersection_id", "location", "hour"]
+INTERSECTION_KEYS = ["intersection_id", "location", "latitude", "longitude", "num_lanes", "capacity_per_hour"]
+
+# Partitioned layout of enriched_data: one directory per date and hour, rows clustered by
+# intersection within each file and small row groups, so min/max statistics let readers skip
+PARTITION_COLUMNS = ["date", "hour"]
+CLUSTER_COLUMNS = ["intersection_id", "timestamp"]
+ROW_GROUP_ROWS = 4096
+
+
+class PandasTrafficEngine:
+    """Run extract/transform/aggregate/load in-process, mirroring TrafficETLPipeline's Spark logic"""
+
+    def __init__(self, interval_minutes=5, validate=True):
+        self.interval_minutes = interval_minutes
+        self.validate = validate
+        self.stats = {}
+
+    def extract(self, sensor_data_path, metadata_path):
+        """Extract data from CSV files or a partitioned Parquet directory"""
+        print(f"Extracting data from {sensor_data_path} and {metadata_path}")
+
+        if sensor_data_path.endswith(".csv"):
+            sensor_df = pd.read_csv(sensor_data_path, parse_dates=["timestamp"])
+        else:
+            sensor_df = pd.read_parquet(sensor_data_path)
+        metadata_df = pd.read_csv(metadata_path)
+
+        self.stats["sensor_records"] = {"rows": len(sensor_df)}
+        self.stats["intersection_records"] = {"rows": len(metadata_df)}
+        print(f"Extracted {len(sensor_df)} sensor records")
+        print(f"Extracted {len(metadata_df)} intersection records")
+
+        return sensor_df, metadata_df
+
+    def transform(self, sensor_df, metadata_df):
+        """Transform and enrich traffic data"""
+        print("Starting transformation...")
+
+        sensor = sensor_df[["timestamp", "intersection_id", "vehicle_count", "average_speed", "num_lanes"]]
+        metadata = metadata_df[INTERSECTION_KEYS].rename(columns={"num_lanes": "metadata_num_lanes"})
+        enriched = sensor.merge(metadata, on="intersection_id", how="left")
+        enriched["timestamp"] = pd.to_datetime(enriched["timestamp"])
+
+        # prefer metadata num_lanes if available, fall back to sensor value
+        enriched["num_lanes"] = enriched["metadata_num_lanes"].fillna(enriched["num_lanes"]).astype(np.int64)
+
+        components = congestion_components(
+            enriched["vehicle_count"], enriched["average_speed"], enriched["capacity_per_hour"], self.interval_minutes
+        )
+        tci = components["traffic_congestion_index"]
+        hours = enriched["timestamp"].dt.hour.to_numpy()
+
+        enriched = enriched.assign(
+            **components,
+            date=enriched["timestamp"].dt.date,
+            hour=hours,
+            time_of_day=np.select(
+                [(hours >= 6) & (hours < 12), (hours >= 12) & (hours < 18), (hours >= 18) & (hours < 22)],
+                ["Morning", "Afternoon", "Evening"],
+                default="Night",
+            ),
+            congestion_level=congestion_level(tci),
+        )
+
+        enriched = enriched[
+            [
+                "timestamp", "intersection_id", "vehicle_count", "average_speed", "num_lanes", "location",
+                "latitude", "longitude", "capacity_per_hour", "capacity_per_5min", "volume_ratio",
+                "speed_factor", "traffic_congestion_index", "date", "hour", "time_of_day", "congestion_level",
+            ]
+        ]
+
+        self.stats["enriched_records"] = {
+            "rows": len(enriched),
+            "missing_capacity": int(enriched["capacity_per_hour"].isna().sum()),
+            "total_vehicles": int(enriched["vehicle_count"].sum()),
+            "avg_congestion_index": float(np.nanmean(tci)) if len(tci) else None,
+            "max_congestion_index": float(np.nanmax(tci)) if len(tci) else None,
+        }
+        if self.validate:
+            enriched = enriched.assign(quality_issues=pandas_quality_issues(enriched, self.interval_minutes))
+            self.stats["validation"] = pandas_violation_counts(enriched["quality_issues"])
+        print(f"Transformation complete. Total records: {len(enriched)}")
+
+        return enriched
+
+    def split_quarantine(self, enriched_df):
+        """Split transform output into (valid rows, quarantined rows with their reason codes)"""
+        clean = (enriched_df["quality_issues"] == "").to_numpy()
+        return enriched_df[clean].drop(columns="quality_issues"), enriched_df[~clean]
+
+    def aggregate_partials(self, enriched_df):
+        """Mergeable partial aggregates (sums and non-null counts, never averages)"""
+        hourly_partials = enriched_df.groupby(HOURLY_KEYS, sort=False, dropna=False).agg(
+            total_vehicles=("vehicle_count", "sum"),
+            speed_sum=("average_speed", "sum"),
+            speed_readings=("average_speed", "count"),
+            congestion_index_sum=("traffic_congestion_index", "sum"),
+            congestion_index_readings=("traffic_congestion_index", "count"),
+            reading_count=("intersection_id", "size"),
+        ).reset_index()
+
+        intersection_partials = enriched_df.groupby(INTERSECTION_KEYS, sort=False, dropna=False).agg(
+            vehicle_sum=("vehicle_count", "sum"),
+            vehicle_readings=("vehicle_count", "count"),
+            speed_sum=("average_speed", "sum"),
+            speed_readings=("average_speed", "count"),
+            congestion_index_sum=("traffic_congestion_index", "sum"),
+            congestion_index_readings=("traffic_congestion_index", "count"),
+        ).reset_index()
+
+        return hourly_partials, intersection_partials
+
+    def finalize_partials(self, hourly_partials, intersection_partials):
+        """Turn partial aggregates into the hourly_metrics and intersection_stats tables"""
+        hourly_metrics = pd.DataFrame(
+            {
+                **{key: hourly_partials[key] for key in HOURLY_KEYS},
+                "total_vehicles": hourly_partials["total_vehicles"],
+                "avg_speed": hourly_partials["speed_sum"] / hourly_partials["speed_readings"],
+                "avg_congestion_index": (
+                    hourly_partials["congestion_index_sum"] / hourly_partials["congestion_index_readings"]
+                ),
+                "reading_count": hourly_partials["reading_count"],
+            }
+        ).sort_values(["intersection_id", "hour"], kind="stable").reset_index(drop=True)
+
+        intersection_stats = pd.DataFrame(
+            {
+                **{key: intersection_partials[key] for key in INTERSECTION_KEYS},
+                "avg_vehicle_count": intersection_partials["vehicle_sum"] / intersection_partials["vehicle_readings"],
+                "avg_speed": intersection_partials["speed_sum"] / intersection_partials["speed_readings"],
+                "avg_congestion_index": (
+                    intersection_partials["congestion_index_sum"] / intersection_partials["congestion_index_readings"]
+                ),
+            }
+        ).sort_values("avg_congestion_index", ascending=False, kind="stable").reset_index(drop=True)
+
+        return hourly_metrics, intersection_stats
+
+    def aggregate_metrics(self, enriched_df):
+        """Create aggregated metrics for dashboard"""
+        print("Creating aggregated metrics...")
+
+        return self.finalize_partials(*self.aggregate_partials(enriched_df))
+
+    def aggregate_rollups(self, enriched_df):
+        """Multi-granularity rollups, see rollups.ROLLUPS"""
+        return pandas_rollups(enriched_df)
+
+    def aggregate_percentiles(self, enriched_df):
+        """Quantile sketch tables, see sketches.py"""
+        hourly = pandas_sketches(enriched_df)
+        return {"hourly": hourly, "daily": merge_sketch_table(hourly, DAILY_SKETCH_KEYS)}
+
+    def forecast(self, enriched_df):
+        """Congestion index forecasts of every intersection, fitted in one vectorized batch"""
+        start = time.perf_counter()
+        forecasts = pandas_forecasts(enriched_df, self.interval_minutes)
+        self.stats["forecasts"] = {
+            "intersections": forecasts["intersection_id"].nunique(),
+            "rows": len(forecasts),
+            "fit_seconds": time.perf_counter() - start,
+        }
+        return forecasts
+
+    def load(self, df, output_path, file_format="parquet", mode="overwrite", partition_by=None):
+        """Load processed data to storage, using the same directory layout as Spark
+
+        With partition_by, Parquet output gets one hive-style directory per partition value
+        (e.g. date=2024-01-01/hour=7) holding rows sorted by CLUSTER_COLUMNS, and
+        mode="overwrite_partitions" replaces only the partitions present in df.
+        """
+        print(f"Loading data to {output_path}")
+
+        if mode == "overwrite":
+            shutil.rmtree(output_path, ignore_errors=True)
+        os.makedirs(output_path, exist_ok=True)
+
+        if file_format == "parquet" and partition_by:
+            for key, part_df in df.groupby(partition_by, sort=True):
+                directory = os.path.join(output_path, *(f"{c}={v}" for c, v in zip(partition_by, key)))
+                if mode == "overwrite_partitions":
+                    shutil.rmtree(directory, ignore_errors=True)
+                part_df = part_df.drop(columns=partition_by).sort_values(CLUSTER_COLUMNS, kind="stable")
+                self._write_parquet_part(part_df, directory)
+        elif file_format == "parquet":
+            self._write_parquet_part(df, output_path)
+        elif file_format == "csv":
+            part = len([f for f in os.listdir(output_path) if f.startswith("part-")])
+            df.to_csv(os.path.join(output_path, f"part-{part:05d}.csv"), index=False)
+
+        print(f"Data successfully loaded to {output_path}")
+
+    def _write_parquet_part(self, df, directory):
+        """Add the next part-XXXXX.parquet file to a directory"""
+        os.makedirs(directory, exist_ok=True)
+        part = len([f for f in os.listdir(directory) if f.startswith("part-")])
+        pq.write_table(
+            pa.Table.from_pandas(df, preserve_index=False),
+            os.path.join(directory, f"part-{part:05d}.parquet"),
+            coerce_timestamps="us",
+            row_group_size=ROW_GROUP_ROWS,
+        )
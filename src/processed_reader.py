@@ -0,0 +1,248 @@
+"""
+processed_reader.py
+Filter-aware reads of the processed Parquet layout for the exporter and UI
+"""
+
+import datetime
+import glob
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+try:
+    from .serving_snapshots import SERVING_DIR, SnapshotReader
+except ImportError:  # imported from a script in src/
+    from serving_snapshots import SERVING_DIR, SnapshotReader
+
+SHARD_COLUMN = "intersection_id"
+
+# date=YYYY-MM-DD/hour=H directories written by TrafficETLPipeline(layout="partitioned")
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string()), ("hour", pa.int32())]), flavor="hive")
+
+
+class ProcessedDataReader:
+    """Read one hour or one intersection of the processed tables without scanning everything
+
+    Tables in the current serving snapshot (see serving_snapshots.py) are read from its
+    memory-mapped Arrow files, which are complete by construction and switch to a newer
+    version as soon as the ETL publishes one. Other tables (enriched_data) come from Parquet.
+    Filters are pushed down to pyarrow: partition values prune whole date/hour directories and
+    row-group min/max statistics skip the rest of each file, which the partitioned layout keeps
+    sorted by intersection_id. `last_scan` reports how many files, row groups and bytes the
+    previous read touched. Tables that only exist as a legacy <name>_csv export are read from
+    the latest CSV file and filtered in memory.
+
+    With a shard (sharding.ShardFilter), every read keeps only the rows of intersections the
+    shard owns, dropping the others before they are converted to pandas.
+    """
+
+    def __init__(self, data_path="data/processed", shard=None):
+        self.data_path = data_path
+        self.shard = shard
+        self.snapshots = SnapshotReader(os.path.join(data_path, SERVING_DIR))
+        self.last_scan = {}
+
+    def _dataset(self, name):
+        path = os.path.join(self.data_path, name)
+        if not os.path.isdir(path):
+            return None
+        partitioning = PARTITIONING if name == "enriched_data" else None
+        return ds.dataset(path, format="parquet", partitioning=partitioning)
+
+    def _latest_csv(self, name):
+        files = glob.glob(os.path.join(self.data_path, f"{name}_csv", "*.csv"))
+        return max(files, key=os.path.getctime) if files else None
+
+    def _read_latest_csv(self, name):
+        path = self._latest_csv(name)
+        return pd.read_csv(path) if path else None
+
+    def source_files(self, name):
+        """The files a read of `name` would load: snapshot file, Parquet files or latest CSV"""
+        manifest = self.snapshots.refresh()
+        if manifest is not None and name in manifest["tables"]:
+            return [os.path.join(self.snapshots.snapshot_dir, manifest["tables"][name]["file"])]
+        dataset = self._dataset(name)
+        if dataset is not None:
+            return sorted(dataset.files)
+        path = self._latest_csv(name)
+        return [path] if path else []
+
+    def partition_dirs(self, name, **equals):
+        """Directory of `name` and the partition directories a read with these values would scan
+
+        e.g. partition_dirs("enriched_data", hour=8) gives the table directory, every date=*
+        directory and every date=*/hour=8 directory below it.
+        """
+        levels = [[os.path.join(self.data_path, name)]]
+        if name == "enriched_data":
+            for column in PARTITIONING.schema.names:
+                value = equals.get(column)
+                pattern = f"{column}={glob.escape(str(value))}" if value is not None else f"{column}=*"
+                levels.append(sorted(path for parent in levels[-1] for path in glob.glob(os.path.join(parent, pattern))))
+        return [path for level in levels for path in level]
+
+    def read(self, name, columns=None, **equals):
+        """Rows of a processed table whose columns equal the given values (None if missing)
+
+        e.g. read("enriched_data", intersection_id="INT_003", hour=8)
+        """
+        equals = {column: value for column, value in equals.items() if value is not None}
+        if self.shard is not None and columns and SHARD_COLUMN not in columns:
+            # the shard filter needs the ids; they are dropped again after filtering
+            df = self.read(name, [*columns, SHARD_COLUMN], **equals)
+            return None if df is None else df[columns]
+        expression = None
+        for column, value in equals.items():
+            term = ds.field(column) == value
+            expression = term if expression is None else expression & term
+
+        snapshot = self.snapshots.table(name)
+        if snapshot is not None:
+            table = snapshot.filter(expression) if expression is not None else snapshot
+            table = self._shard_rows(table.select(columns) if columns else table)
+            self.last_scan = {"snapshot": self.snapshots.manifest["version"], "files": 1, "row_groups": None,
+                              "bytes": table.nbytes, "rows": table.num_rows}
+            return table.to_pandas()
+
+        dataset = self._dataset(name)
+        if dataset is None:
+            df = self._read_latest_csv(name)
+            if df is None:
+                return None
+            for column, value in equals.items():
+                df = df[df[column].astype(str) == str(value)]
+            if self.shard is not None and SHARD_COLUMN in df:
+                df = df[self.shard.mask(df[SHARD_COLUMN].astype(str)).to_numpy(zero_copy_only=False)]
+            self.last_scan = {"files": 1, "row_groups": None, "bytes": None, "rows": len(df)}
+            return df[columns] if columns else df
+
+        # Partition pruning, then row-group pruning from the min/max statistics in each footer
+        files, row_groups, nbytes, tables = 0, 0, 0, []
+        for fragment in dataset.get_fragments(filter=expression):
+            files += 1
+            for piece in fragment.split_by_row_group(expression, schema=dataset.schema):
+                row_groups += len(piece.row_groups)
+                nbytes += sum(rg.total_byte_size for rg in piece.row_groups)
+                tables.append(piece.to_table(schema=dataset.schema, columns=columns, filter=expression))
+
+        table = pa.concat_tables(tables) if tables else dataset.schema.empty_table()
+        if not tables and columns:
+            table = table.select(columns)
+        table = self._shard_rows(table)
+        self.last_scan = {"files": files, "row_groups": row_groups, "bytes": nbytes, "rows": table.num_rows}
+        return table.to_pandas()
+
+    def _shard_rows(self, table):
+        """Rows of a pyarrow table owned by the reader's shard (all rows without a shard)"""
+        if self.shard is None or SHARD_COLUMN not in table.column_names:
+            return table
+        return table.filter(self.shard.mask(table[SHARD_COLUMN]))
+
+    def enriched(self, intersection_id=None, date=None, hour=None, columns=None):
+        """Enriched readings, optionally for one intersection, date (YYYY-MM-DD) and/or hour"""
+        return self.read("enriched_data", columns, intersection_id=intersection_id, date=date, hour=hour)
+
+    def hourly_metrics(self, intersection_id=None, hour=None):
+        return self.read("hourly_metrics", intersection_id=intersection_id, hour=hour)
+
+    def intersection_stats(self, intersection_id=None):
+        return self.read("intersection_stats", intersection_id=intersection_id)
+
+    def forecasts(self, intersection_id=None, horizon_minutes=None):
+        """Latest congestion index forecasts, one row per intersection and horizon"""
+        return self.read("forecasts", intersection_id=intersection_id, horizon_minutes=horizon_minutes)
+
+    def cached(self, name, index_column=None, columns=None, **equals):
+        """A CachedTable of `name` (optionally only some columns and rows), reloaded only when its files change
+
+        e.g. cached("enriched_data", hour=8) holds hour 8 of every date
+        """
+        return CachedTable(self, name, index_column, columns, **equals)
+
+    def percentiles(self, intersection_id=None, date=None, hour=None, granularity="hourly"):
+        """Quantile sketch rows of percentiles/hourly or percentiles/daily (see sketches.py)"""
+        if isinstance(date, str):
+            date = datetime.date.fromisoformat(date)
+        return self.read(f"percentiles/{granularity}", intersection_id=intersection_id, date=date, hour=hour)
+
+
+class CachedTable:
+    """Parsed copy of one processed table, reloaded only when the files behind it change
+
+    Every get() compares an identity of the table's files with the loaded copy; only a
+    difference triggers a full read. For a snapshot or CSV file that is its (path, size, mtime,
+    inode). Parquet part files are only ever added or removed, never rewritten in place, so for
+    Parquet it is the same stat of the directories the read scans (see partition_dirs):
+    one stat per partition directory instead of one per file. Rows are sorted by index_column
+    once per load, so get(value) is a dict lookup plus a positional slice however long history
+    grows. `equals` restricts the rows like read(), e.g. to one hour of enriched_data.
+    `stats` reports hits, reloads, reload time and rows loaded.
+    """
+
+    def __init__(self, reader, name, index_column=None, columns=None, **equals):
+        self.reader = reader
+        self.name = name
+        self.index_column = index_column
+        self.columns = columns
+        self.equals = equals
+        self.frame = None
+        self._identity = None
+        self._ranges = {}
+        self.stats = {"hits": 0, "reloads": 0, "last_reload_seconds": 0.0, "total_reload_seconds": 0.0,
+                      "rows_loaded": 0}
+
+    def _file_identity(self):
+        manifest = self.reader.snapshots.refresh()
+        snapshotted = manifest is not None and self.name in manifest["tables"]
+        if not snapshotted and os.path.isdir(os.path.join(self.reader.data_path, self.name)):
+            paths = self.reader.partition_dirs(self.name, **self.equals)
+        else:
+            paths = self.reader.source_files(self.name)
+        identity = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            identity.append((path, stat.st_size, stat.st_mtime_ns, stat.st_ino))
+        return tuple(identity)
+
+    def _load(self, identity):
+        start = time.perf_counter()
+        frame = self.reader.read(self.name, self.columns, **self.equals) if identity else None
+        self._ranges = {}
+        if frame is not None and self.index_column is not None and len(frame):
+            frame = frame.sort_values(self.index_column, kind="stable").reset_index(drop=True)
+            keys = frame[self.index_column].to_numpy()
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            stops = np.r_[starts[1:], len(keys)]
+            self._ranges = dict(zip(keys[starts].tolist(), zip(starts.tolist(), stops.tolist())))
+        self.frame, self._identity = frame, identity
+
+        elapsed = time.perf_counter() - start
+        self.stats["reloads"] += 1
+        self.stats["last_reload_seconds"] = elapsed
+        self.stats["total_reload_seconds"] += elapsed
+        self.stats["rows_loaded"] = 0 if frame is None else len(frame)
+
+    def get(self, value=None):
+        """Rows whose index_column equals value (all rows without an index); None if the table is missing"""
+        identity = self._file_identity()
+        if identity != self._identity:
+            self._load(identity)
+        else:
+            self.stats["hits"] += 1
+        if self.frame is None or self.index_column is None:
+            return self.frame
+        start, stop = self._ranges.get(value, (0, 0))
+        return self.frame.iloc[start:stop]
+
+    @property
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["reloads"]
+        return self.stats["hits"] / lookups if lookups else 0.0
@@ -0,0 +1,259 @@
+"""
+replay_source.py
+Replay synthetic sensor readings in timestamp order at a configurable rate
+"""
+
+import argparse
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+try:
+    from .data_generator import TrafficDataGenerator
+except ImportError:  # run as a script: python src/replay_source.py
+    from data_generator import TrafficDataGenerator
+
+
+SENSOR_COLUMNS = ["timestamp", "intersection_id", "vehicle_count", "average_speed", "num_lanes"]
+# Always write the time part, pandas drops it when a whole batch falls on midnight
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class RollingFileSink:
+    """Write readings as CSV files into a watched directory, rolling by record count or age
+
+    Each file is written under a hidden temporary name and renamed into place when it is
+    complete, so directory watchers (e.g. a Spark file stream) never see partial files.
+    Between writes, poll() publishes a buffer that has reached max_seconds; SensorReplaySource
+    calls it while waiting for the next batch.
+    """
+
+    def __init__(self, output_dir, max_records=10000, max_seconds=5.0, prefix="readings"):
+        self.output_dir = output_dir
+        self.max_records = max_records
+        self.max_seconds = max_seconds
+        self.prefix = prefix
+        self.files_written = 0
+        self._buffer = []
+        self._buffered_records = 0
+        self._opened_at = None
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, batch):
+        """Buffer a batch of readings and roll to a new file when a limit is reached"""
+        if self._opened_at is None:
+            self._opened_at = time.monotonic()
+        self._buffer.append(batch)
+        self._buffered_records += len(batch)
+
+        if self._buffered_records >= self.max_records:
+            self.flush()
+        else:
+            self.poll()
+
+    def poll(self):
+        """Flush a buffer older than max_seconds; returns the seconds until the next one is due"""
+        if self._opened_at is None:
+            return float("inf")
+        remaining = self._opened_at + self.max_seconds - time.monotonic()
+        if remaining > 0:
+            return remaining
+        self.flush()
+        return float("inf")
+
+    def flush(self):
+        """Publish the buffered readings as one complete file"""
+        if not self._buffer:
+            return
+
+        file_name = f"{self.prefix}-{self.files_written:06d}.csv"
+        tmp_path = os.path.join(self.output_dir, f".{file_name}.tmp")
+        with open(tmp_path, "w") as f:
+            for i, batch in enumerate(self._buffer):
+                batch.to_csv(f, index=False, header=(i == 0), date_format=TIMESTAMP_FORMAT)
+        os.replace(tmp_path, os.path.join(self.output_dir, file_name))
+
+        self.files_written += 1
+        self._buffer = []
+        self._buffered_records = 0
+        self._opened_at = None
+
+    def close(self):
+        self.flush()
+
+
+class SocketSink:
+    """Serve readings as newline-delimited CSV to clients of a local TCP socket
+
+    Works like `nc -lk <port>`, which is what Spark's socket source expects to connect to.
+    """
+
+    def __init__(self, host="localhost", port=9999):
+        self.host = host
+        self.port = port
+        self._clients = []
+        self._lock = threading.Lock()
+        self._server = socket.create_server((host, port))
+        self.port = self._server.getsockname()[1]
+        self._accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._accept_thread.start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return  # server socket closed
+            with self._lock:
+                self._clients.append(client)
+
+    def write(self, batch):
+        """Send one line per reading to every connected client"""
+        payload = batch.to_csv(index=False, header=False, date_format=TIMESTAMP_FORMAT).encode()
+        with self._lock:
+            for client in list(self._clients):
+                try:
+                    client.sendall(payload)
+                except OSError:
+                    self._clients.remove(client)
+                    client.close()
+
+    def poll(self):
+        return float("inf")  # nothing is buffered
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self._server.close()
+        with self._lock:
+            for client in self._clients:
+                client.close()
+            self._clients = []
+
+
+@dataclass
+class ReplayStats:
+    """Throughput and lag of a replay run"""
+
+    events: int = 0
+    batches: int = 0
+    elapsed_seconds: float = 0.0
+    target_events_per_sec: float = float("inf")
+    lag_seconds: float = 0.0
+    max_lag_seconds: float = 0.0
+
+    @property
+    def events_per_sec(self):
+        return self.events / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    def summary(self):
+        target = "max" if np.isinf(self.target_events_per_sec) else f"{self.target_events_per_sec:,.1f}"
+        return (
+            f"{self.events:,} events in {self.elapsed_seconds:.1f}s | "
+            f"{self.events_per_sec:,.1f} events/s (target {target}) | "
+            f"lag {self.lag_seconds:.3f}s (max {self.max_lag_seconds:.3f}s)"
+        )
+
+
+class SensorReplaySource:
+    """Emit TrafficDataGenerator readings in timestamp order at a configurable speed
+
+    speed=1.0 replays in real time, speed=100.0 at 100x, and speed=None (or 0) as fast as
+    possible. All readings that share a timestamp are emitted together as one batch.
+    """
+
+    def __init__(self, generator, sink, speed=1.0, start_date=None, interval_minutes=5):
+        self.generator = generator
+        self.sink = sink
+        self.speed = speed or None
+        self.start_date = start_date
+        self.interval_minutes = interval_minutes
+        self.stats = ReplayStats()
+        if self.speed is not None:
+            readings_per_data_second = len(generator.intersections) / (interval_minutes * 60)
+            self.stats.target_events_per_sec = readings_per_data_second * self.speed
+
+    def _iter_batches(self):
+        """Yield (timestamp, readings) in timestamp order, generating one day at a time"""
+        chunks = self.generator.iter_sensor_chunks(
+            self.start_date, self.interval_minutes, intersections_per_chunk=len(self.generator.intersections)
+        )
+        for _, day_df in chunks:
+            day_df = day_df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+            timestamps = day_df["timestamp"].to_numpy()
+            _, starts = np.unique(timestamps, return_index=True)
+            bounds = np.append(starts, len(day_df))
+            for begin, end in zip(bounds[:-1], bounds[1:]):
+                yield timestamps[begin], day_df.iloc[begin:end][SENSOR_COLUMNS]
+
+    def run(self, max_events=None, report_every=5.0):
+        """Replay until the data or max_events is exhausted and return the ReplayStats"""
+        stats = self.stats
+        wall_start = time.monotonic()
+        last_report = wall_start
+        data_start = None
+
+        try:
+            for timestamp, batch in self._iter_batches():
+                if data_start is None:
+                    data_start = timestamp
+
+                if self.speed is not None:
+                    data_offset = (timestamp - data_start) / np.timedelta64(1, "s")
+                    scheduled = wall_start + data_offset / self.speed
+                    delay = scheduled - time.monotonic()
+                    while delay > 0:
+                        # publish buffered readings that come due while waiting for this batch
+                        time.sleep(min(delay, self.sink.poll()))
+                        delay = scheduled - time.monotonic()
+
+                self.sink.write(batch)
+                now = time.monotonic()
+
+                stats.events += len(batch)
+                stats.batches += 1
+                stats.elapsed_seconds = now - wall_start
+                if self.speed is not None:
+                    stats.lag_seconds = max(now - scheduled, 0.0)
+                    stats.max_lag_seconds = max(stats.max_lag_seconds, stats.lag_seconds)
+
+                if report_every and now - last_report >= report_every:
+                    print(f"Replay: {stats.summary()}")
+                    last_report = now
+
+                if max_events is not None and stats.events >= max_events:
+                    break
+        finally:
+            self.sink.close()
+
+        print(f"Replay complete: {stats.summary()}")
+        return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay synthetic sensor readings at a fixed rate")
+    parser.add_argument("--intersections", type=int, default=20)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = real time, 100 = 100x, 0 = as fast as possible")
+    parser.add_argument("--output-dir", default="data/stream", help="rolling file sink directory")
+    parser.add_argument("--max-records", type=int, default=10000, help="records per rolled file")
+    parser.add_argument("--socket-port", type=int, default=None, help="serve a socket instead of writing files")
+    args = parser.parse_args()
+
+    generator = TrafficDataGenerator(num_intersections=args.intersections, hours=args.hours, seed=args.seed)
+    if args.socket_port is not None:
+        sink = SocketSink(port=args.socket_port)
+        print(f"Serving readings on localhost:{sink.port}")
+    else:
+        sink = RollingFileSink(args.output_dir, max_records=args.max_records)
+        print(f"Writing rolling files to {args.output_dir}")
+
+    start_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    SensorReplaySource(generator, sink, speed=args.speed, start_date=start_date).run()
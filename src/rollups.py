@@ -0,0 +1,144 @@
+"""
+rollups.py
+Multi-granularity rollups of enriched readings, computed in one aggregation pass
+
+Every rollup stores only mergeable metrics (sums, non-null counts, min and max), so rollups of
+separate batches can be combined with merge_* and the averages re-derived afterwards. On Spark
+all rollups come out of one GROUP BY GROUPING SETS aggregate, i.e. a single shuffle, and are
+then split into one table per rollup under <output_base_path>/rollups/.
+"""
+
+import uuid
+
+import numpy as np
+import pandas as pd
+
+
+# Rollup name -> grouping columns (the time buckets are named window_start in the output)
+ROLLUPS = {
+    "five_minute": ["intersection_id", "location", "window_5min"],
+    "fifteen_minute": ["intersection_id", "location", "window_15min"],
+    "hourly": ["intersection_id", "location", "window_1h"],
+    "daily": ["intersection_id", "location", "date"],
+    "day_of_week_hour": ["intersection_id", "location", "day_of_week", "hour"],
+    "time_of_day_level": ["time_of_day", "congestion_level"],
+}
+WINDOW_MINUTES = {"window_5min": 5, "window_15min": 15, "window_1h": 60}
+DIMENSIONS = list(dict.fromkeys(column for keys in ROLLUPS.values() for column in keys))
+
+# Output metric -> (source column, aggregate); count(None) counts rows
+METRICS = {
+    "reading_count": (None, "count"),
+    "vehicle_sum": ("vehicle_count", "sum"),
+    "vehicle_readings": ("vehicle_count", "count"),
+    "vehicle_min": ("vehicle_count", "min"),
+    "vehicle_max": ("vehicle_count", "max"),
+    "speed_sum": ("average_speed", "sum"),
+    "speed_readings": ("average_speed", "count"),
+    "speed_min": ("average_speed", "min"),
+    "speed_max": ("average_speed", "max"),
+    "congestion_index_sum": ("traffic_congestion_index", "sum"),
+    "congestion_index_readings": ("traffic_congestion_index", "count"),
+    "congestion_index_min": ("traffic_congestion_index", "min"),
+    "congestion_index_max": ("traffic_congestion_index", "max"),
+}
+AVERAGES = {
+    "avg_vehicle_count": ("vehicle_sum", "vehicle_readings"),
+    "avg_speed": ("speed_sum", "speed_readings"),
+    "avg_congestion_index": ("congestion_index_sum", "congestion_index_readings"),
+}
+
+
+def output_keys(name):
+    """Key columns of a rollup table as written"""
+    return ["window_start" if key in WINDOW_MINUTES else key for key in ROLLUPS[name]]
+
+
+def _grouping_id(keys):
+    """Spark's grouping_id() of a grouping set over DIMENSIONS (a set bit = column not grouped)"""
+    return sum(1 << (len(DIMENSIONS) - 1 - i) for i, column in enumerate(DIMENSIONS) if column not in keys)
+
+
+def pandas_rollups(enriched):
+    """Every rollup of an enriched pandas frame, as {name: DataFrame}"""
+    timestamps = pd.to_datetime(enriched["timestamp"])
+    frame = enriched.assign(
+        **{column: timestamps.dt.floor(f"{minutes}min") for column, minutes in WINDOW_MINUTES.items()},
+        # Spark's dayofweek: 1 = Sunday ... 7 = Saturday
+        day_of_week=(timestamps.dt.dayofweek + 1) % 7 + 1,
+    )
+    aggregations = {
+        name: (source or "intersection_id", "size" if source is None else how)
+        for name, (source, how) in METRICS.items()
+    }
+
+    rollups = {}
+    for name, keys in ROLLUPS.items():
+        table = frame.groupby(keys, sort=True, dropna=False).agg(**aggregations).reset_index()
+        rollups[name] = _with_averages(table.rename(columns=dict.fromkeys(WINDOW_MINUTES, "window_start")))
+    return rollups
+
+
+def _with_averages(table):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return table.assign(**{name: table[total] / table[readings] for name, (total, readings) in AVERAGES.items()})
+
+
+def spark_rollups(enriched_df, persist_level=None, persisted=None):
+    """Every rollup of an enriched Spark frame from one GROUPING SETS aggregate
+
+    persist_level keeps the combined aggregate cached so writing the split tables does not
+    re-run the shuffle; the cached frame is appended to `persisted` for the caller to unpersist.
+    """
+    from pyspark.sql.functions import col, expr
+
+    spark = enriched_df.sparkSession
+    windows = {
+        column: expr(
+            f"date_trunc('hour', timestamp) + make_dt_interval(0, 0, CAST(floor(minute(timestamp) / {minutes}) * {minutes} AS INT), 0)"
+        )
+        for column, minutes in WINDOW_MINUTES.items()
+    }
+    view = f"traffic_rollup_input_{uuid.uuid4().hex}"
+    enriched_df.withColumns(windows).withColumn("day_of_week", expr("dayofweek(timestamp)")).createOrReplaceTempView(view)
+
+    aggregates = ", ".join(
+        f"{how}({source or '*'}) AS {name}" for name, (source, how) in METRICS.items()
+    )
+    grouping_sets = ", ".join(f"({', '.join(keys)})" for keys in ROLLUPS.values())
+    cube = spark.sql(
+        f"SELECT {', '.join(DIMENSIONS)}, grouping_id() AS grouping_id, {aggregates} "
+        f"FROM {view} GROUP BY GROUPING SETS ({grouping_sets})"
+    )
+    spark.catalog.dropTempView(view)  # the plan is already analyzed
+    if persist_level is not None:
+        cube = cube.persist(persist_level)
+        if persisted is not None:
+            persisted.append(cube)
+
+    rollups = {}
+    for name, keys in ROLLUPS.items():
+        table = cube.where(col("grouping_id") == _grouping_id(keys)).select(
+            *[col(key).alias("window_start") if key in WINDOW_MINUTES else col(key) for key in keys],
+            *METRICS,
+        )
+        rollups[name] = _spark_with_averages(table).orderBy(*output_keys(name))
+    return rollups
+
+
+def _spark_with_averages(table):
+    from pyspark.sql.functions import col
+
+    return table.withColumns({name: col(total) / col(readings) for name, (total, readings) in AVERAGES.items()})
+
+
+def spark_merge_rollup(existing, new, name):
+    """Combine two versions of a Spark rollup table and re-derive its averages"""
+    from pyspark.sql.functions import max as spark_max, min as spark_min, sum as spark_sum
+
+    merge = {"count": spark_sum, "sum": spark_sum, "min": spark_min, "max": spark_max}
+    keys = output_keys(name)
+    merged = existing.select(*keys, *METRICS).unionByName(new.select(*keys, *METRICS)).groupBy(*keys).agg(
+        *[merge[how](metric).alias(metric) for metric, (_, how) in METRICS.items()]
+    )
+    return _spark_with_averages(merged).orderBy(*keys)
@@ -0,0 +1,154 @@
+"""
+serving_snapshots.py
+Immutable, versioned Arrow IPC snapshots of the tables the exporter and UI serve
+
+Each publish writes a complete snapshot directory next to the previous ones and only then
+switches the CURRENT pointer file to it with an atomic rename:
+
+    <output_base_path>/_serving/
+        CURRENT                    name of the live snapshot, e.g. v000042
+        v000042/manifest.json      version, creation time, file/rows/bytes per table
+        v000042/hourly_metrics.arrow
+        ...
+
+Concurrent publishers (batch runs, the ETL service, the streaming job) write their files to
+private temporary directories and take an exclusive lock on _serving/ only to pick the next
+version, rename and move CURRENT, so no two of them claim the same version.
+Readers therefore never see partial output. Files are uncompressed Arrow IPC, so
+SnapshotReader memory-maps them and reads without copying; it re-checks CURRENT on every
+access and moves to a new version as soon as one is published.
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+
+SERVING_DIR = "_serving"
+POINTER = "CURRENT"
+# Tables copied from the processed Parquet output into every snapshot
+SERVING_TABLES = ["hourly_metrics", "intersection_stats", "forecasts", "percentiles/hourly", "percentiles/daily"]
+
+
+def _snapshot_versions(serving_path):
+    """Published snapshot versions in ascending order"""
+    if not os.path.isdir(serving_path):
+        return []
+    names = [n for n in os.listdir(serving_path) if n.startswith("v") and n[1:].isdigit()]
+    return sorted(int(n[1:]) for n in names)
+
+
+def current_snapshot(serving_path):
+    """Directory name of the live snapshot, or None before the first publish"""
+    try:
+        with open(os.path.join(serving_path, POINTER)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def _publish_lock(serving_path):
+    """Exclusive flock on the serving directory itself, held across threads and processes"""
+    fd = os.open(serving_path, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # releases the lock
+
+
+def publish_snapshot(tables, serving_path, keep=3):
+    """Write {name: pyarrow.Table} as the next snapshot, point CURRENT at it and return its manifest
+
+    Snapshots older than the newest `keep` are removed; readers that still have their files
+    memory-mapped keep working, since unlinked files live on until they are unmapped.
+    """
+    os.makedirs(serving_path, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".publish-", dir=serving_path)
+    try:
+        files = {}
+        for table_name, table in tables.items():
+            file_name = table_name.replace("/", ".") + ".arrow"
+            path = os.path.join(tmp_dir, file_name)
+            with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            files[table_name] = {"file": file_name, "rows": table.num_rows, "bytes": os.path.getsize(path)}
+
+        with _publish_lock(serving_path):
+            version = (_snapshot_versions(serving_path) or [0])[-1] + 1
+            name = f"v{version:06d}"
+            created = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            manifest = {"version": version, "created": created, "tables": files}
+            with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.rename(tmp_dir, os.path.join(serving_path, name))
+
+            pointer_tmp = os.path.join(serving_path, f".{POINTER}.tmp")
+            with open(pointer_tmp, "w") as f:
+                f.write(name)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(pointer_tmp, os.path.join(serving_path, POINTER))
+
+            for old in _snapshot_versions(serving_path)[:-keep]:
+                shutil.rmtree(os.path.join(serving_path, f"v{old:06d}"), ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)  # only left behind if the publish failed
+    return manifest
+
+
+def publish_processed_tables(output_base_path, names=SERVING_TABLES, keep=3):
+    """Snapshot the given Parquet tables under output_base_path (those that exist)"""
+    tables = {}
+    for name in names:
+        path = os.path.join(output_base_path, name)
+        if os.path.isdir(path):
+            tables[name] = ds.dataset(path, format="parquet").to_table()
+    return publish_snapshot(tables, os.path.join(output_base_path, SERVING_DIR), keep)
+
+
+class SnapshotReader:
+    """Zero-copy access to the tables of the current snapshot, following CURRENT as it moves"""
+
+    def __init__(self, serving_path):
+        self.serving_path = serving_path
+        self.manifest = None
+        self._pointer = None
+        self.snapshot_dir = None
+        self._tables = {}
+
+    def refresh(self):
+        """Switch to the snapshot CURRENT points at if it changed; returns its manifest or None"""
+        pointer = os.path.join(self.serving_path, POINTER)
+        for _ in range(2):  # a publish may prune the snapshot between reading CURRENT and its manifest
+            try:
+                stat = os.stat(pointer)
+                if (stat.st_ino, stat.st_mtime_ns) == self._pointer:
+                    return self.manifest
+                snapshot_dir = os.path.join(self.serving_path, current_snapshot(self.serving_path))
+                with open(os.path.join(snapshot_dir, "manifest.json")) as f:
+                    manifest = json.load(f)
+            except FileNotFoundError:
+                continue
+            self.manifest, self.snapshot_dir, self._tables = manifest, snapshot_dir, {}
+            self._pointer = (stat.st_ino, stat.st_mtime_ns)
+            return manifest
+        return self.manifest
+
+    def table(self, name):
+        """A table of the current snapshot as a memory-mapped pyarrow.Table (None if not published)"""
+        manifest = self.refresh()
+        if manifest is None or name not in manifest["tables"]:
+            return None
+        if name not in self._tables:
+            source = pa.memory_map(os.path.join(self.snapshot_dir, manifest["tables"][name]["file"]))
+            self._tables[name] = pa.ipc.open_file(source).read_all()
+        return self._tables[name]
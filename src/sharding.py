@@ -0,0 +1,124 @@
+"""
+sharding.py
+Consistent hashing of intersections onto a fleet of exporter shards
+
+Every shard owns VIRTUAL_NODES points on a 64-bit hash ring; an intersection belongs to the
+shard of the first point at or after the hash of its id. Shards are named shard-0 ...
+shard-(N-1), so going from N to N+1 shards only moves the intersections the new shard's points
+take over (about 1/(N+1) of them) and no intersection moves between two existing shards.
+Hashes come from blake2b, identical in every process and Python version.
+
+    ring = HashRing(shard_names(4))
+    ring.assign(["INT_001", "INT_002"])      # owning shard names, e.g. shard-3 and shard-0
+    ShardFilter.of(1, 4).mask(ids)           # True where shard-1 owns the id
+"""
+
+import hashlib
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+VIRTUAL_NODES = 256
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def shard_names(count):
+    return [f"shard-{i}" for i in range(count)]
+
+
+class HashRing:
+    """Sorted ring of virtual node hashes, each owned by a shard"""
+
+    def __init__(self, shards, virtual_nodes=VIRTUAL_NODES):
+        self.shards = list(shards)
+        points = [(_hash(f"{shard}#{i}"), shard) for shard in self.shards for i in range(virtual_nodes)]
+        points.sort()
+        self.points = np.array([point for point, _ in points], dtype=np.uint64)
+        self.owners = np.array([shard for _, shard in points], dtype=object)
+
+    def assign(self, keys):
+        """Owning shard of each key, as an object array"""
+        hashes = np.fromiter((_hash(str(key)) for key in keys), dtype=np.uint64)
+        # first point at or after the hash, wrapping past the largest one
+        return self.owners[np.searchsorted(self.points, hashes, side="left") % len(self.points)]
+
+    def owner(self, key):
+        return self.assign([key])[0]
+
+
+def shard_counts(ring, keys):
+    """{shard: number of keys it owns} for every shard of the ring"""
+    owners = ring.assign(keys)
+    return {shard: int((owners == shard).sum()) for shard in ring.shards}
+
+
+def moved_keys(before, after, keys):
+    """Keys whose owner differs between two rings"""
+    keys = np.asarray(list(keys), dtype=object)
+    return keys[before.assign(keys) != after.assign(keys)]
+
+
+def _strings(ids):
+    if isinstance(ids, pa.ChunkedArray):
+        ids = ids.combine_chunks()
+    if isinstance(ids, pa.Array):
+        return ids.cast(pa.string())
+    return pa.array(ids, type=pa.string(), from_pandas=True)
+
+
+class ShardFilter:
+    """Which intersection ids one shard owns; remembers every id it has placed"""
+
+    def __init__(self, ring, shard):
+        if shard not in ring.shards:
+            raise ValueError(f"unknown shard {shard!r}; the ring has {ring.shards}")
+        self.ring = ring
+        self.shard = shard
+        self._owned = {}
+
+    @classmethod
+    def of(cls, index, count, virtual_nodes=VIRTUAL_NODES):
+        """Shard `index` of `count` equally weighted shards"""
+        names = shard_names(count)
+        if not 0 <= index < count:
+            raise ValueError(f"shard index {index} is outside 0..{count - 1}")
+        return cls(HashRing(names, virtual_nodes), names[index])
+
+    def owns(self, ids):
+        """The distinct ids among `ids` this shard owns, as a list"""
+        unique = pc.unique(_strings(ids).drop_null()).to_pylist()
+        new = [key for key in unique if key not in self._owned]
+        if new:
+            self._owned.update(zip(new, (self.ring.assign(new) == self.shard).tolist()))
+        return [key for key in unique if self._owned[key]]
+
+    def mask(self, ids):
+        """Boolean pyarrow array: True where this shard owns the id"""
+        ids = _strings(ids)
+        return pc.fill_null(pc.is_in(ids, value_set=pa.array(self.owns(ids), type=pa.string())), False)
+
+
+def scrape_config(targets, job_name="traffic_metrics_exporter", scrape_interval="15s"):
+    """Prometheus scrape_configs YAML for one target per shard, labelled with its shard
+
+    targets: [(shard name, "host:port"), ...]
+    """
+    lines = [
+        "# Generated by scripts/exporter_shards.py; one target per exporter shard",
+        "scrape_configs:",
+        f"  - job_name: '{job_name}'",
+        f"    scrape_interval: {scrape_interval}",
+        "    static_configs:",
+    ]
+    for shard, target in targets:
+        lines += [
+            f"      - targets: ['{target}']",
+            "        labels:",
+            f"          shard: '{shard}'",
+        ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,179 @@
+"""
+sketches.py
+Mergeable quantile sketches (t-digest style) of congestion index and speed
+
+Averages hide the congestion spikes operators care about and exact percentiles neither scale
+nor merge across runs. A QuantileSketch keeps a bounded number of weighted centroids, small
+near the tails and larger around the median, and serializes to a few hundred bytes. The
+pipeline stores one sketch per intersection x date x hour in percentiles/hourly and merges
+those into percentiles/daily; readers merge stored sketches again (e.g. one hour of day
+across all dates) without going back to the readings.
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+COMPRESSION = 100  # at most about COMPRESSION centroids per sketch
+# Sketched metric -> source column of the enriched data
+SKETCHES = {"congestion_index": "traffic_congestion_index", "speed": "average_speed"}
+PERCENTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+HOURLY_SKETCH_KEYS = ["intersection_id", "location", "date", "hour"]
+DAILY_SKETCH_KEYS = ["intersection_id", "location", "date"]
+
+
+class QuantileSketch:
+    """Weighted centroids of a distribution plus its exact min and max"""
+
+    def __init__(self, means=(), weights=(), minimum=np.nan, maximum=np.nan, compression=COMPRESSION):
+        self.means = np.asarray(means, dtype=np.float64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.compression = compression
+
+    @classmethod
+    def from_values(cls, values, compression=COMPRESSION):
+        """Sketch of the non-null values"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return cls(compression=compression)
+        sketch = cls(values, np.ones(len(values)), values.min(), values.max(), compression)
+        return sketch._compress()
+
+    @classmethod
+    def merge(cls, sketches, compression=COMPRESSION):
+        """One sketch summarizing everything the given sketches summarize"""
+        sketches = [s for s in sketches if s.count]
+        if not sketches:
+            return cls(compression=compression)
+        return cls(
+            np.concatenate([s.means for s in sketches]),
+            np.concatenate([s.weights for s in sketches]),
+            min(s.minimum for s in sketches),
+            max(s.maximum for s in sketches),
+            compression,
+        )._compress()
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def _compress(self):
+        """Merge neighbouring centroids so each spans at most one unit of the k1 scale function"""
+        order = np.argsort(self.means, kind="stable")
+        means, weights = self.means[order], self.weights[order]
+        if len(means) <= self.compression // 2:
+            self.means, self.weights = means, weights
+            return self
+
+        # k1(q) = compression / (2 pi) * asin(2q - 1): unit steps are narrow near q=0 and q=1
+        midpoints = (np.cumsum(weights) - weights / 2) / weights.sum()
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * midpoints - 1)
+        bucket = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+        return self
+
+    def quantile(self, q):
+        """Estimated value at quantile q (scalar or array, 0..1); nan for an empty sketch"""
+        q = np.asarray(q, dtype=np.float64)
+        if not self.count:
+            return np.full(q.shape, np.nan)[()]
+        # interpolate between centroid centers, pinned to the exact extremes at q=0 and q=1
+        positions = np.r_[0.0, np.cumsum(self.weights) - self.weights / 2, self.count]
+        values = np.r_[self.minimum, self.means, self.maximum]
+        return np.interp(q * self.count, positions, values)[()]
+
+    def to_bytes(self):
+        header = [self.compression, self.minimum, self.maximum]
+        return np.concatenate([header, self.means, self.weights]).astype("<f8").tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        values = np.frombuffer(data, dtype="<f8")
+        compression, minimum, maximum = values[:3]
+        means, weights = np.split(values[3:], 2)
+        return cls(means, weights, minimum, maximum, int(compression))
+
+
+def _percentile_columns(table):
+    """<metric>_p50/_p95/_p99 from the <metric>_sketch columns of a sketch table"""
+    columns = {}
+    for name in SKETCHES:
+        estimates = np.array(
+            [QuantileSketch.from_bytes(b).quantile(list(PERCENTILES.values())) for b in table[f"{name}_sketch"]]
+        ).reshape(len(table), len(PERCENTILES))
+        for i, label in enumerate(PERCENTILES):
+            columns[f"{name}_{label}"] = estimates[:, i]
+    return table.assign(**columns)
+
+
+def _sketch_table(frame, keys, sketch_group):
+    """Apply sketch_group(group) -> (reading_count, {metric: sketch}) per group of keys"""
+    rows = []
+    for key, group in frame.groupby(keys, sort=True, dropna=False):
+        reading_count, sketches = sketch_group(group)
+        row = {**dict(zip(keys, key)), "reading_count": reading_count}
+        row.update({f"{name}_sketch": sketch.to_bytes() for name, sketch in sketches.items()})
+        rows.append(row)
+    columns = [*keys, "reading_count", *[f"{name}_sketch" for name in SKETCHES]]
+    return _percentile_columns(pd.DataFrame(rows, columns=columns))
+
+
+def pandas_sketches(enriched, keys=HOURLY_SKETCH_KEYS):
+    """One row per group of keys with serialized sketches, reading_count and percentiles"""
+    return _sketch_table(enriched, keys, lambda group: (
+        len(group),
+        {name: QuantileSketch.from_values(group[source]) for name, source in SKETCHES.items()},
+    ))
+
+
+def merge_sketch_table(table, keys):
+    """Merge the sketches of a sketch table per group of keys (e.g. hourly into daily)"""
+    return _sketch_table(table, keys, lambda group: (
+        int(group["reading_count"].sum()),
+        {name: QuantileSketch.merge(map(QuantileSketch.from_bytes, group[f"{name}_sketch"])) for name in SKETCHES},
+    ))
+
+
+def _spark_sketch_schema(df, keys):
+    from pyspark.sql.types import BinaryType, DoubleType, LongType, StructField, StructType
+
+    return StructType(
+        [df.schema[key] for key in keys]
+        + [StructField("reading_count", LongType())]
+        + [StructField(f"{name}_sketch", BinaryType()) for name in SKETCHES]
+        + [StructField(f"{name}_{label}", DoubleType()) for name in SKETCHES for label in PERCENTILES]
+    )
+
+
+def _ship_to_workers():
+    """Pickle this module's functions by value: Python workers need not have it on their path"""
+    from pyspark import cloudpickle
+
+    cloudpickle.register_pickle_by_value(sys.modules[__name__])
+
+
+def spark_sketches(enriched_df):
+    """percentiles/hourly of an enriched Spark frame, built in pandas per intersection and date"""
+    _ship_to_workers()
+    columns = [*HOURLY_SKETCH_KEYS, *SKETCHES.values()]
+    # one Python call per intersection and day rather than per hour keeps the UDF overhead low
+    return enriched_df.select(*columns).groupBy("intersection_id", "date").applyInPandas(
+        lambda group: pandas_sketches(group), _spark_sketch_schema(enriched_df, HOURLY_SKETCH_KEYS)
+    )
+
+
+def spark_merge_sketches(sketch_df, keys):
+    """Merge the sketches of a Spark sketch table per group of keys"""
+    _ship_to_workers()
+    return sketch_df.groupBy(*keys).applyInPandas(
+        lambda table: merge_sketch_table(table, keys), _spark_sketch_schema(sketch_df, keys)
+    )
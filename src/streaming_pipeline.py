@@ -0,0 +1,263 @@
+"""
+streaming_pipeline.py
+Spark Structured Streaming variant of the traffic ETL pipeline
+"""
+
+import os
+import shutil
+import sys
+import threading
+
+from pyspark.sql.functions import col, count, hour, lit, max as spark_max, sum as spark_sum, to_date, window
+
+try:
+    from .etl_pipeline import SENSOR_SCHEMA, TrafficETLPipeline, _naive_timestamps
+    from .pandas_engine import HOURLY_KEYS, INTERSECTION_KEYS
+except ImportError:  # run as a script: python src/streaming_pipeline.py
+    from etl_pipeline import SENSOR_SCHEMA, TrafficETLPipeline, _naive_timestamps
+    from pandas_engine import HOURLY_KEYS, INTERSECTION_KEYS
+
+
+# A windowed row is identified by its intersection and window start
+WINDOW_KEYS = ["intersection_id", "window_start"]
+# Mergeable sums kept with every window (averages are derived from them)
+PARTIAL_SUMS = ["total_vehicles", "speed_sum", "speed_readings", "congestion_index_sum",
+                "congestion_index_readings", "reading_count"]
+
+
+class TrafficStreamingPipeline:
+    """Stream raw sensor files through the same enrichment and TCI logic as TrafficETLPipeline
+
+    Raw files dropped into `raw_dir` (e.g. by replay_source.RollingFileSink) are read as a file
+    stream with SENSOR_SCHEMA and enriched with TrafficETLPipeline.transform. Three queries, each
+    with its own checkpoint, keep the processed layout up to date:
+      - enriched rows are appended to enriched_data (and enriched_data_csv), rows that fail
+        validation to quarantine
+      - 1-hour windows are merged into hourly_windows and folded into hourly_metrics and
+        intersection_stats at the batch pipeline's grain
+      - 5-minute windows are merged into five_minute_windows
+    Window tables are partitioned by date; a micro-batch only rewrites the dates it updates.
+    hourly_metrics and intersection_stats hold the streamed readings only, replacing tables a
+    batch run may have written to the same output.
+    Windowed aggregates use a watermark, so readings later than `watermark_delay` are dropped
+    and window state is evicted. `shuffle_partitions` sets the number of state store partitions;
+    it is fixed once a checkpoint exists, and Spark's default of 200 is far too many in local mode.
+    The queries' foreachBatch calls run concurrently on the shared TrafficETLPipeline, whose
+    per-run state (sink reports, observations) is not thread-safe, so every pipeline write they
+    make (load, write_outputs, the snapshot publish) holds self._pipeline_lock. The streamed
+    tables' sink reports are kept in self.sink_reports.
+    """
+
+    def __init__(self, pipeline=None, metadata_path="data/raw/intersection_metadata.csv", raw_dir="data/stream",
+                 output_base_path="data/processed", checkpoint_path="data/checkpoints/streaming",
+                 watermark_delay="10 minutes", source_format="csv", max_files_per_trigger=None,
+                 shuffle_partitions=None):
+        self.pipeline = pipeline or TrafficETLPipeline(app_name="TrafficStreamingETL")
+        self.spark = self.pipeline.spark
+        self.metadata_path = metadata_path
+        self.raw_dir = raw_dir
+        self.output_base_path = output_base_path
+        self.checkpoint_path = checkpoint_path
+        self.watermark_delay = watermark_delay
+        self.source_format = source_format
+        self.max_files_per_trigger = max_files_per_trigger
+        self.shuffle_partitions = shuffle_partitions
+        self.queries = []
+        self.metadata_df = None
+        self.sink_reports = {}
+        self._pipeline_lock = threading.Lock()
+
+    def _read_stream(self):
+        """Raw sensor directory as a streaming DataFrame with an explicit schema"""
+        reader = self.spark.readStream.schema(SENSOR_SCHEMA)
+        if self.max_files_per_trigger:
+            reader = reader.option("maxFilesPerTrigger", self.max_files_per_trigger)
+        if self.source_format == "csv":
+            return reader.option("header", "true").csv(self.raw_dir)
+        return reader.parquet(self.raw_dir)
+
+    def _windowed(self, enriched_df, duration):
+        """Per-intersection aggregates over tumbling event-time windows, with their mergeable sums"""
+        return (
+            enriched_df.withWatermark("timestamp", self.watermark_delay)
+            .groupBy(window("timestamp", duration), "intersection_id", "location")
+            .agg(
+                spark_sum("vehicle_count").alias("total_vehicles"),
+                spark_sum("average_speed").alias("speed_sum"),
+                count("average_speed").alias("speed_readings"),
+                spark_sum("traffic_congestion_index").alias("congestion_index_sum"),
+                count("traffic_congestion_index").alias("congestion_index_readings"),
+                count("*").alias("reading_count"),
+            )
+            .select(
+                "intersection_id",
+                "location",
+                col("window.start").alias("window_start"),
+                col("window.end").alias("window_end"),
+                hour(col("window.start")).alias("hour"),
+                "total_vehicles",
+                (col("speed_sum") / col("speed_readings")).alias("avg_speed"),
+                (col("congestion_index_sum") / col("congestion_index_readings")).alias("avg_congestion_index"),
+                "reading_count",
+                *[c for c in PARTIAL_SUMS if c not in ("total_vehicles", "reading_count")],
+                to_date(col("window.start")).alias("date"),
+            )
+        )
+
+    def _write_enriched_batch(self, batch_df, batch_id):
+        """Append one micro-batch of enriched readings (and its quarantined rows) to the processed layout"""
+        batch_df.persist()
+        valid_df, quarantine_df = self.pipeline.split_quarantine(batch_df)
+        with self._pipeline_lock:
+            self.pipeline.load(valid_df, f"{self.output_base_path}/enriched_data", "parquet", "append",
+                               self.pipeline.enriched_partition_by)
+        # Micro-batches are small, so a single CSV part per batch is cheap
+        valid_df.coalesce(1).write.mode("append").option("header", "true").csv(
+            f"{self.output_base_path}/enriched_data_csv"
+        )
+        if quarantine_df is not None:
+            _naive_timestamps(quarantine_df).write.mode("append").parquet(f"{self.output_base_path}/quarantine")
+        batch_df.unpersist()
+
+    def _window_partitions(self, table, dates):
+        """Stored rows of a windows table in the given date partitions (None if there are none)"""
+        path = f"{self.output_base_path}/{table}"
+        paths = [f"{path}/date={day}" for day in dates if os.path.isdir(f"{path}/date={day}")]
+        return self.spark.read.option("basePath", path).parquet(*paths) if paths else None
+
+    def _merge_window_batch(self, table, batch_df, dates, existing):
+        """Replace the updated windows, rewriting only the date partitions they fall in"""
+        path = f"{self.output_base_path}/{table}"
+        merged = batch_df
+        if existing is not None:
+            merged = existing.join(batch_df.select(*WINDOW_KEYS), on=WINDOW_KEYS, how="left_anti").unionByName(batch_df)
+
+        # merged still reads the old partitions: materialize next to the table, then swap them in
+        tmp_path = f"{path}.tmp"
+        (
+            _naive_timestamps(merged).repartition("date").sortWithinPartitions("intersection_id", "window_start")
+            .write.mode("overwrite").partitionBy("date").parquet(tmp_path)
+        )
+        os.makedirs(path, exist_ok=True)
+        for day in dates:
+            shutil.rmtree(f"{path}/date={day}", ignore_errors=True)
+            os.replace(f"{tmp_path}/date={day}", f"{path}/date={day}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def _write_hourly_batch(self, batch_df, batch_id):
+        """Merge updated hourly windows into hourly_windows and fold them into the batch-grain tables
+
+        hourly_metrics and intersection_stats keep the batch pipeline's grain (one row per
+        intersection and hour of day, one per intersection). They are finalized from per-hour
+        partial sums kept next to the checkpoints: each micro-batch adds its windows and subtracts
+        the stored versions of the windows it replaces, so cost depends on the batch, not on history.
+        The partials record the last batch_id applied, so a replayed micro-batch is not counted twice.
+        """
+        batch_df = batch_df.persist()
+        dates = [str(row["date"]) for row in batch_df.select("date").distinct().collect()]
+        existing = self._window_partitions("hourly_windows", dates)
+
+        partials_path = os.path.join(self.checkpoint_path, "hourly_partials")
+        stored = self.spark.read.parquet(partials_path) if os.path.exists(partials_path) else None
+        applied = stored.agg(spark_max("batch_id")).first()[0] if stored is not None else None
+        if applied is None or batch_id > applied:
+            partials = batch_df.select(*HOURLY_KEYS, *PARTIAL_SUMS)
+            if existing is not None:
+                replaced = existing.join(batch_df.select(*WINDOW_KEYS), on=WINDOW_KEYS, how="left_semi")
+                partials = self.pipeline.merge_partials(
+                    replaced.select(*HOURLY_KEYS, *[(-col(c)).alias(c) for c in PARTIAL_SUMS]), partials, HOURLY_KEYS
+                )
+            if stored is not None:
+                partials = self.pipeline.merge_partials(stored.drop("batch_id"), partials, HOURLY_KEYS)
+            with self._pipeline_lock:
+                self.pipeline._replace_directory(partials.withColumn("batch_id", lit(batch_id)), partials_path)
+            self._write_aggregates(self.spark.read.parquet(partials_path).drop("batch_id"))
+
+        self._merge_window_batch("hourly_windows", batch_df, dates, existing)
+        batch_df.unpersist()
+
+    def _write_aggregates(self, hourly_partials):
+        """hourly_metrics and intersection_stats (and their CSV) from per-hour partial sums
+
+        Publishes a serving snapshot afterwards, so readers that prefer snapshots see the
+        streamed tables instead of the one from the last batch run.
+        """
+        totals = hourly_partials.groupBy("intersection_id").agg(
+            spark_sum("total_vehicles").alias("vehicle_sum"),
+            spark_sum("reading_count").alias("vehicle_readings"),
+            *[spark_sum(c).alias(c) for c in PARTIAL_SUMS],
+        )
+        intersection_partials = self.metadata_df.join(totals, on="intersection_id").select(
+            *INTERSECTION_KEYS, "vehicle_sum", "vehicle_readings", *PARTIAL_SUMS
+        )
+        hourly_metrics, intersection_stats = self.pipeline.finalize_partials(hourly_partials, intersection_partials)
+        with self._pipeline_lock:
+            self.sink_reports = self.pipeline.write_outputs(
+                {"hourly_metrics": hourly_metrics, "intersection_stats": intersection_stats}, self.output_base_path
+            )
+            self.pipeline.publish_serving_snapshot(self.output_base_path)
+
+    def _write_five_minute_batch(self, batch_df, batch_id):
+        batch_df = batch_df.persist()
+        dates = [str(row["date"]) for row in batch_df.select("date").distinct().collect()]
+        self._merge_window_batch("five_minute_windows", batch_df, dates,
+                                 self._window_partitions("five_minute_windows", dates))
+        batch_df.unpersist()
+
+    def start(self, trigger_seconds=5, available_now=False):
+        """Start the enriched, hourly and 5-minute queries and return them"""
+        if self.shuffle_partitions:
+            self.spark.conf.set("spark.sql.shuffle.partitions", str(self.shuffle_partitions))
+        self.metadata_df = self.spark.read.csv(self.metadata_path, header=True, inferSchema=True).cache()
+        enriched_df = self.pipeline.transform(self._read_stream(), self.metadata_df)
+        valid_df, _ = self.pipeline.split_quarantine(enriched_df)
+
+        sinks = [
+            ("enriched", enriched_df, "append", self._write_enriched_batch),
+            ("hourly", self._windowed(valid_df, "1 hour"), "update", self._write_hourly_batch),
+            ("five_minute", self._windowed(valid_df, "5 minutes"), "update", self._write_five_minute_batch),
+        ]
+
+        for name, df, output_mode, write_batch in sinks:
+            writer = (
+                df.writeStream.queryName(f"traffic_{name}")
+                .outputMode(output_mode)
+                .option("checkpointLocation", os.path.join(self.checkpoint_path, name))
+                .foreachBatch(write_batch)
+            )
+            writer = writer.trigger(availableNow=True) if available_now else writer.trigger(
+                processingTime=f"{trigger_seconds} seconds"
+            )
+            self.queries.append(writer.start())
+
+        print(f"Streaming from {self.raw_dir} into {self.output_base_path} ({len(self.queries)} queries)")
+        return self.queries
+
+    def run_available(self):
+        """Process every file currently in raw_dir, then stop (handy for tests and backfills)"""
+        self.start(available_now=True)
+        self.await_termination()
+        self.queries = []
+
+    def await_termination(self):
+        for query in self.queries:
+            query.awaitTermination()
+
+    def progress(self):
+        """Latest progress report of each running query"""
+        return {query.name: query.lastProgress for query in self.queries}
+
+    def stop(self):
+        for query in self.queries:
+            query.stop()
+        self.queries = []
+
+
+if __name__ == "__main__":
+    streaming = TrafficStreamingPipeline(raw_dir=sys.argv[1] if len(sys.argv) > 1 else "data/stream")
+    streaming.start()
+    try:
+        streaming.await_termination()
+    except KeyboardInterrupt:
+        streaming.stop()
+        streaming.pipeline.stop()
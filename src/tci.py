@@ -0,0 +1,117 @@
+"""
+tci.py
+Single definition of the Traffic Congestion Index (TCI), shared by every execution path
+
+    capacity_per_interval = capacity_per_hour / (60 / interval_minutes)
+    volume_ratio          = vehicle_count / capacity_per_interval
+    speed_factor          = 1 - average_speed / FREE_FLOW_SPEED
+    tci                   = round(min(volume_ratio * speed_factor * 100, TCI_CAP), 2)
+
+Rounding is HALF_UP like Spark's round(). A capacity of zero or less gives a TCI of 0.0, and a
+missing capacity gives a missing TCI. The NumPy/pandas functions work on whole arrays and the
+Spark functions build Column expressions from the same constants, so both stay in sync for
+any interval length. Components are keyed by output column name, so the capacity per interval
+keeps its historical name capacity_per_5min whatever the interval.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+FREE_FLOW_SPEED = 55.0  # mph
+TCI_CAP = 100.0
+CONGESTION_THRESHOLDS = (20, 40, 60, 80)
+CONGESTION_LEVELS = ("Low", "Moderate", "High", "Severe", "Critical")
+
+
+def round_half_up(values, decimals=2):
+    """Round like Spark's round(): HALF_UP applied to the shortest decimal repr of each double
+
+    Only values whose shortest repr ends exactly on the rounding boundary (e.g. 2.675, stored as
+    2.67499999...) differ from plain nearest rounding; those are detected by comparing each value
+    with the double nearest to its boundary, so the result is exact without per-row Python.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scale = 10.0 ** decimals
+    magnitude = np.abs(values)
+    lower = np.floor(magnitude * scale)
+    boundary = (lower + 0.5) / scale
+    rounded = (lower + (magnitude >= boundary)) / scale
+    return np.copysign(rounded, values)
+
+
+def _like(template, values):
+    """Return values as a Series aligned with template when template is a Series"""
+    if isinstance(template, pd.Series):
+        return pd.Series(values, index=template.index)
+    return values
+
+
+def congestion_components(vehicle_count, average_speed, capacity_per_hour, interval_minutes=5):
+    """Capacity per interval, volume ratio, speed factor and TCI for whole arrays of readings"""
+    vehicles = np.asarray(vehicle_count, dtype=np.float64)
+    speed = np.asarray(average_speed, dtype=np.float64)
+    capacity = np.asarray(capacity_per_hour, dtype=np.float64)
+
+    capacity_per_interval = capacity / (60 / interval_minutes)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        volume_ratio = np.where(capacity_per_interval > 0, vehicles / capacity_per_interval, np.nan)
+    speed_factor = 1 - (speed / FREE_FLOW_SPEED)
+
+    raw = volume_ratio * speed_factor * 100
+    tci = round_half_up(np.where(raw > TCI_CAP, TCI_CAP, raw), 2)
+    tci = np.where(capacity_per_interval <= 0, 0.0, tci)
+
+    return {
+        "capacity_per_5min": capacity_per_interval,
+        "volume_ratio": volume_ratio,
+        "speed_factor": speed_factor,
+        "traffic_congestion_index": tci,
+    }
+
+
+def congestion_index(vehicle_count, average_speed, capacity_per_hour, interval_minutes=5):
+    """Vectorized TCI for NumPy arrays or pandas Series (a Series keeps its index)"""
+    tci = congestion_components(vehicle_count, average_speed, capacity_per_hour, interval_minutes)
+    return _like(vehicle_count, tci["traffic_congestion_index"])
+
+
+def congestion_level_codes(tci):
+    """Index into CONGESTION_LEVELS of each TCI (0=Low ... 4=Critical), as an int array"""
+    return np.searchsorted(CONGESTION_THRESHOLDS, np.asarray(tci, dtype=np.float64), side="right")
+
+
+def congestion_level(tci):
+    """Bucket TCIs into CONGESTION_LEVELS; a missing TCI lands in the last bucket like in Spark"""
+    return _like(tci, np.asarray(CONGESTION_LEVELS, dtype=object)[congestion_level_codes(tci)])
+
+
+def spark_congestion_columns(interval_minutes=5):
+    """Spark Column expressions for the congestion components, keyed by output column name"""
+    from pyspark.sql.functions import col, lit, round as spark_round, when
+
+    capacity_per_interval = col("capacity_per_hour") / (60 / interval_minutes)
+    volume_ratio = when(capacity_per_interval > 0, col("vehicle_count") / capacity_per_interval)
+    speed_factor = 1 - (col("average_speed") / FREE_FLOW_SPEED)
+    raw = volume_ratio * speed_factor * 100
+
+    tci = when(capacity_per_interval <= 0, lit(0.0)).otherwise(
+        spark_round(when(raw > TCI_CAP, lit(TCI_CAP)).otherwise(raw), 2)
+    )
+
+    return {
+        "capacity_per_5min": capacity_per_interval,
+        "volume_ratio": volume_ratio,
+        "speed_factor": speed_factor,
+        "traffic_congestion_index": tci,
+    }
+
+
+def spark_congestion_level(tci_col):
+    """Spark Column bucketing a TCI column into CONGESTION_LEVELS"""
+    from pyspark.sql.functions import when
+
+    level = None
+    for threshold, name in zip(CONGESTION_THRESHOLDS, CONGESTION_LEVELS):
+        level = when(tci_col < threshold, name) if level is None else level.when(tci_col < threshold, name)
+    return level.otherwise(CONGESTION_LEVELS[-1])
@@ -0,0 +1,92 @@
+"""
+timeline_replay.py
+Time-accelerated replay of the enriched readings at their native resolution
+
+TimelineIndex sorts the readings by timestamp once and keeps, per distinct timestamp, the row
+range holding its readings:
+
+    timestamps  [t0, t1, t2, ...]        distinct, ascending
+    offsets     [0, n0, n0 + n1, ...]    rows of timestamps[i] are offsets[i]:offsets[i + 1]
+
+so the readings of one instant are column slices (views), found by a binary search over the
+distinct timestamps rather than a filter over all rows. TimelineReplay maps wall-clock time to
+data time at `speed` data seconds per second, wraps around at the end of the data and can
+jump to any point of a multi-day timeline.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class TimelineIndex:
+    """Readings sorted by timestamp with a timestamp -> row range index over whole columns"""
+
+    def __init__(self, readings, columns=None):
+        readings = readings[readings["timestamp"].notna()]
+        readings = readings.sort_values(["timestamp", "intersection_id"], kind="stable")
+        columns = columns or list(readings.columns)
+        self.columns = {name: readings[name].to_numpy() for name in columns}
+        nanos = pd.to_datetime(readings["timestamp"]).to_numpy(dtype="datetime64[ns]")
+        starts = np.flatnonzero(np.r_[True, nanos[1:] != nanos[:-1]]) if len(nanos) else np.array([], dtype=np.int64)
+        self.timestamps = nanos[starts]
+        self.offsets = np.r_[starts, len(nanos)]
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def interval(self):
+        """Typical step between readings (the smallest gap between distinct timestamps)"""
+        if len(self) < 2:
+            return np.timedelta64(0, "ns")
+        return np.diff(self.timestamps).min()
+
+    def position(self, when):
+        """Index of the last timestamp at or before `when` (the first one before the data starts)"""
+        when = np.datetime64(pd.Timestamp(when), "ns")
+        return max(int(np.searchsorted(self.timestamps, when, side="right")) - 1, 0)
+
+    def rows(self, position):
+        """{column: array view} of the readings at timestamps[position]"""
+        start, stop = self.offsets[position], self.offsets[position + 1]
+        return {name: values[start:stop] for name, values in self.columns.items()}
+
+
+class TimelineReplay:
+    """Current position in a TimelineIndex when data time runs `speed` times faster than wall time
+
+    The data loops: after the last timestamp (plus one interval) replay starts over at the first.
+    """
+
+    def __init__(self, index, speed=60.0, start=None, clock=time.monotonic):
+        self.index = index
+        self.speed = speed
+        self.clock = clock
+        self.seek(start if start is not None else index.timestamps[0])
+
+    @property
+    def span(self):
+        """Data time covered by one pass over the timeline"""
+        return self.index.timestamps[-1] - self.index.timestamps[0] + self.index.interval
+
+    def seek(self, when):
+        """Jump to data time `when` (anything pd.Timestamp accepts); replay continues from there"""
+        self._anchor_data = np.datetime64(pd.Timestamp(when), "ns")
+        self._anchor_wall = self.clock()
+
+    def data_time(self):
+        """Data time corresponding to now"""
+        elapsed = np.timedelta64(int((self.clock() - self._anchor_wall) * self.speed * 1e9), "ns")
+        first = self.index.timestamps[0]
+        offset = self._anchor_data + elapsed - first
+        span = self.span
+        if span > np.timedelta64(0, "ns") and offset >= span:
+            offset = offset % span
+        return first + max(offset, np.timedelta64(0, "ns"))
+
+    def current(self):
+        """(timestamp, {column: array view}) of the readings replayed now"""
+        position = self.index.position(self.data_time())
+        return self.index.timestamps[position], self.index.rows(position)
@@ -0,0 +1,125 @@
+"""
+validation.py
+Data quality rules applied to enriched readings in the same pass as enrichment
+
+Each rule has a reason code. A reading that breaks any rule gets the comma-separated codes in
+its quality_issues column ("" when clean); TrafficETLPipeline routes those rows to the
+quarantine dataset instead of enriched_data and the aggregates.
+
+  missing_value               timestamp, intersection_id, vehicle_count or average_speed is null
+  unknown_intersection        no metadata matched (null capacity_per_hour)
+  vehicle_count_out_of_range  vehicle_count outside [0, MAX_VEHICLE_COUNT]
+  speed_out_of_range          average_speed outside [0, FREE_FLOW_SPEED]; faster readings
+                              would get a negative TCI
+  timestamp_off_interval      timestamp not a whole number of interval_minutes after the
+                              intersection's first reading
+  duplicate_reading           another reading of the same intersection and timestamp came first
+
+The duplicate check looks at each intersection's readings in timestamp order, so per
+intersection the accepted timestamps strictly increase. The interval check measures from the
+intersection's first reading in the input, so a feed does not have to start on a midnight grid
+(08:02, 08:07, ... is fine) and any interval works. Streaming inputs skip both checks (window
+functions need a bounded input); the watermark handles late data there.
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .tci import FREE_FLOW_SPEED
+except ImportError:  # imported from src/etl_pipeline.py run as a script
+    from tci import FREE_FLOW_SPEED
+
+
+MAX_VEHICLE_COUNT = 1000  # per reading; far above any lane capacity per interval
+REQUIRED_COLUMNS = ["timestamp", "intersection_id", "vehicle_count", "average_speed"]
+REASON_CODES = (
+    "missing_value",
+    "unknown_intersection",
+    "vehicle_count_out_of_range",
+    "speed_out_of_range",
+    "timestamp_off_interval",
+    "duplicate_reading",
+)
+# Order in which tied duplicates are resolved, identical for Spark and pandas
+DUPLICATE_ORDER = ["intersection_id", "timestamp", "vehicle_count", "average_speed"]
+
+
+def pandas_quality_issues(enriched, interval_minutes=5):
+    """quality_issues for every row of an enriched pandas frame (aligned with its index)"""
+    timestamps = pd.to_datetime(enriched["timestamp"])
+    first = timestamps.groupby(enriched["intersection_id"], dropna=False).transform("min")
+    seconds = (timestamps - first).dt.total_seconds().to_numpy()
+    vehicles = enriched["vehicle_count"].to_numpy(dtype=np.float64)
+    speed = enriched["average_speed"].to_numpy(dtype=np.float64)
+
+    ordered = enriched.sort_values(DUPLICATE_ORDER, kind="stable")
+    duplicate = ordered.duplicated(["intersection_id", "timestamp"]).reindex(enriched.index).to_numpy()
+
+    rules = [
+        enriched[REQUIRED_COLUMNS].isna().any(axis=1).to_numpy(),
+        enriched["capacity_per_hour"].isna().to_numpy() & enriched["intersection_id"].notna().to_numpy(),
+        (vehicles < 0) | (vehicles > MAX_VEHICLE_COUNT),
+        (speed < 0) | (speed > FREE_FLOW_SPEED),
+        (np.fmod(seconds, interval_minutes * 60) != 0) & ~np.isnan(seconds),
+        duplicate & timestamps.notna().to_numpy(),
+    ]
+    # one bit per rule, then one string per distinct combination instead of per row
+    mask = np.zeros(len(enriched), dtype=np.int64)
+    for bit, violated in enumerate(rules):
+        mask |= violated.astype(np.int64) << bit
+    codes = {m: ",".join(code for bit, code in enumerate(REASON_CODES) if m >> bit & 1) for m in np.unique(mask)}
+    return pd.Series(mask, index=enriched.index).map(codes)
+
+
+def pandas_violation_counts(quality_issues):
+    """Violations per reason code plus the number of quarantined rows"""
+    counts = quality_issues[quality_issues != ""].str.split(",").explode().value_counts()
+    return {
+        **{code: int(counts.get(code, 0)) for code in REASON_CODES},
+        "quarantined": int((quality_issues != "").sum()),
+    }
+
+
+def with_spark_quality_issues(enriched_df, interval_minutes=5):
+    """enriched_df plus a quality_issues column; adds one shuffle (by intersection) for both window checks"""
+    from pyspark.sql import Window
+    from pyspark.sql.functions import col, concat_ws, lag, lit, min as spark_min, when
+
+    if enriched_df.isStreaming:
+        duplicate = off_interval = lit(False)
+    else:
+        intersection = Window.partitionBy("intersection_id")
+        duplicate = lag("timestamp").over(intersection.orderBy(*DUPLICATE_ORDER[1:])) == col("timestamp")
+        seconds = col("timestamp").cast("long") - spark_min("timestamp").over(intersection).cast("long")
+        off_interval = seconds % (interval_minutes * 60) != 0
+
+    missing = None
+    for column in REQUIRED_COLUMNS:
+        missing = col(column).isNull() if missing is None else missing | col(column).isNull()
+
+    rules = [
+        missing,
+        col("capacity_per_hour").isNull() & col("intersection_id").isNotNull(),
+        (col("vehicle_count") < 0) | (col("vehicle_count") > MAX_VEHICLE_COUNT),
+        (col("average_speed") < 0) | (col("average_speed") > FREE_FLOW_SPEED),
+        col("_off_interval"),
+        col("_duplicate_reading"),
+    ]
+    return (
+        enriched_df.withColumn("_duplicate_reading", duplicate)
+        .withColumn("_off_interval", off_interval)
+        # concat_ws skips nulls, so rules that do not apply (null conditions) add nothing
+        .withColumn("quality_issues", concat_ws(",", *[when(rule, lit(code)) for code, rule in zip(REASON_CODES, rules)]))
+        .drop("_duplicate_reading", "_off_interval")
+    )
+
+
+def spark_violation_counts():
+    """Aggregate expressions counting violations per reason code, for DataFrame.observe"""
+    from pyspark.sql.functions import array_contains, col, count, split, when
+
+    issues = split(col("quality_issues"), ",")
+    return [count(when(array_contains(issues, code), 1)).alias(code) for code in REASON_CODES] + [
+        count(when(col("quality_issues") != "", 1)).alias("quarantined")
+    ]
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+# Ensure project root is importable for tests
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def etl_pipeline():
+    """Shared local-mode TrafficETLPipeline; Spark tests are skipped when no JVM is available"""
+    pytest.importorskip("pyspark")
+    from src.etl_pipeline import TrafficETLPipeline
+
+    try:
+        pipeline = TrafficETLPipeline(app_name="TrafficETLTests")
+    except Exception as e:
+        pytest.skip(f"Spark is not available: {e}")
+    pipeline.spark.sparkContext.setLogLevel("ERROR")
+    # the test datasets are tiny; the default 200 shuffle partitions dominate run time
+    pipeline.spark.conf.set("spark.sql.shuffle.partitions", "4")
+    yield pipeline
+    pipeline.stop()
+
+
+@pytest.fixture
+def raw_data(tmp_path):
+    """Small generated dataset as (sensor_path, metadata_path)"""
+    from src.data_generator import TrafficDataGenerator
+
+    gen = TrafficDataGenerator(num_intersections=4, hours=6, seed=21)
+    metadata_path, sensor_path = gen.save_to_csv(output_dir=str(tmp_path / "raw"))
+    return sensor_path, metadata_path
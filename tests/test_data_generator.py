@@ -1,7 +1,9 @@
 import os
 import sys
 import pytest
+import numpy as np
 import pandas as pd
+from datetime import datetime
 
 # Ensure project root is importable for tests
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -32,3 +34,113 @@ def test_save_to_csv_creates_files(tmp_path):
     assert sensor_path is not None
     assert os.path.exists(metadata_path)
     assert os.path.exists(sensor_path)
+
+
+def test_numpy_engine_matches_python_schema():
+    start = datetime(2024, 1, 5)
+    gen = TrafficDataGenerator(num_intersections=3, hours=6, seed=7)
+    loop_df = gen.generate_sensor_data(start_date=start, interval_minutes=15, engine="python")
+    vec_df = gen.generate_sensor_data(start_date=start, interval_minutes=15, engine="numpy")
+
+    assert list(vec_df.columns) == list(loop_df.columns)
+    assert vec_df.dtypes.to_dict() == loop_df.dtypes.to_dict()
+    assert len(vec_df) == len(loop_df)
+    pd.testing.assert_series_equal(vec_df["timestamp"], loop_df["timestamp"])
+    pd.testing.assert_series_equal(vec_df["intersection_id"], loop_df["intersection_id"])
+
+
+def test_numpy_engine_stays_within_pattern_bands():
+    # Friday + Saturday so both weekday and weekend bands are exercised
+    start = datetime(2024, 1, 5)
+    gen = TrafficDataGenerator(num_intersections=5, hours=48, seed=3)
+    df = gen.generate_sensor_data(start_date=start, interval_minutes=5)
+
+    merged = df.merge(gen.intersections[["intersection_id", "capacity_per_hour"]], on="intersection_id")
+    low, high = TrafficDataGenerator._traffic_pattern_bands(
+        merged["timestamp"].dt.hour.to_numpy(), (merged["timestamp"].dt.dayofweek >= 5).to_numpy()
+    )
+    per_interval_capacity = merged["capacity_per_hour"] / 12
+    assert (merged["vehicle_count"] >= np.floor(per_interval_capacity * low * 0.8)).all()
+    assert (merged["vehicle_count"] <= per_interval_capacity * high * 1.2).all()
+
+    ratio = merged["vehicle_count"] / per_interval_capacity
+    speed = merged["average_speed"]
+    assert ((ratio >= 0.3) | speed.between(45, 55)).all()
+    assert ((ratio < 0.8) | speed.between(5, 15)).all()
+
+
+def test_numpy_engine_is_deterministic_for_seed():
+    start = datetime(2024, 1, 1)
+    first = TrafficDataGenerator(num_intersections=4, hours=2, seed=42).generate_sensor_data(start_date=start)
+    second = TrafficDataGenerator(num_intersections=4, hours=2, seed=42).generate_sensor_data(start_date=start)
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_save_to_parquet_partitions_by_date(tmp_path):
+    import pyarrow.parquet as pq
+
+    gen = TrafficDataGenerator(num_intersections=3, hours=30, seed=1)
+    outdir = str(tmp_path / "raw")
+    metadata_path, sensor_path = gen.save_to_parquet(
+        output_dir=outdir, start_date=datetime(2024, 1, 1, 12), intersections_per_chunk=2
+    )
+
+    assert os.path.exists(metadata_path)
+    partitions = sorted(os.listdir(sensor_path))
+    assert partitions == ["date=2024-01-01", "date=2024-01-02"]
+    # two intersection blocks per day
+    assert all(len(os.listdir(os.path.join(sensor_path, p))) == 2 for p in partitions)
+
+    table = pq.read_table(sensor_path)
+    assert table.num_rows == 3 * 30 * 12
+    df = table.to_pandas()
+    assert (df["timestamp"].dt.date.astype(str) == df["date"].astype(str)).all()
+
+    first_file = os.path.join(sensor_path, partitions[0], sorted(os.listdir(os.path.join(sensor_path, partitions[0])))[0])
+    assert pq.ParquetFile(first_file).metadata.row_group(0).column(0).compression == "ZSTD"
+
+    # a smaller rerun replaces the output instead of leaving stale part files behind
+    TrafficDataGenerator(num_intersections=1, hours=2, seed=1).save_to_parquet(
+        output_dir=outdir, start_date=datetime(2024, 1, 1, 12)
+    )
+    assert os.listdir(sensor_path) == ["date=2024-01-01"]
+    assert pq.read_table(sensor_path).num_rows == 2 * 12
+
+
+def test_save_sharded_is_independent_of_worker_count(tmp_path):
+    import json
+    import pyarrow.parquet as pq
+
+    gen = TrafficDataGenerator(num_intersections=5, hours=2, seed=11)
+    start = datetime(2024, 1, 1)
+    _, serial_path, manifest_path = gen.save_sharded(
+        output_dir=str(tmp_path / "serial"), num_shards=3, workers=1, start_date=start
+    )
+    _, parallel_path, _ = gen.save_sharded(
+        output_dir=str(tmp_path / "parallel"), num_shards=3, workers=2, start_date=start
+    )
+
+    def load(path):
+        df = pq.read_table(path).to_pandas()
+        return df.sort_values(["intersection_id", "timestamp"]).reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(load(serial_path), load(parallel_path))
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    assert manifest["master_seed"] == 11
+    assert [s["num_intersections"] for s in manifest["shards"]] == [2, 2, 1]
+    assert manifest["total_rows"] == 5 * 2 * 12
+
+    # shards share the parent's metadata
+    lanes = gen.intersections.set_index("intersection_id")["num_lanes"]
+    df = load(serial_path)
+    assert (df["num_lanes"].to_numpy() == lanes.loc[df["intersection_id"]].to_numpy()).all()
+
+    # fewer shards over the same directory: no part files of the old shards remain
+    _, serial_path, manifest_path = TrafficDataGenerator(num_intersections=2, hours=2, seed=11).save_sharded(
+        output_dir=str(tmp_path / "serial"), num_shards=1, workers=1, start_date=start
+    )
+    with open(manifest_path) as f:
+        assert json.load(f)["num_shards"] == 1
+    assert pq.read_table(serial_path).num_rows == 2 * 2 * 12
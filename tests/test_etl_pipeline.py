@@ -0,0 +1,118 @@
+import pandas as pd
+
+
+def test_run_pipeline_observes_counts_without_extra_jobs(etl_pipeline, raw_data, tmp_path):
+    sensor_path, metadata_path = raw_data
+    etl_pipeline.single_materialization = True
+    enriched_df, hourly_metrics, intersection_stats = etl_pipeline.run_pipeline(
+        sensor_path, metadata_path, str(tmp_path / "processed")
+    )
+
+    stats = etl_pipeline.stage_stats()
+    expected_rows = len(pd.read_csv(sensor_path))
+    assert stats["sensor_records"]["rows"] == expected_rows
+    assert stats["intersection_records"]["rows"] == 4
+    assert stats["enriched_records"]["rows"] == expected_rows
+    assert stats["enriched_records"]["missing_capacity"] == 0
+    # nothing stays cached once the run is over
+    cache_manager = etl_pipeline.spark._jsparkSession.sharedState().cacheManager()
+    assert cache_manager.lookupCachedData(enriched_df._jdf).isEmpty()
+    assert not etl_pipeline._persisted
+
+    # a repeated run over the same input observes its own counts
+    etl_pipeline.run_pipeline(sensor_path, metadata_path, str(tmp_path / "processed"))
+    assert etl_pipeline.stage_stats()["enriched_records"]["rows"] == expected_rows
+
+
+def test_run_pipeline_exports_csv_from_parquet(etl_pipeline, raw_data, tmp_path):
+    sensor_path, metadata_path = raw_data
+    output = tmp_path / "processed"
+    etl_pipeline.run_pipeline(sensor_path, metadata_path, str(output))
+
+    reports = etl_pipeline.sink_reports
+    for name in ["enriched_data", "hourly_metrics", "intersection_stats"]:
+        assert reports[name]["format"] == "parquet"
+        assert reports[f"{name}_csv"]["format"] == "csv"
+        assert reports[f"{name}_csv"]["bytes"] > 0
+
+        csv_files = list((output / f"{name}_csv").glob("*.csv"))
+        assert len(csv_files) == 1
+        csv_df = pd.read_csv(csv_files[0])
+        parquet_df = pd.read_parquet(output / name)
+        assert list(csv_df.columns) == list(parquet_df.columns)
+        assert len(csv_df) == len(parquet_df)
+
+    # order of sorted aggregates survives the export
+    stats = pd.read_csv(next((output / "intersection_stats_csv").glob("*.csv")))
+    assert stats["avg_congestion_index"].is_monotonic_decreasing
+
+
+def test_run_incremental_merges_new_files(etl_pipeline, tmp_path):
+    from datetime import datetime
+    from src.data_generator import TrafficDataGenerator
+
+    gen = TrafficDataGenerator(num_intersections=3, hours=4, seed=8)
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    metadata_path = str(raw / "intersection_metadata.csv")
+    gen.intersections.to_csv(metadata_path, index=False)
+    gen.generate_sensor_data(start_date=datetime(2024, 1, 1)).to_csv(raw / "day1.csv", index=False)
+
+    output = tmp_path / "incremental"
+    etl_pipeline.run_incremental(str(raw), metadata_path, str(output))
+    assert etl_pipeline.run_incremental(str(raw), metadata_path, str(output)) is None
+
+    gen.generate_sensor_data(start_date=datetime(2024, 1, 2)).to_csv(raw / "day2.csv", index=False)
+    etl_pipeline.run_incremental(str(raw), metadata_path, str(output))
+
+    full = tmp_path / "full"
+    etl_pipeline.run_incremental(str(raw), metadata_path, str(full), full_refresh=True)
+
+    tables = [("hourly_metrics", ["intersection_id", "hour"]), ("intersection_stats", ["intersection_id"]),
+              ("rollups/hourly", ["intersection_id", "window_start"]),
+              ("rollups/day_of_week_hour", ["intersection_id", "day_of_week", "hour"]),
+              ("percentiles/hourly", ["intersection_id", "date", "hour"]),
+              ("percentiles/daily", ["intersection_id", "date"]),
+              # refitted from both days, not only the second run's readings
+              ("forecasts", ["intersection_id", "horizon_minutes"])]
+    for name, keys in tables:
+        merged = pd.read_parquet(output / name).sort_values(keys).reset_index(drop=True)
+        recomputed = pd.read_parquet(full / name).sort_values(keys).reset_index(drop=True)
+        pd.testing.assert_frame_equal(merged, recomputed, check_dtype=False)
+
+    assert len(pd.read_parquet(output / "enriched_data")) == 3 * 4 * 12 * 2
+    # the second run exported only its own readings, as a second CSV part
+    parts = sorted((output / "enriched_data_csv").glob("*.csv"))
+    assert [p.name for p in parts] == ["part-00000.csv", "part-00001.csv"]
+    assert [len(pd.read_csv(p)) for p in parts] == [3 * 4 * 12, 3 * 4 * 12]
+    assert pd.read_csv(parts[1])["date"].astype(str).unique().tolist() == ["2024-01-02"]
+    hourly = pd.read_parquet(output / "hourly_metrics")
+    assert (hourly["reading_count"] == 24).all()
+
+
+def test_run_backfill_replaces_only_requested_dates(etl_pipeline, tmp_path):
+    from datetime import datetime
+    from src.data_generator import TrafficDataGenerator
+
+    gen = TrafficDataGenerator(num_intersections=3, hours=48, seed=5)
+    metadata_path = str(tmp_path / "intersection_metadata.csv")
+    sensor_path = str(tmp_path / "traffic_sensor_data.csv")
+    gen.intersections.to_csv(metadata_path, index=False)
+    sensor = gen.generate_sensor_data(start_date=datetime(2024, 1, 1))
+    sensor.to_csv(sensor_path, index=False)
+
+    output = tmp_path / "processed"
+    etl_pipeline.run_pipeline(sensor_path, metadata_path, str(output))
+    day1_files = {p: p.stat().st_mtime_ns for p in (output / "enriched_data").glob("date=2024-01-01/*/*.parquet")}
+
+    # corrected readings for the second day only
+    day2 = sensor["timestamp"] >= datetime(2024, 1, 2)
+    sensor.loc[day2, "vehicle_count"] += 7
+    sensor.to_csv(sensor_path, index=False)
+    etl_pipeline.run_backfill(sensor_path, metadata_path, "2024-01-02", "2024-01-02", str(output))
+
+    assert {p: p.stat().st_mtime_ns for p in day1_files} == day1_files
+    hourly = pd.read_parquet(output / "hourly_metrics")
+    assert hourly["total_vehicles"].sum() == sensor["vehicle_count"].sum()
+    daily = pd.read_parquet(output / "rollups" / "daily")
+    assert daily["vehicle_sum"].sum() == sensor["vehicle_count"].sum()
@@ -0,0 +1,88 @@
+import json
+import queue
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.etl_pipeline import TrafficETLPipeline
+from src.etl_service import ETLService, make_server
+
+
+@pytest.fixture
+def service(raw_data, tmp_path):
+    sensor_path, metadata_path = raw_data
+    defaults = {"sensor_data_path": sensor_path, "metadata_path": metadata_path,
+                "output_base_path": str(tmp_path / "processed")}
+    service = ETLService(TrafficETLPipeline(engine="pandas"), max_queued=2, defaults=defaults)
+    yield service
+    service.stop()
+
+
+def test_jobs_run_on_the_shared_pipeline(service, tmp_path):
+    service.start()
+    first = service.submit("full")
+    assert service.wait(timeout=60)
+    second = service.submit("full")
+    assert service.wait(timeout=60)
+
+    assert first.status == second.status == "succeeded"
+    assert (tmp_path / "processed" / "hourly_metrics").exists()
+    stats = service.stats()
+    assert stats["latency"]["full"]["jobs"] == 2
+    assert stats["failed"] == 0 and stats["queued"] == 0
+
+
+def test_submit_rejects_bad_jobs_and_full_queue(service):
+    with pytest.raises(ValueError):
+        service.submit("compact")
+    with pytest.raises(ValueError):
+        service.submit("backfill", start_date="2024-01-01")
+    # the pandas engine has no incremental or backfill runs: refused up front, never queued
+    for kind in ("incremental", "backfill"):
+        with pytest.raises(ValueError, match="engine='spark'"):
+            service.submit(kind, start_date="2024-01-01", end_date="2024-01-02")
+    assert not service.jobs
+
+    service.submit("full")
+    service.submit("full")
+    with pytest.raises(queue.Full):
+        service.submit("full")
+
+
+def test_http_interface(service):
+    server = make_server(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def post(body):
+        request = urllib.request.Request(f"{base}/jobs", data=json.dumps(body).encode(), method="POST")
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    try:
+        assert post({"kind": "nope"})[0] == 400
+        assert post({"kind": "incremental"})[0] == 400
+        status, job = post({"kind": "full"})
+        assert status == 202 and job["status"] == "queued"
+        post({"kind": "full"})
+        assert post({"kind": "full"})[0] == 429  # workers not started, so the queue stays full
+
+        service.start()
+        assert service.wait(timeout=60)
+        with urllib.request.urlopen(f"{base}/jobs/{job['job_id']}") as response:
+            done = json.load(response)
+        assert done["status"] == "succeeded" and done["run_seconds"] > 0
+        with urllib.request.urlopen(f"{base}/jobs") as response:
+            assert [j["job_id"] for j in json.load(response)] == [j.job_id for j in service.list_jobs()]
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{base}/jobs/job-999999")
+        with urllib.request.urlopen(f"{base}/stats") as response:
+            assert json.load(response)["latency"]["full"]["jobs"] == 2
+    finally:
+        server.shutdown()
+        server.server_close()
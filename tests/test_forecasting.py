@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from src.forecasting import HORIZON_MINUTES, pandas_forecasts, spark_forecasts
+from src.pandas_engine import PandasTrafficEngine
+
+
+def _ar1_readings(phi=0.8, days=3, seed=5):
+    """Two intersections whose TCI is an hourly profile plus AR(1) noise"""
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range("2024-01-01", periods=days * 288, freq="5min")
+    profile = 30 + 20 * np.sin(timestamps.hour.to_numpy() / 24 * 2 * np.pi)
+    frames = []
+    for intersection_id in ("INT_001", "INT_002"):
+        noise = np.zeros(len(timestamps))
+        for i in range(1, len(noise)):
+            noise[i] = phi * noise[i - 1] + rng.normal(0, 3)
+        frames.append(pd.DataFrame({
+            "intersection_id": intersection_id,
+            "location": f"{intersection_id} location",
+            "timestamp": timestamps,
+            "traffic_congestion_index": profile + noise,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_forecasts_fit_ar_residuals_and_decay_to_baseline():
+    readings = _ar1_readings(days=7)
+    forecasts = pandas_forecasts(readings)
+    assert len(forecasts) == 2 * len(HORIZON_MINUTES)
+    np.testing.assert_allclose(forecasts["ar_coefficient"], 0.8, atol=0.05)
+    horizons = pd.to_timedelta(forecasts["horizon_minutes"], "m")
+    assert (forecasts["target_timestamp"] - forecasts["issued_at"] == horizons).all()
+
+    readings.loc[readings.index[-1], "traffic_congestion_index"] += 40  # a spike at INT_002's last reading
+    forecasts = pandas_forecasts(readings)
+    spike = forecasts[forecasts["intersection_id"] == "INT_002"].sort_values("horizon_minutes")
+    excess = (spike["forecast_congestion_index"] - spike["baseline_congestion_index"]).to_numpy()
+    assert (excess > 0).all() and (np.diff(excess) < 0).all()
+
+
+def test_spark_forecasts_match_pandas(etl_pipeline, raw_data):
+    sensor_path, metadata_path = raw_data
+    engine = PandasTrafficEngine()
+    expected = engine.forecast(engine.transform(*engine.extract(sensor_path, metadata_path)))
+    assert engine.stats["forecasts"]["intersections"] == 4
+
+    enriched_df = etl_pipeline.transform(*etl_pipeline.extract(sensor_path, metadata_path))
+    actual = spark_forecasts(enriched_df, buckets=3).toPandas()
+
+    keys = ["intersection_id", "horizon_minutes"]
+    pd.testing.assert_frame_equal(
+        actual.sort_values(keys).reset_index(drop=True),
+        expected.sort_values(keys).reset_index(drop=True),
+        check_dtype=False,
+    )
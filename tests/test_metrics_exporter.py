@@ -0,0 +1,262 @@
+import gzip
+import http.client
+import json
+import threading
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+from prometheus_client import generate_latest
+from prometheus_client.parser import text_string_to_metric_families
+
+from src.columnar_metrics import ColumnarGauge, ColumnarHistogram, render_text
+from src.etl_pipeline import TrafficETLPipeline
+from src.metrics_exporter import TrafficMetricsExporter, make_server
+from src.metrics_server import AsyncMetricsServer
+from src.serving_snapshots import publish_processed_tables
+
+
+def _samples(text):
+    """{(metric, sorted labels): value} of an exposition"""
+    return {
+        (s.name, tuple(sorted(s.labels.items()))): s.value
+        for family in text_string_to_metric_families(text.decode())
+        for s in family.samples
+    }
+
+
+def test_columnar_render_matches_generate_latest():
+    gauges = [
+        ColumnarGauge(
+            "traffic_test",
+            "Escaping \\ and\nnewlines",
+            {"intersection_id": ["INT_001", 'say "hi"', "back\\slash\n"], "location": ["A", None, "C"], "q": "0.5"},
+            [1.0, float("nan"), 12345678.9],
+        ),
+        ColumnarGauge("traffic_test_horizon", "Integer labels", {"horizon_minutes": [15, 30]}, [0.25, float("inf")]),
+        ColumnarGauge("traffic_test_empty", "No series", {"intersection_id": []}, []),
+    ]
+    families = list(text_string_to_metric_families(render_text(gauges).decode()))
+    assert [f.name for f in families] == ["traffic_test", "traffic_test_horizon", "traffic_test_empty"]
+    assert families[0].documentation == "Escaping \\ and\nnewlines"
+
+    class Registry:
+        def collect(self):
+            return (gauge.family() for gauge in gauges)
+
+    expected, rendered = _samples(generate_latest(Registry())), _samples(render_text(gauges))
+    assert expected.keys() == rendered.keys()
+    for key, value in expected.items():
+        assert value == rendered[key] or (value != value and rendered[key] != rendered[key])
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    values = np.array([0.0, 20.0, 20.01, 55.0, 99.0, 150.0, np.nan])
+    histogram = ColumnarHistogram("traffic_test_tci", "TCI", (20, 40, 100), values)
+    samples = _samples(render_text([histogram]))
+
+    # le is inclusive, +Inf counts everything, missing values are left out
+    expected = {"20.0": 2, "40.0": 3, "100.0": 5, "+Inf": 6}
+    for le, count in expected.items():
+        assert samples[("traffic_test_tci_bucket", (("le", le),))] == count
+    assert samples[("traffic_test_tci_count", ())] == 6
+    assert samples[("traffic_test_tci_sum", ())] == np.nansum(values)
+
+
+def test_exporter_series_follow_current_data(raw_data, tmp_path):
+    sensor_path, metadata_path = raw_data
+    output = tmp_path / "processed"
+    TrafficETLPipeline(engine="pandas").run_pipeline(sensor_path, metadata_path, str(output))
+
+    exporter = TrafficMetricsExporter(data_path=str(output))
+    exporter.update_metrics()
+    quantiles = exporter.quantiles
+    forecast_stats = dict(exporter.forecasts_cache.stats)
+    samples = _samples(generate_latest(exporter.registry))
+    hourly = pd.read_parquet(output / "hourly_metrics")
+    hour0 = hourly[hourly["hour"] == 0].set_index("intersection_id")
+    for intersection_id, row in hour0.iterrows():
+        labels = (("intersection_id", intersection_id), ("location", row["location"]))
+        assert samples[("traffic_congestion_index", labels)] == row["avg_congestion_index"]
+        assert samples[("traffic_vehicle_count", labels)] == row["total_vehicles"] / row["reading_count"]
+        assert ("traffic_congestion_index_quantile", (*labels, ("quantile", "0.95"))) in samples
+        assert ("traffic_congestion_index_forecast", (("horizon_minutes", "60"), *labels)) in samples
+        level = sum(row["avg_congestion_index"] >= t for t in (20, 40, 60, 80))
+        assert samples[("traffic_congestion_level", labels)] == level
+
+    # fleet-wide series: intersections per level and histograms of the hour's readings
+    fleet = {dict(labels)["congestion_level"]: value for (name, labels), value in samples.items()
+             if name == "traffic_intersections_by_congestion_level"}
+    assert list(fleet) == ["Low", "Moderate", "High", "Severe", "Critical"]
+    assert sum(fleet.values()) == len(hour0)
+    readings = pd.read_parquet(output / "enriched_data", filters=[("hour", "==", 0)])
+    assert samples[("traffic_reading_congestion_index_count", ())] == len(readings)
+    assert samples[("traffic_reading_average_speed_bucket", (("le", "+Inf"),))] == len(readings)
+    below_20 = (readings["traffic_congestion_index"] <= 20).sum()
+    assert samples[("traffic_reading_congestion_index_bucket", (("le", "20.0"),))] == below_20
+
+    # the HTTP endpoint serves the columnar rendering of the same samples
+    server = make_server(exporter, host="127.0.0.1", port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            served = _samples(response.read())
+        # the exporter's own series (scrape durations) move with every scrape; the traffic series must not
+        assert {k: v for k, v in served.items() if not k[0].startswith("traffic_exporter_")} == {
+            k: v for k, v in samples.items() if not k[0].startswith("traffic_exporter_")
+        }
+    finally:
+        server.shutdown()
+    # scrapes render the frames of the last update without touching the table caches
+    assert exporter.forecasts_cache.stats == forecast_stats
+
+    # series of intersections that leave the data disappear with the next update
+    exporter.current_hour = 0
+    hourly[hourly["intersection_id"] != "INT_001"].to_parquet(output / "hourly_metrics" / "part-0.parquet")
+    for path in (output / "hourly_metrics").glob("*.parquet"):
+        if path.name != "part-0.parquet":
+            path.unlink()
+    publish_processed_tables(str(output))
+    exporter.update_metrics()
+    ids = {dict(labels)["intersection_id"] for name, labels in _samples(exporter.collector.render())
+           if name == "traffic_congestion_index"}
+    assert ids == set(hour0.index) - {"INT_001"}
+    # a new snapshot with the same sketches still merges them again, an unchanged one does not
+    assert exporter._merged_quantiles(0) is not quantiles and exporter._merged_quantiles(0) is exporter.quantiles
+    # the hour's readings come from the cache loaded by the first update: enriched_data is unchanged
+    assert exporter.readings_caches[0].stats["reloads"] == 1 and exporter.readings_caches[0].stats["hits"] == 1
+
+
+def test_async_server_answers_from_cached_payload_during_reload(raw_data, tmp_path):
+    sensor_path, metadata_path = raw_data
+    output = tmp_path / "processed"
+    TrafficETLPipeline(engine="pandas").run_pipeline(sensor_path, metadata_path, str(output))
+    exporter = TrafficMetricsExporter(data_path=str(output))
+
+    reloading, release = threading.Event(), threading.Event()
+    update_metrics = exporter.update_metrics
+
+    def slow_update():
+        reloading.set()
+        release.wait(10)
+        update_metrics()
+
+    exporter.update_metrics = slow_update
+    server = AsyncMetricsServer(exporter, host="127.0.0.1", port=0, update_interval=3600)
+    threading.Thread(target=server.run, daemon=True).start()
+    assert server.ready.wait(10) and reloading.wait(10)
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=10)
+
+    def get(**headers):
+        connection.request("GET", "/metrics", headers=headers)
+        response = connection.getresponse()
+        return response, response.read()
+
+    try:
+        # the first update hangs; scrapes still get the payload published at start-up
+        response, before = get()
+        assert response.status == 200 and b"# TYPE traffic_vehicle_count gauge" in before
+        assert b"traffic_vehicle_count{" not in before
+        release.set()
+        deadline = time.monotonic() + 10
+        while exporter.exposition.raw == before and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        # same keep-alive connection: gzip on request, 304 for a known ETag
+        response, body = get(**{"Accept-Encoding": "gzip"})
+        assert response.getheader("Content-Encoding") == "gzip"
+        assert gzip.decompress(body) == exporter.exposition.raw
+        assert b"traffic_vehicle_count{" in gzip.decompress(body)
+        etag = response.getheader("ETag")
+        response, body = get(**{"If-None-Match": etag})
+        assert response.status == 304 and body == b""
+        response, body = get(**{"If-None-Match": '"stale"'})
+        assert response.status == 200 and body == exporter.exposition.raw
+    finally:
+        connection.close()
+        server.stop()
+
+
+def test_exporter_instruments_updates_failures_and_scrapes(raw_data, tmp_path, capsys):
+    sensor_path, metadata_path = raw_data
+    output = tmp_path / "processed"
+    TrafficETLPipeline(engine="pandas").run_pipeline(sensor_path, metadata_path, str(output))
+    exporter = TrafficMetricsExporter(data_path=str(output), log_timings=True)
+    capsys.readouterr()
+
+    assert exporter.update_metrics()
+    timing = json.loads([line for line in capsys.readouterr().out.splitlines() if line.startswith("{")][-1])
+    assert timing["event"] == "exporter_update" and timing["rows"]["hourly_metrics"] == 4
+    assert set(timing["phases"]) == {"read_hourly_metrics", "read_enriched_data", "merge_sketches", "read_forecasts",
+                                     "render"}
+
+    samples = _samples(exporter.exposition.raw)
+    # everything the columnar collector renders, including its table cache gauges
+    traffic = [key for key in samples if not key[0].startswith("traffic_exporter_") or "_cache_" in key[0]]
+    assert samples[("traffic_exporter_series", ())] == len(traffic)
+    assert samples[("traffic_exporter_update_duration_seconds_count", ())] == 1
+    assert samples[("traffic_exporter_rows_processed", (("table", "enriched_data"),))] == 4 * 12
+    assert samples[("traffic_exporter_last_success_timestamp_seconds", ())] > time.time() - 60
+    assert samples[("traffic_exporter_consecutive_failures", ())] == 0
+
+    # a failing update keeps the traffic series and reports the failure
+    def broken(*args, **kwargs):
+        raise OSError("disk went away")
+
+    exporter.reader.read = broken
+    assert not exporter.update_metrics() and not exporter.update_metrics()
+    assert "disk went away" in capsys.readouterr().out
+    failed = _samples(exporter.exposition.raw)
+    assert failed[("traffic_exporter_consecutive_failures", ())] == 2
+    assert failed[("traffic_exporter_update_failures_total", ())] == 2
+    assert {k: failed[k] for k in traffic} == {k: samples[k] for k in traffic}
+
+    # scrapes are timed by the server and show up after the next publish
+    server = make_server(exporter, host="127.0.0.1", port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for _ in range(3):
+            urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics").read()
+    finally:
+        server.shutdown()
+    del exporter.reader.read
+    assert exporter.update_metrics()
+    recovered = _samples(exporter.exposition.raw)
+    assert recovered[("traffic_exporter_scrape_duration_seconds_count", ())] == 3
+    assert recovered[("traffic_exporter_consecutive_failures", ())] == 0
+
+    # a failing render keeps the previous frames for the collector as well as for /metrics
+    def collected():
+        return {k: v for k, v in _samples(exporter.collector.render()).items() if not k[0].startswith("traffic_exporter_")}
+
+    hour_data, before = exporter.hour_data, collected()
+    exporter._forecast_gauge = broken
+    assert not exporter.update_metrics()
+    del exporter._forecast_gauge
+    assert exporter.hour_data is hour_data and collected() == before
+
+
+def test_exporter_replays_enriched_readings(raw_data, tmp_path):
+    sensor_path, metadata_path = raw_data
+    output = tmp_path / "processed"
+    TrafficETLPipeline(engine="pandas").run_pipeline(sensor_path, metadata_path, str(output))
+    enriched = pd.read_parquet(output / "enriched_data")
+    start = enriched["timestamp"].min() + pd.Timedelta(hours=2, minutes=35)
+
+    exporter = TrafficMetricsExporter(data_path=str(output), replay_speed=1.0, replay_start=start)
+    assert exporter.update_metrics()
+    assert exporter.replay_time == start and exporter.current_hour == start.hour
+
+    samples = _samples(exporter.exposition.raw)
+    expected = enriched[enriched["timestamp"] == start]
+    for _, row in expected.iterrows():
+        labels = (("intersection_id", row["intersection_id"]), ("location", row["location"]))
+        assert samples[("traffic_congestion_index", labels)] == row["traffic_congestion_index"]
+        assert samples[("traffic_vehicle_count", labels)] == row["vehicle_count"]
+    assert samples[("traffic_reading_congestion_index_count", ())] == len(expected)
+    assert samples[("traffic_exporter_replay_timestamp_seconds", ())] == start.timestamp()
+
+    exporter.seek(start + pd.Timedelta(hours=3))
+    assert exporter.update_metrics()
+    assert exporter.replay_time == start + pd.Timedelta(hours=3)
@@ -0,0 +1,134 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.pandas_engine import PandasTrafficEngine
+from src.tci import round_half_up
+
+
+BOUNDARY_VALUES = [2.675, 1.005, 0.125, -2.675, -0.005, 99.995, 10.0, 0.0, 33.334999999999994]
+
+
+def spark_style_round(value):
+    return float(Decimal(repr(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+def test_round_half_up_matches_decimal_repr_rounding():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.uniform(-200, 100, 5000), np.round(rng.uniform(0, 100, 5000), 3), BOUNDARY_VALUES])
+    expected = [spark_style_round(v) for v in values]
+    np.testing.assert_array_equal(round_half_up(values, 2), expected)
+
+
+def test_round_half_up_keeps_nan():
+    assert np.isnan(round_half_up([np.nan])[0])
+
+
+@pytest.fixture
+def edge_case_data(raw_data, tmp_path):
+    """raw_data plus an unknown intersection (null metadata) and speeds above 55"""
+    sensor_path, metadata_path = raw_data
+    sensor = pd.read_csv(sensor_path)
+    extra = sensor.head(6).copy()
+    extra.loc[:2, "intersection_id"] = "INT_999"
+    extra.loc[3:, "average_speed"] = 80.0
+    path = tmp_path / "edge_sensor_data.csv"
+    pd.concat([sensor, extra]).to_csv(path, index=False)
+    return str(path), metadata_path
+
+
+def _sorted(df, keys):
+    # Spark gives None and pandas NaN for a missing string; compare them as equal
+    strings = df.select_dtypes(include="object").columns
+    df = df.astype({c: object for c in strings}).fillna({c: "<null>" for c in strings})
+    return df.sort_values(keys).reset_index(drop=True)
+
+
+def test_pandas_engine_matches_spark(etl_pipeline, edge_case_data):
+    sensor_path, metadata_path = edge_case_data
+    engine = PandasTrafficEngine()
+
+    spark_enriched = etl_pipeline.transform(*etl_pipeline.extract(sensor_path, metadata_path))
+    spark_hourly, spark_stats = etl_pipeline.aggregate_metrics(spark_enriched)
+    local_enriched = engine.transform(*engine.extract(sensor_path, metadata_path))
+    local_hourly, local_stats = engine.aggregate_metrics(local_enriched)
+
+    keys = ["intersection_id", "timestamp", "vehicle_count", "average_speed"]
+    expected = _sorted(spark_enriched.toPandas(), keys)
+    actual = _sorted(local_enriched, keys)
+
+    assert list(actual.columns) == list(expected.columns)
+    # exact parity for the rounded TCI and the buckets derived from it
+    pd.testing.assert_series_equal(actual["traffic_congestion_index"], expected["traffic_congestion_index"])
+    pd.testing.assert_series_equal(actual["congestion_level"], expected["congestion_level"])
+    pd.testing.assert_series_equal(actual["time_of_day"], expected["time_of_day"])
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+    pd.testing.assert_frame_equal(
+        _sorted(local_hourly, ["intersection_id", "hour"]),
+        _sorted(spark_hourly.toPandas(), ["intersection_id", "hour"]),
+        check_dtype=False,
+    )
+    pd.testing.assert_frame_equal(
+        _sorted(local_stats, ["intersection_id"]),
+        _sorted(spark_stats.toPandas(), ["intersection_id"]),
+        check_dtype=False,
+    )
+
+
+def test_round_half_up_matches_spark_round(etl_pipeline):
+    from pyspark.sql.functions import col, round as spark_round
+
+    values = np.concatenate([BOUNDARY_VALUES, np.random.default_rng(1).uniform(-100, 100, 2000)])
+    df = etl_pipeline.spark.createDataFrame(pd.DataFrame({"v": values}))
+    spark_rounded = df.select(spark_round(col("v"), 2).alias("r")).toPandas()["r"].to_numpy()
+    np.testing.assert_array_equal(round_half_up(values, 2), spark_rounded)
+
+
+def test_pipeline_pandas_engine_writes_spark_layout(raw_data, tmp_path):
+    from src.etl_pipeline import TrafficETLPipeline
+
+    sensor_path, metadata_path = raw_data
+    pipeline = TrafficETLPipeline(engine="pandas")
+    pipeline.run_pipeline(sensor_path, metadata_path, str(tmp_path / "processed"))
+
+    assert pipeline.spark is None
+    assert pipeline.stage_stats()["enriched_records"]["rows"] == len(pd.read_csv(sensor_path))
+    for name in ["hourly_metrics", "intersection_stats"]:
+        assert len(list((tmp_path / "processed" / name).glob("part-*.parquet"))) == 1
+    # one file per date=/hour= partition, as Spark writes it
+    assert len(list((tmp_path / "processed" / "enriched_data").glob("date=*/hour=*/part-*.parquet"))) == 6
+    for name in ["enriched_data", "hourly_metrics", "intersection_stats"]:
+        assert len(list((tmp_path / "processed" / f"{name}_csv").glob("*.csv"))) == 1
+
+
+def test_engines_write_the_same_timestamp_types(etl_pipeline, raw_data, tmp_path):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from src.etl_pipeline import TrafficETLPipeline
+
+    sensor_path, metadata_path = raw_data
+    etl_pipeline.run_pipeline(sensor_path, metadata_path, str(tmp_path / "spark"))
+    TrafficETLPipeline(engine="pandas").run_pipeline(sensor_path, metadata_path, str(tmp_path / "pandas"))
+    assert etl_pipeline.spark.conf.get("spark.sql.session.timeZone") == "UTC"
+
+    def timestamp_types(path):
+        schema = ds.dataset(str(path), format="parquet", partitioning="hive").schema
+        return {f.name: f.type for f in schema if pa.types.is_timestamp(f.type)}
+
+    tables = ["enriched_data", "forecasts", *(f"rollups/{p.name}" for p in (tmp_path / "pandas" / "rollups").iterdir()
+                                              if not p.name.endswith("_csv"))]
+    for table in tables:
+        spark_types = timestamp_types(tmp_path / "spark" / table)
+        assert spark_types == timestamp_types(tmp_path / "pandas" / table), table
+        assert all(t.tz is None for t in spark_types.values()), table
+    assert timestamp_types(tmp_path / "spark" / "enriched_data") == {"timestamp": pa.timestamp("us")}
+
+    # wall-clock readings come back unshifted from both engines
+    raw = pd.to_datetime(pd.read_csv(sensor_path)["timestamp"])
+    for engine in ["spark", "pandas"]:
+        written = pd.read_parquet(tmp_path / engine / "enriched_data", columns=["timestamp", "hour"])
+        assert written["timestamp"].min() == raw.min() and written["timestamp"].max() == raw.max()
+        assert (written["timestamp"].dt.hour == written["hour"]).all()
@@ -0,0 +1,111 @@
+import os
+import shutil
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.processed_reader import ProcessedDataReader
+
+
+def test_partitioned_layout_prunes_hours(etl_pipeline, raw_data, tmp_path):
+    sensor_path, metadata_path = raw_data
+    output = tmp_path / "processed"
+    etl_pipeline.run_pipeline(sensor_path, metadata_path, str(output))
+
+    files = sorted((output / "enriched_data").glob("date=*/hour=*/*.parquet"))
+    assert len(files) == 6
+    for path in files:
+        ids = pq.read_table(path, columns=["intersection_id"]).column(0).to_pylist()
+        assert ids == sorted(ids)
+
+    reader = ProcessedDataReader(str(output))
+    hour = reader.enriched(hour=2)
+    assert reader.last_scan["files"] == 1
+    assert len(hour) == 4 * 12 and (hour["hour"] == 2).all()
+
+    everything = pd.read_csv(sensor_path)
+    one = reader.enriched(intersection_id="INT_002")
+    assert len(one) == (everything["intersection_id"] == "INT_002").sum()
+    assert set(one["intersection_id"]) == {"INT_002"}
+
+    hourly = reader.hourly_metrics(intersection_id="INT_002")
+    assert sorted(hourly["hour"]) == list(range(6))
+
+
+def test_intersection_lookup_skips_row_groups(raw_data, tmp_path, monkeypatch):
+    from src import pandas_engine
+    from src.etl_pipeline import TrafficETLPipeline
+
+    # one row group per intersection and hour
+    monkeypatch.setattr(pandas_engine, "ROW_GROUP_ROWS", 12)
+    sensor_path, metadata_path = raw_data
+    output = tmp_path / "processed"
+    TrafficETLPipeline(engine="pandas").run_pipeline(sensor_path, metadata_path, str(output))
+
+    reader = ProcessedDataReader(str(output))
+    reader.enriched()
+    full_scan = reader.last_scan
+    one = reader.enriched(intersection_id="INT_003", columns=["timestamp", "traffic_congestion_index"])
+
+    assert len(one) == 6 * 12
+    assert reader.last_scan["row_groups"] == 6
+    assert full_scan["row_groups"] == 6 * 4
+    assert reader.last_scan["bytes"] < full_scan["bytes"] / 3
+
+
+def test_reader_falls_back_to_csv_exports(tmp_path):
+    (tmp_path / "hourly_metrics_csv").mkdir()
+    pd.DataFrame({"intersection_id": ["INT_001", "INT_002"], "hour": [0, 0]}).to_csv(
+        tmp_path / "hourly_metrics_csv" / "part-00000.csv", index=False
+    )
+
+    reader = ProcessedDataReader(str(tmp_path))
+    assert reader.hourly_metrics(intersection_id="INT_002")["intersection_id"].tolist() == ["INT_002"]
+    assert reader.enriched() is None
+
+
+def test_cached_table_reloads_only_when_files_change(raw_data, tmp_path):
+    from src.etl_pipeline import TrafficETLPipeline
+
+    sensor_path, metadata_path = raw_data
+    pipeline = TrafficETLPipeline(engine="pandas")
+    pipeline.run_pipeline(sensor_path, metadata_path, str(tmp_path))
+
+    cache = ProcessedDataReader(str(tmp_path)).cached("hourly_metrics", index_column="hour")
+    assert sorted(cache.get(2)["intersection_id"]) == ["INT_001", "INT_002", "INT_003", "INT_004"]
+    assert (cache.get(3)["hour"] == 3).all() and cache.get(23).empty
+    assert cache.stats["reloads"] == 1 and cache.stats["hits"] == 2 and cache.stats["rows_loaded"] == 24
+
+    pipeline.run_pipeline(sensor_path, metadata_path, str(tmp_path))  # publishes a new snapshot
+    assert len(cache.get(2)) == 4
+    assert cache.stats["reloads"] == 2 and cache.hit_rate == 0.5
+
+    legacy = ProcessedDataReader(str(tmp_path / "legacy")).cached("hourly_metrics", index_column="hour")
+    assert legacy.get(0) is None
+    (tmp_path / "legacy" / "hourly_metrics_csv").mkdir(parents=True)
+    pd.DataFrame({"intersection_id": ["INT_001"], "hour": [0]}).to_csv(
+        tmp_path / "legacy" / "hourly_metrics_csv" / "part-00000.csv", index=False
+    )
+    assert len(legacy.get(0)) == 1 and legacy.stats["reloads"] == 2
+
+
+def test_cached_partition_reloads_only_when_its_directories_change(raw_data, tmp_path):
+    from src.etl_pipeline import TrafficETLPipeline
+
+    sensor_path, metadata_path = raw_data
+    TrafficETLPipeline(engine="pandas").run_pipeline(sensor_path, metadata_path, str(tmp_path))
+
+    reader = ProcessedDataReader(str(tmp_path))
+    cache = reader.cached("enriched_data", columns=["intersection_id", "traffic_congestion_index"], hour=2)
+    assert len(cache.get()) == len(reader.enriched(hour=2))
+    # the identity stats the table, date and hour=2 directories, not the Parquet files
+    assert all(os.path.isdir(path) for path, *_ in cache._file_identity())
+
+    hour_3 = next((tmp_path / "enriched_data").glob("date=*/hour=3"))
+    shutil.copy(next(hour_3.glob("*.parquet")), hour_3 / "part-09999.parquet")
+    cache.get()
+    assert cache.stats["reloads"] == 1 and cache.stats["hits"] == 1
+
+    hour_2 = next((tmp_path / "enriched_data").glob("date=*/hour=2"))
+    shutil.copy(next(hour_2.glob("*.parquet")), hour_2 / "part-09999.parquet")
+    assert len(cache.get()) == len(reader.enriched(hour=2)) and cache.stats["reloads"] == 2
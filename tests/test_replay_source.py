@@ -0,0 +1,69 @@
+import os
+import socket
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from src.data_generator import TrafficDataGenerator
+from src.replay_source import RollingFileSink, SensorReplaySource, SocketSink
+
+
+def test_replay_to_rolling_files_in_timestamp_order(tmp_path):
+    gen = TrafficDataGenerator(num_intersections=4, hours=2, seed=5)
+    sink = RollingFileSink(str(tmp_path), max_records=10, max_seconds=60)
+    stats = SensorReplaySource(gen, sink, speed=None, start_date=datetime(2024, 1, 1)).run()
+
+    assert stats.events == 4 * 2 * 12
+    assert stats.batches == 2 * 12
+    assert stats.events_per_sec > 0
+
+    files = sorted(os.listdir(tmp_path))
+    assert all(name.startswith("readings-") and name.endswith(".csv") for name in files)
+    df = pd.concat(pd.read_csv(tmp_path / name, parse_dates=["timestamp"]) for name in files)
+    assert len(df) == stats.events
+    assert df["timestamp"].is_monotonic_increasing
+
+
+def test_replay_respects_speed_and_reports_lag(tmp_path):
+    gen = TrafficDataGenerator(num_intersections=2, hours=1, seed=5)
+    sink = RollingFileSink(str(tmp_path), max_records=1000)
+    # 3 intervals of 5 minutes at 3000x -> 0.1s between batches
+    stats = SensorReplaySource(gen, sink, speed=3000, start_date=datetime(2024, 1, 1)).run(max_events=6)
+
+    assert stats.events == 6
+    assert stats.elapsed_seconds >= 0.2
+    assert stats.target_events_per_sec == 2 / 300 * 3000
+    assert stats.max_lag_seconds < 0.1
+
+
+def test_rolling_files_are_published_within_max_seconds(tmp_path):
+    gen = TrafficDataGenerator(num_intersections=2, hours=1, seed=5)
+    sink = RollingFileSink(str(tmp_path), max_records=1000, max_seconds=0.05)
+    # 0.3s between batches: the first file is due while the replay waits for the second batch
+    SensorReplaySource(gen, sink, speed=1000, start_date=datetime(2024, 1, 1)).run(max_events=4)
+    assert sorted(os.listdir(tmp_path)) == ["readings-000000.csv", "readings-000001.csv"]
+    assert [len(pd.read_csv(tmp_path / name)) for name in sorted(os.listdir(tmp_path))] == [2, 2]
+
+
+def test_socket_sink_streams_csv_lines():
+    sink = SocketSink(port=0)
+    client = socket.create_connection(("localhost", sink.port))
+    try:
+        gen = TrafficDataGenerator(num_intersections=2, hours=1, seed=5)
+        # give the accept thread a moment to register the client
+        deadline = time.monotonic() + 2
+        while not sink._clients and time.monotonic() < deadline:
+            time.sleep(0.01)
+        batch = gen.generate_sensor_data(start_date=datetime(2024, 1, 1)).head(3)
+        sink.write(batch)
+        client.settimeout(2)
+        data = b""
+        while data.count(b"\n") < 3:
+            data += client.recv(4096)
+        lines = data.decode().strip().splitlines()
+        assert len(lines) == 3
+        assert lines[0].split(",")[1] == "INT_001"
+    finally:
+        client.close()
+        sink.close()
@@ -0,0 +1,45 @@
+import pandas as pd
+
+from src.pandas_engine import PandasTrafficEngine
+from src.rollups import ROLLUPS, output_keys, spark_rollups
+
+
+def test_spark_rollups_match_pandas(etl_pipeline, raw_data):
+    sensor_path, metadata_path = raw_data
+    engine = PandasTrafficEngine()
+    local = engine.aggregate_rollups(engine.transform(*engine.extract(sensor_path, metadata_path)))
+    spark = spark_rollups(etl_pipeline.transform(*etl_pipeline.extract(sensor_path, metadata_path)))
+
+    assert set(local) == set(spark) == set(ROLLUPS)
+    for name, spark_df in spark.items():
+        keys = output_keys(name)
+        expected = spark_df.toPandas().sort_values(keys).reset_index(drop=True)
+        actual = local[name].sort_values(keys).reset_index(drop=True)
+        pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+    hourly = local["hourly"]
+    assert len(hourly) == 4 * 6 and (hourly["reading_count"] == 12).all()
+    assert len(local["fifteen_minute"]) == 4 * 6 * 4
+    assert local["time_of_day_level"]["reading_count"].sum() == len(pd.read_csv(sensor_path))
+
+
+def test_spark_rollups_share_one_shuffle(etl_pipeline, raw_data):
+    sensor_path, metadata_path = raw_data
+    enriched_df = etl_pipeline.transform(*etl_pipeline.extract(sensor_path, metadata_path))
+    rollups = spark_rollups(enriched_df)
+
+    # validation's duplicate check shuffles enriched_df itself; rollups add exactly one more
+    upstream = enriched_df._jdf.queryExecution().executedPlan().toString().count("Exchange hashpartitioning")
+    plan = rollups["daily"]._jdf.queryExecution().executedPlan().toString()
+    assert "Expand" in plan
+    assert plan.count("Exchange hashpartitioning") == upstream + 1
+
+
+def test_run_pipeline_writes_rollup_tables(raw_data, tmp_path):
+    from src.etl_pipeline import TrafficETLPipeline
+
+    sensor_path, metadata_path = raw_data
+    TrafficETLPipeline(engine="pandas").run_pipeline(sensor_path, metadata_path, str(tmp_path))
+    for name in ROLLUPS:
+        assert len(pd.read_parquet(tmp_path / "rollups" / name)) > 0
+        assert list((tmp_path / "rollups" / f"{name}_csv").glob("*.csv"))
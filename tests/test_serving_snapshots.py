@@ -0,0 +1,61 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pyarrow as pa
+
+from src.processed_reader import ProcessedDataReader
+from src.serving_snapshots import POINTER, SERVING_DIR, SnapshotReader, current_snapshot, publish_snapshot
+
+
+def test_reader_follows_current_pointer_without_copying(tmp_path):
+    serving = str(tmp_path / SERVING_DIR)
+    reader = SnapshotReader(serving)
+    assert reader.table("hourly_metrics") is None
+
+    publish_snapshot({"hourly_metrics": pa.table({"hour": [0, 1], "reading_count": [12, 12]})}, serving)
+    allocated = pa.total_allocated_bytes()
+    first = reader.table("hourly_metrics")
+    assert first.column("hour").to_pylist() == [0, 1]
+    assert pa.total_allocated_bytes() == allocated  # buffers point into the memory map
+
+    for i in range(4):
+        publish_snapshot({"hourly_metrics": pa.table({"hour": [i], "reading_count": [i]})}, serving, keep=2)
+    assert reader.table("hourly_metrics").column("hour").to_pylist() == [3]
+    assert reader.manifest["version"] == 5
+    assert current_snapshot(serving) == "v000005"
+    assert sorted(os.listdir(serving)) == [POINTER, "v000004", "v000005"]
+    assert first.column("hour").to_pylist() == [0, 1]  # still mapped after its snapshot was pruned
+
+
+def test_concurrent_publishers_get_distinct_versions(tmp_path):
+    serving = str(tmp_path / SERVING_DIR)
+
+    def publish(publisher):
+        return [publish_snapshot({"hourly_metrics": pa.table({"hour": [publisher], "reading_count": [i]})},
+                                 serving)["version"] for i in range(10)]
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        versions = [v for published in pool.map(publish, range(2)) for v in published]
+    assert sorted(versions) == list(range(1, 21))
+    assert current_snapshot(serving) == "v000020"
+    assert sorted(os.listdir(serving)) == [POINTER, "v000018", "v000019", "v000020"]
+    assert SnapshotReader(serving).table("hourly_metrics").num_rows == 1
+
+
+def test_pipeline_publishes_a_snapshot_per_run(raw_data, tmp_path):
+    from src.etl_pipeline import TrafficETLPipeline
+
+    sensor_path, metadata_path = raw_data
+    pipeline = TrafficETLPipeline(engine="pandas")
+    pipeline.run_pipeline(sensor_path, metadata_path, str(tmp_path))
+
+    reader = ProcessedDataReader(str(tmp_path))
+    hourly = reader.hourly_metrics(intersection_id="INT_001")
+    assert reader.last_scan["snapshot"] == 1
+    assert sorted(hourly["hour"]) == list(range(6))
+    assert len(reader.forecasts(intersection_id="INT_001")) == 4
+    assert reader.enriched(hour=2) is not None and "snapshot" not in reader.last_scan
+
+    pipeline.run_pipeline(sensor_path, metadata_path, str(tmp_path))
+    reader.intersection_stats()
+    assert reader.last_scan["snapshot"] == 2
@@ -0,0 +1,70 @@
+import pandas as pd
+from prometheus_client.parser import text_string_to_metric_families
+
+from src.data_generator import TrafficDataGenerator
+from src.etl_pipeline import TrafficETLPipeline
+from src.metrics_exporter import TrafficMetricsExporter
+from src.processed_reader import ProcessedDataReader
+from src.sharding import HashRing, ShardFilter, moved_keys, scrape_config, shard_counts, shard_names
+
+
+IDS = [f"INT_{i:05d}" for i in range(1, 20001)]
+
+
+def test_ring_balances_and_only_moves_keys_to_a_new_shard():
+    rings = {n: HashRing(shard_names(n)) for n in (4, 5)}
+    counts = shard_counts(rings[4], IDS)
+    assert sum(counts.values()) == len(IDS)
+    assert max(counts.values()) < 1.25 * len(IDS) / 4 and min(counts.values()) > 0.75 * len(IDS) / 4
+
+    moved = moved_keys(rings[4], rings[5], IDS)
+    # about 1/5 of the keys move, all of them to the new shard
+    assert 0.15 < len(moved) / len(IDS) < 0.25
+    assert set(rings[5].assign(moved)) == {"shard-4"}
+    # placement does not depend on the process: same ring, same owners
+    assert (HashRing(shard_names(4)).assign(IDS[:100]) == rings[4].assign(IDS[:100])).all()
+
+
+def test_shard_filter_masks_owned_ids():
+    shard = ShardFilter.of(2, 3)
+    ids = pd.Series(["INT_00001", None, "INT_00002", "INT_00001", "INT_00003"])
+    owners = HashRing(shard_names(3)).assign(["INT_00001", "INT_00002", "INT_00003"])
+    expected = dict(zip(["INT_00001", "INT_00002", "INT_00003"], owners == "shard-2"))
+    assert shard.mask(ids).to_pylist() == [expected.get(key, False) for key in ids]
+
+
+def test_sharded_reader_returns_none_for_missing_tables(tmp_path):
+    reader = ProcessedDataReader(str(tmp_path), shard=ShardFilter.of(0, 2))
+    assert reader.read("hourly_metrics", ["hour"]) is None
+    assert reader.enriched(hour=3, columns=["traffic_congestion_index"]) is None
+
+
+def test_exporter_shards_partition_the_intersections(tmp_path):
+    gen = TrafficDataGenerator(num_intersections=12, hours=2, seed=5)
+    metadata_path, sensor_path = gen.save_to_csv(output_dir=str(tmp_path / "raw"))
+    output = tmp_path / "processed"
+    TrafficETLPipeline(engine="pandas").run_pipeline(sensor_path, metadata_path, str(output))
+
+    owned = []
+    for index in range(3):
+        exporter = TrafficMetricsExporter(data_path=str(output), shard_index=index, shard_count=3)
+        assert exporter.update_metrics()
+        families = {f.name: f for f in text_string_to_metric_families(exporter.exposition.raw.decode())}
+        ids = {s.labels["intersection_id"] for s in families["traffic_congestion_index"].samples}
+        readings = families["traffic_reading_congestion_index"].samples
+        assert all(exporter.shard.ring.owner(key) == f"shard-{index}" for key in ids)
+        assert len(exporter.readings) == sum(s.value for s in readings if s.name.endswith("_count"))
+        assert families["traffic_exporter_shard_info"].samples[0].labels == {"shard": f"shard-{index}",
+                                                                               "shard_count": "3"}
+        owned.append(ids)
+
+    # every intersection is exported by exactly one shard
+    all_ids = set(pd.read_parquet(output / "hourly_metrics")["intersection_id"])
+    assert sum(len(ids) for ids in owned) == len(all_ids) and set().union(*owned) == all_ids
+
+
+def test_scrape_config_lists_every_shard():
+    targets = [(shard, f"exporter-{i}:{8000 + i}") for i, shard in enumerate(shard_names(3))]
+    config = scrape_config(targets, scrape_interval="30s")
+    assert config.count("- targets:") == 3 and "scrape_interval: 30s" in config
+    assert "['exporter-2:8002']" in config and "shard: 'shard-2'" in config
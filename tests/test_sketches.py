@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from src.pandas_engine import PandasTrafficEngine
+from src.processed_reader import ProcessedDataReader
+from src.sketches import DAILY_SKETCH_KEYS, QuantileSketch, merge_sketch_table
+
+
+def test_merged_sketches_match_exact_quantiles():
+    values = np.random.default_rng(3).gamma(2.0, 10.0, 50_000)
+    whole = QuantileSketch.from_values(values)
+    # serialized per-part sketches merge into one as accurate as a sketch of everything
+    parts = [QuantileSketch.from_bytes(QuantileSketch.from_values(part).to_bytes())
+             for part in np.array_split(values, 100)]
+    merged = QuantileSketch.merge(parts)
+
+    exact = np.quantile(values, [0.5, 0.95, 0.99])
+    assert merged.count == len(values)
+    assert len(merged.to_bytes()) < 2048
+    np.testing.assert_allclose(whole.quantile([0.5, 0.95, 0.99]), exact, rtol=0.02)
+    np.testing.assert_allclose(merged.quantile([0.5, 0.95, 0.99]), exact, rtol=0.02)
+    assert merged.quantile(0.0) == values.min() and merged.quantile(1.0) == values.max()
+    assert np.isnan(QuantileSketch.from_values([np.nan]).quantile(0.5))
+
+
+def test_daily_percentiles_merge_hourly_sketches(raw_data, tmp_path):
+    from src.etl_pipeline import TrafficETLPipeline
+
+    sensor_path, metadata_path = raw_data
+    TrafficETLPipeline(engine="pandas").run_pipeline(sensor_path, metadata_path, str(tmp_path))
+
+    reader = ProcessedDataReader(str(tmp_path))
+    hourly = reader.percentiles(intersection_id="INT_002")
+    daily = reader.percentiles(intersection_id="INT_002", granularity="daily")
+    assert len(hourly) == 6 and (hourly["reading_count"] == 12).all()
+    pd.testing.assert_frame_equal(merge_sketch_table(hourly, DAILY_SKETCH_KEYS), daily, check_dtype=False)
+
+    # small groups are kept exactly, so the extremes match the readings
+    engine = PandasTrafficEngine()
+    readings = engine.transform(*engine.extract(sensor_path, metadata_path))
+    readings = readings[readings["intersection_id"] == "INT_002"]["traffic_congestion_index"]
+    sketch = QuantileSketch.from_bytes(daily["congestion_index_sketch"].iloc[0])
+    assert sketch.count == len(readings) == daily["reading_count"].iloc[0]
+    assert sketch.quantile(1.0) == readings.max()
+    assert readings.min() <= daily["congestion_index_p50"].iloc[0] <= daily["congestion_index_p99"].iloc[0]
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pandas as pd
+
+from src.data_generator import TrafficDataGenerator
+from src.processed_reader import ProcessedDataReader
+from src.replay_source import RollingFileSink, SensorReplaySource
+
+
+def test_streaming_pipeline_matches_batch_hourly_windows(etl_pipeline, tmp_path):
+    from src.streaming_pipeline import TrafficStreamingPipeline
+
+    gen = TrafficDataGenerator(num_intersections=3, hours=3, seed=4)
+    raw = tmp_path / "raw"
+    metadata_path = str(tmp_path / "intersection_metadata.csv")
+    gen.intersections.to_csv(metadata_path, index=False)
+    SensorReplaySource(gen, RollingFileSink(str(raw), max_records=60), speed=None,
+                       start_date=datetime(2024, 1, 1)).run()
+
+    # a batch run into the same layout first: streaming must not trip over its hour-of-day tables
+    output = tmp_path / "processed"
+    batch_sensor = tmp_path / "batch_sensor_data.csv"
+    gen.generate_sensor_data(start_date=datetime(2023, 12, 31)).to_csv(batch_sensor, index=False)
+    etl_pipeline.run_pipeline(str(batch_sensor), metadata_path, str(output))
+
+    streaming = TrafficStreamingPipeline(
+        etl_pipeline, metadata_path, str(raw), str(output), str(tmp_path / "checkpoints"),
+        max_files_per_trigger=1, shuffle_partitions=2,
+    )
+    streaming.run_available()
+
+    enriched = ProcessedDataReader(str(output)).enriched()
+    enriched = enriched[enriched["timestamp"] >= "2024-01-01"]
+    assert len(enriched) == 3 * 3 * 12
+
+    windows = pd.read_parquet(output / "hourly_windows")
+    assert len(windows) == 3 * 3 and (windows["reading_count"] == 12).all()
+    hourly = pd.read_parquet(output / "hourly_metrics")
+    assert list(hourly.columns) == ["intersection_id", "location", "hour", "total_vehicles", "avg_speed",
+                                    "avg_congestion_index", "reading_count"]
+    assert len(hourly) == 3 * 3
+    assert (hourly["reading_count"] == 12).all()
+    expected = enriched.groupby(["intersection_id", "hour"])["traffic_congestion_index"].mean()
+    actual = hourly.set_index(["intersection_id", "hour"])["avg_congestion_index"]
+    pd.testing.assert_series_equal(actual.sort_index(), expected.sort_index(), check_names=False)
+
+    five_minute = pd.read_parquet(output / "five_minute_windows")
+    assert (five_minute["reading_count"] == 1).all()
+
+    stats = pd.read_csv(next((output / "intersection_stats_csv").glob("*.csv")))
+    assert sorted(stats["intersection_id"]) == ["INT_001", "INT_002", "INT_003"]
+    assert list((output / "hourly_metrics_csv").glob("*.csv"))
+    assert set(streaming.sink_reports) == {"hourly_metrics", "intersection_stats", "hourly_metrics_csv",
+                                           "intersection_stats_csv"}
+
+    # a new file is picked up from the checkpointed position; the next day's windows fold into
+    # the same hours of hourly_metrics and only add a date partition to hourly_windows
+    SensorReplaySource(gen, RollingFileSink(str(raw), prefix="late"), speed=None,
+                       start_date=datetime(2024, 1, 2)).run()
+    streaming.run_available()
+    enriched = ProcessedDataReader(str(output)).enriched()
+    enriched = enriched[enriched["timestamp"] >= "2024-01-01"]
+    assert len(enriched) == 2 * 3 * 3 * 12
+    assert sorted(p.name for p in (output / "hourly_windows").glob("date=*")) == ["date=2024-01-01", "date=2024-01-02"]
+    hourly = pd.read_parquet(output / "hourly_metrics")
+    assert len(hourly) == 3 * 3 and (hourly["reading_count"] == 24).all()
+    expected = enriched.groupby(["intersection_id", "hour"])["vehicle_count"].sum()
+    actual = hourly.set_index(["intersection_id", "hour"])["total_vehicles"]
+    pd.testing.assert_series_equal(actual.sort_index(), expected.sort_index(), check_names=False, check_dtype=False)
+    # the serving snapshot follows the stream, not the batch run before it
+    served = ProcessedDataReader(str(output)).read("hourly_metrics")
+    assert len(served) == 3 * 3 and (served["reading_count"] == 24).all()
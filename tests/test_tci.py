@@ -1,6 +1,15 @@
+import numpy as np
+import pandas as pd
 import pytest
 
 from src.etl_pipeline import compute_traffic_congestion_index
+from src.tci import (
+    congestion_components,
+    congestion_index,
+    congestion_level,
+    spark_congestion_columns,
+    spark_congestion_level,
+)
 
 
 def test_tci_happy_path():
@@ -27,3 +36,54 @@ def test_tci_high_speed_may_reduce_or_negative():
     # Very high speeds (above 55) produce negative speed_factor in the current formula
     tci = compute_traffic_congestion_index(vehicle_count=10, average_speed=80, capacity_per_hour=1200, interval_minutes=5)
     assert isinstance(tci, float)
+
+
+def random_readings(seed, n=2000):
+    rng = np.random.default_rng(seed)
+    capacity = rng.choice([0, 400, 800, 1200, 1600, np.nan], size=n)
+    return rng.integers(0, 400, size=n), rng.uniform(0, 90, size=n).round(2), capacity
+
+
+@pytest.mark.parametrize("interval_minutes", [5, 15, 7])
+def test_vectorized_tci_matches_scalar(interval_minutes):
+    vehicles, speeds, capacity = random_readings(interval_minutes)
+    batch = congestion_index(vehicles, speeds, capacity, interval_minutes)
+    scalar = [
+        compute_traffic_congestion_index(v, s, None if np.isnan(c) else c, interval_minutes)
+        for v, s, c in zip(vehicles, speeds, capacity)
+    ]
+    known = ~np.isnan(capacity)
+    np.testing.assert_array_equal(batch[known], np.asarray(scalar)[known])
+    assert np.isnan(batch[~known]).all()
+
+
+def test_series_input_keeps_index():
+    index = pd.Index([10, 20, 30])
+    tci = congestion_index(pd.Series([50, 0, 500], index=index), pd.Series([30.0, 30.0, 5.0], index=index),
+                           pd.Series([1200, 0, 800], index=index))
+    assert tci.index.equals(index)
+    assert tci.tolist() == [compute_traffic_congestion_index(50, 30, 1200), 0.0, 100.0]
+    assert congestion_level(tci).index.equals(index)
+
+
+def test_congestion_level_boundaries():
+    levels = congestion_level(np.array([-5.0, 0.0, 19.99, 20.0, 39.99, 40.0, 60.0, 79.99, 80.0, 100.0, np.nan]))
+    assert levels.tolist() == [
+        "Low", "Low", "Low", "Moderate", "Moderate", "High", "Severe", "Severe", "Critical", "Critical", "Critical",
+    ]
+
+
+@pytest.mark.parametrize("interval_minutes", [5, 15, 7])
+def test_spark_expressions_match_numpy(etl_pipeline, interval_minutes):
+    vehicles, speeds, capacity = random_readings(100 + interval_minutes, n=500)
+    pdf = pd.DataFrame({"vehicle_count": vehicles, "average_speed": speeds, "capacity_per_hour": capacity})
+    df = etl_pipeline.spark.createDataFrame(pdf.astype(object).where(pdf.notna(), None))
+    for name, expr in spark_congestion_columns(interval_minutes).items():
+        df = df.withColumn(name, expr)
+    df = df.withColumn("congestion_level", spark_congestion_level(df["traffic_congestion_index"]))
+    result = df.toPandas()
+
+    expected = congestion_components(vehicles, speeds, capacity, interval_minutes)
+    for name, values in expected.items():
+        np.testing.assert_allclose(result[name].astype(float), values, rtol=0, atol=1e-12, equal_nan=True)
+    assert result["congestion_level"].tolist() == congestion_level(expected["traffic_congestion_index"]).tolist()
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from src.timeline_replay import TimelineIndex, TimelineReplay
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _readings(days=2, intersections=3):
+    timestamps = pd.date_range("2024-01-01", periods=days * 288, freq="5min")
+    frame = pd.DataFrame({
+        "timestamp": np.repeat(timestamps, intersections),
+        "intersection_id": np.tile([f"INT_{i:03d}" for i in range(1, intersections + 1)], len(timestamps)),
+    })
+    frame["traffic_congestion_index"] = np.arange(len(frame), dtype=np.float64)
+    # shuffled, with one intersection missing at one instant
+    frame = frame.drop(index=5).sample(frac=1.0, random_state=3)
+    return frame
+
+
+def test_index_slices_match_a_filter():
+    readings = _readings()
+    index = TimelineIndex(readings)
+
+    assert len(index) == 2 * 288 and index.interval == np.timedelta64(5, "m")
+    for when in ["2024-01-01 00:05", "2024-01-02 17:35", "2024-01-02 23:55"]:
+        rows = index.rows(index.position(when))
+        expected = readings[readings["timestamp"] == pd.Timestamp(when)].sort_values("intersection_id")
+        assert rows["intersection_id"].tolist() == expected["intersection_id"].tolist()
+        assert rows["traffic_congestion_index"].tolist() == expected["traffic_congestion_index"].tolist()
+
+    # between readings: the last one at or before; before the data: the first
+    assert index.position("2024-01-01 10:07:30") == index.position("2024-01-01 10:05")
+    assert index.position("2023-12-31") == 0
+    assert len(index.rows(index.position("2024-01-01 00:05"))["intersection_id"]) == 2
+
+
+def test_replay_runs_at_speed_wraps_and_seeks_across_days():
+    clock = FakeClock()
+    replay = TimelineReplay(TimelineIndex(_readings()), speed=300.0, clock=clock)
+    assert replay.current()[0] == np.datetime64("2024-01-01T00:00")
+
+    clock.now = 2.0  # 600 data seconds: two 5-minute steps
+    assert replay.current()[0] == np.datetime64("2024-01-01T00:10")
+
+    replay.seek("2024-01-02 08:00")
+    clock.now += 1.5
+    timestamp, rows = replay.current()
+    assert timestamp == np.datetime64("2024-01-02T08:05")
+    assert len(rows["intersection_id"]) == 3
+
+    replay.seek("2024-01-02 23:55")
+    clock.now += 2.0  # past the end of the data: start over
+    assert replay.current()[0] == np.datetime64("2024-01-01T00:05")
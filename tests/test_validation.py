@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+from src.validation import REASON_CODES, pandas_quality_issues, with_spark_quality_issues
+
+
+@pytest.fixture
+def dirty_data(raw_data, tmp_path):
+    """raw_data plus one reading that breaks each validation rule"""
+    sensor_path, metadata_path = raw_data
+    sensor = pd.read_csv(sensor_path, parse_dates=["timestamp"])
+    first = sensor.iloc[0]
+    after = sensor["timestamp"].max()  # later timestamps cannot collide with real readings
+    bad = pd.DataFrame([first] * 6).reset_index(drop=True)
+    bad.loc[1, "timestamp"] = after + pd.Timedelta(minutes=2)
+    bad.loc[2, ["timestamp", "vehicle_count"]] = [after + pd.Timedelta(minutes=5), -3]
+    bad.loc[3, ["timestamp", "average_speed"]] = [after + pd.Timedelta(minutes=10), 80.0]
+    bad.loc[4, "intersection_id"] = "INT_999"
+    bad.loc[5, ["timestamp", "average_speed"]] = [after + pd.Timedelta(minutes=15), None]
+    path = tmp_path / "dirty_sensor_data.csv"
+    pd.concat([sensor, bad]).to_csv(path, index=False)
+    return str(path), metadata_path, len(sensor)
+
+
+def _check_outputs(pipeline, output, clean_rows):
+    stats = pipeline.stage_stats()["validation"]
+    assert {code: stats[code] for code in REASON_CODES} == dict.fromkeys(REASON_CODES, 1)
+    assert stats["quarantined"] == 6
+
+    quarantine = pd.read_parquet(output / "quarantine")
+    assert sorted(quarantine["quality_issues"]) == sorted(REASON_CODES)
+    enriched = pd.read_parquet(output / "enriched_data")
+    assert len(enriched) == clean_rows
+    assert "quality_issues" not in enriched.columns
+
+
+def test_pandas_engine_quarantines_bad_rows(dirty_data, tmp_path):
+    from src.etl_pipeline import TrafficETLPipeline
+
+    sensor_path, metadata_path, clean_rows = dirty_data
+    pipeline = TrafficETLPipeline(engine="pandas")
+    pipeline.run_pipeline(sensor_path, metadata_path, str(tmp_path))
+    _check_outputs(pipeline, tmp_path, clean_rows)
+
+
+def test_spark_validation_matches_pandas(etl_pipeline, dirty_data, tmp_path):
+    from src.pandas_engine import PandasTrafficEngine
+
+    sensor_path, metadata_path, clean_rows = dirty_data
+    etl_pipeline.run_pipeline(sensor_path, metadata_path, str(tmp_path))
+    _check_outputs(etl_pipeline, tmp_path, clean_rows)
+
+    engine = PandasTrafficEngine()
+    local = engine.transform(*engine.extract(sensor_path, metadata_path))
+    spark = etl_pipeline.transform(*etl_pipeline.extract(sensor_path, metadata_path)).toPandas()
+    keys = ["intersection_id", "timestamp", "vehicle_count", "average_speed", "quality_issues"]
+    assert (
+        local[keys].astype(str).sort_values(keys).values.tolist()
+        == spark[keys].astype(str).sort_values(keys).values.tolist()
+    )
+
+
+def test_interval_check_measures_from_each_intersections_first_reading(etl_pipeline):
+    # a 5-minute feed starting at 08:02 and a 7-minute one: neither is on a midnight grid
+    readings = pd.DataFrame({
+        "timestamp": [*pd.date_range("2024-01-01 08:02", periods=6, freq="5min"),
+                      *pd.date_range("2024-01-01 00:00", periods=6, freq="7min")],
+        "intersection_id": ["INT_001"] * 6 + ["INT_002"] * 6,
+        "vehicle_count": 10,
+        "average_speed": 30.0,
+        "capacity_per_hour": 1000,
+    })
+    readings.loc[3, "timestamp"] += pd.Timedelta(minutes=1)
+    for interval, rows in ((5, readings.iloc[:6]), (7, readings.iloc[6:])):
+        expected = ["timestamp_off_interval" if i == 3 else "" for i in rows.index]
+        assert pandas_quality_issues(rows, interval).tolist() == expected
+        spark = with_spark_quality_issues(etl_pipeline.spark.createDataFrame(rows), interval).toPandas()
+        assert spark.sort_values("timestamp")["quality_issues"].tolist() == expected